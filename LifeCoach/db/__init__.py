@@ -0,0 +1,4 @@
+"""
+Database connection management: the pooling MySQL backend (mysql), the
+read replica router (routers) and connection and query metrics (metrics).
+"""
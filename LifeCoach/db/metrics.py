@@ -0,0 +1,127 @@
+"""
+Connection churn and query latency of the databases, per process.
+
+Every connection Django opens and every query it runs is counted per
+database alias; the LifeCoach.db.mysql backend also times connecting and
+counts the connections it reuses from its pool. snapshot() sums it up with
+latency percentiles of the last SAMPLE_SIZE connects and queries. Staff get
+it as JSON at /metrics/db/ and load_test prints it. Each worker process
+keeps its own numbers.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from functools import partial
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import JsonResponse
+
+from .pool import POOLS
+
+SAMPLE_SIZE = 1000
+
+
+class DatabaseMetrics:
+    def __init__(self):
+        self.opened = 0
+        self.reused = 0
+        self.connect_seconds = deque(maxlen=SAMPLE_SIZE)
+        self.queries = 0
+        self.query_seconds_total = 0.0
+        self.query_seconds = deque(maxlen=SAMPLE_SIZE)
+
+
+_lock = threading.Lock()
+_databases = defaultdict(DatabaseMetrics)
+_started = time.monotonic()
+
+
+def reset():
+    global _started
+    with _lock:
+        _databases.clear()
+        _started = time.monotonic()
+
+
+def record_connect(alias, seconds=None, reused=False):
+    with _lock:
+        metrics = _databases[alias]
+        if reused:
+            metrics.reused += 1
+        else:
+            metrics.opened += 1
+        if seconds is not None:
+            metrics.connect_seconds.append(seconds)
+
+
+def _timed_query(alias, execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - started
+        with _lock:
+            metrics = _databases[alias]
+            metrics.queries += 1
+            metrics.query_seconds_total += seconds
+            metrics.query_seconds.append(seconds)
+
+
+@receiver(connection_created)
+def _connection_created(sender, connection, **kwargs):
+    if not getattr(connection, "records_connects", False):
+        record_connect(connection.alias)
+    if not getattr(connection, "_query_metrics", False):
+        # First, so that execute_wrapper() blocks still pop their own wrapper
+        connection.execute_wrappers.insert(0, partial(_timed_query, connection.alias))
+        connection._query_metrics = True
+
+
+def _milliseconds(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    latencies = {
+        f"p{p}": ordered[min(len(ordered) - 1, len(ordered) * p // 100)]
+        for p in (50, 95, 99)
+    }
+    latencies["max"] = ordered[-1]
+    return {name: round(seconds * 1000, 3) for name, seconds in latencies.items()}
+
+
+def snapshot():
+    with _lock:
+        uptime = max(time.monotonic() - _started, 0.001)
+        databases = {}
+        for alias, metrics in sorted(_databases.items()):
+            pools = [pool for (name, _), pool in POOLS.items() if name == alias]
+            databases[alias] = {
+                "connections": {
+                    "opened": metrics.opened,
+                    "opened_per_minute": round(metrics.opened * 60 / uptime, 2),
+                    "reused": metrics.reused,
+                    "pooled": sum(len(pool) for pool in pools),
+                    "discarded": sum(pool.discarded for pool in pools),
+                    "connect_ms": _milliseconds(metrics.connect_seconds),
+                },
+                "queries": {
+                    "count": metrics.queries,
+                    "per_second": round(metrics.queries / uptime, 2),
+                    "mean_ms": (
+                        round(metrics.query_seconds_total * 1000 / metrics.queries, 3)
+                        if metrics.queries
+                        else None
+                    ),
+                    "ms": _milliseconds(metrics.query_seconds),
+                },
+            }
+    return {"pid": os.getpid(), "seconds": round(uptime, 1), "databases": databases}
+
+
+@staff_member_required
+def metrics_view(request):
+    return JsonResponse(snapshot())
@@ -0,0 +1,63 @@
+"""
+The MySQL backend, timing new connections and optionally pooling them.
+
+With POOL_SIZE above 0 in the database settings, closing a connection
+rolls back what is left open and returns it to the pool of this process
+(LifeCoach.db.pool); connecting takes a pooled connection before opening a
+new one. Pooled connections older than POOL_RECYCLE seconds are closed,
+with CONN_HEALTH_CHECKS those idle for over POOL_CHECK_AFTER seconds are
+pinged before reuse. Pair it with CONN_MAX_AGE = 0, the pool keeps the
+connections between requests instead.
+"""
+
+import time
+
+from django.db.backends.mysql import base as mysql
+
+from LifeCoach.db import metrics
+from LifeCoach.db.pool import get_pool
+
+
+class DatabaseWrapper(mysql.DatabaseWrapper):
+    # Opened and reused connections are counted here, not by the signal
+    records_connects = True
+    _pool = None
+    _opened_at = None
+
+    def get_new_connection(self, conn_params):
+        size = self.settings_dict.get("POOL_SIZE") or 0
+        self._pool = None
+        if size:
+            self._pool = get_pool(
+                self.alias,
+                conn_params,
+                size=size,
+                max_lifetime=self.settings_dict.get("POOL_RECYCLE", 1800),
+                check_after=self.settings_dict.get("POOL_CHECK_AFTER", 5),
+            )
+            pooled = self._pool.acquire(
+                check=(
+                    (lambda connection: connection.ping())
+                    if self.settings_dict["CONN_HEALTH_CHECKS"]
+                    else None
+                )
+            )
+            if pooled is not None:
+                metrics.record_connect(self.alias, reused=True)
+                connection, self._opened_at = pooled
+                return connection
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        metrics.record_connect(self.alias, time.perf_counter() - started)
+        self._opened_at = time.monotonic()
+        return connection
+
+    def _close(self):
+        if self._pool is None or self.connection is None or self.errors_occurred:
+            return super()._close()
+        try:
+            if not self.get_autocommit():
+                self.connection.rollback()
+        except mysql.Database.Error:
+            return super()._close()
+        self._pool.release(self.connection, self._opened_at)
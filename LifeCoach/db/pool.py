@@ -0,0 +1,91 @@
+"""
+Process-wide pools of open database connections.
+
+Django keeps one persistent connection per thread (CONN_MAX_AGE). Under
+ASGI the sync parts of every request run in a new thread, so each request
+still connects anew. A ConnectionPool keeps the raw DB-API connections
+released by any thread and hands them out again, most recently used first:
+those are the least likely to have been dropped by the server, and the
+rest age out. The pool bounds the idle connections it keeps, not the open
+ones; a connection released to a full pool is closed.
+"""
+
+import threading
+import time
+from collections import deque
+
+_lock = threading.Lock()
+# (alias, connection parameters) -> ConnectionPool
+POOLS = {}
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    def __init__(self, size, max_lifetime, check_after):
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.discarded = 0
+        # (connection, opened at, released at), the newest last
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._idle)
+
+    def acquire(self, check=None):
+        """
+        Returns (connection, opened at) of an idle connection or None.
+        Connections older than max_lifetime seconds are closed; check, a
+        callable raising on a broken connection, first tests the ones idle
+        for longer than check_after seconds.
+        """
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, opened, released = self._idle.pop()
+            now = time.monotonic()
+            try:
+                if now - opened > self.max_lifetime:
+                    raise TimeoutError
+                if check is not None and now - released > self.check_after:
+                    check(connection)
+            except Exception:
+                self.discarded += 1
+                _close_quietly(connection)
+                continue
+            return connection, opened
+
+    def release(self, connection, opened):
+        """Keeps the connection for reuse or closes it, True if kept."""
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((connection, opened, time.monotonic()))
+                return True
+        _close_quietly(connection)
+        return False
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _, _ in idle:
+            _close_quietly(connection)
+
+
+def get_pool(alias, params, size, max_lifetime, check_after):
+    """
+    The pool of the alias for the connection parameters; a test database or
+    changed settings get a pool of their own.
+    """
+    key = (alias, repr(sorted(params.items())))
+    with _lock:
+        if key not in POOLS:
+            POOLS[key] = ConnectionPool(size, max_lifetime, check_after)
+        return POOLS[key]
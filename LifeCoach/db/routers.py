@@ -0,0 +1,80 @@
+"""
+Read replica routing.
+
+Reads go to the replica database (REPLICA_DATABASE, "replica" by default)
+only inside replica_reads(), which the report and listing views enter
+through the read_from_replica decorator. Those pages may show data a moment
+behind the primary, so pages users land on right after a write stay on the
+primary. Writes and everything else use "default", and without a replica
+in DATABASES the router changes nothing.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def replica():
+    """Alias of the configured replica or None."""
+    alias = getattr(settings, "REPLICA_DATABASE", "replica")
+    return alias if alias in connections.settings else None
+
+
+@contextmanager
+def replica_reads():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_from_replica(test=None):
+    """
+    View decorator sending the reads of the view to the replica, for the
+    requests test(request) accepts if given. A TemplateResponse is rendered
+    within, so that its lazy querysets read from the replica too.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if test is not None and not test(request):
+                return view_func(request, *args, **kwargs)
+            with replica_reads():
+                response = view_func(request, *args, **kwargs)
+                if hasattr(response, "render") and not response.is_rendered:
+                    response.render()
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Also for objects read from the replica, which would be saved there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, replica()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db != DEFAULT_DB_ALIAS and db == replica():
+            return False
+        return None
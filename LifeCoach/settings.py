@@ -63,9 +63,11 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "accounts.middleware.UserProfileMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
+    "accounts.middleware.LastSeenMiddleware",
 ]
 
 ROOT_URLCONF = "LifeCoach.urls"
@@ -94,10 +96,19 @@ WSGI_APPLICATION = "LifeCoach.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# Connections stay open for DB_CONN_MAX_AGE seconds and are checked before
+# reuse. Under ASGI each request runs in a new thread and so opens a new
+# connection; DB_POOL_SIZE > 0 keeps up to that many idle connections per
+# process in a pool instead (LifeCoach/db/mysql/base.py). DB_REPLICA_HOST
+# adds a read replica for reports and listings (LifeCoach/db/routers.py).
+# Numbers of connections and queries: /metrics/db/ (staff only).
+
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "0"))
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.mysql",
+        "ENGINE": "LifeCoach.db.mysql",
         "NAME": "lifecoach",
         "USER": "judy",
         "PASSWORD": "judy",
@@ -106,12 +117,39 @@ DATABASES = {
         "OPTIONS": {
             "init_command": "SET sql_mode='STRICT_TRANS_TABLES'",
         },
+        # Closed connections go back to the pool, if any
+        "CONN_MAX_AGE": 0 if DB_POOL_SIZE else DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "POOL_SIZE": DB_POOL_SIZE,
+        "POOL_RECYCLE": int(os.getenv("DB_POOL_RECYCLE", "1800")),
         "TEST": {
             "NAME": "test_lifecoach",
         },
     }
 }
 
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+if DB_REPLICA_HOST:
+    DATABASES["replica"] = dict(
+        DATABASES["default"],
+        HOST=DB_REPLICA_HOST,
+        PORT=os.getenv("DB_REPLICA_PORT", "3306"),
+        TEST={"MIRROR": "default"},
+    )
+DATABASE_ROUTERS = ["LifeCoach.db.routers.ReplicaRouter"]
+
+# Cache
+# Template fragments (navbar, service cards, session rows) are keyed by
+# `updated` timestamps, so entries never need explicit deletion. Use a shared
+# backend (Redis, Memcached) in production so all workers reuse the fragments.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "lifecoach",
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -180,11 +218,21 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
 
+# Load testing: FAKE_EXTERNAL_SERVICES=1 replaces Google Calendar, PayPal and
+# SMTP by the local stand-ins of viewer/fakes.py, answering after
+# FAKE_SERVICE_LATENCY seconds. Start the fake PayPal with run_fake_paypal.
+FAKE_EXTERNAL_SERVICES = os.getenv("FAKE_EXTERNAL_SERVICES") == "1"
+FAKE_SERVICE_LATENCY = float(os.getenv("FAKE_SERVICE_LATENCY", "0.2"))
+if FAKE_EXTERNAL_SERVICES:
+    EMAIL_BACKEND = "viewer.fakes.EmailBackend"
+    PAYPAL_API_BASE = os.getenv("FAKE_PAYPAL_URL", "http://127.0.0.1:8001")
+
 # Authentication settings
 AUTH_USER_MODEL = "auth.User"
 AUTHENTICATION_BACKENDS = [
-    "django.contrib.auth.backends.ModelBackend",
-    "allauth.account.auth_backends.AuthenticationBackend",
+    # Load the user together with the profile
+    "accounts.backends.ModelBackend",
+    "accounts.backends.AuthenticationBackend",
 ]
 
 # Messages settings
@@ -0,0 +1,88 @@
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from django.template import engines
+from django.template.response import TemplateResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from LifeCoach.db import metrics
+from LifeCoach.db.pool import ConnectionPool
+from LifeCoach.db.routers import ReplicaRouter, read_from_replica
+from viewer.models import Service
+
+
+class FakeConnection:
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.closed = False
+
+    def ping(self):
+        if self.broken:
+            raise OSError("server has gone away")
+
+    def close(self):
+        self.closed = True
+
+
+class DatabaseTests(TestCase):
+    def test_pool_reuses_checks_and_recycles_connections(self):
+        pool = ConnectionPool(size=2, max_lifetime=60, check_after=-1)
+        first, second, third = FakeConnection(), FakeConnection(), FakeConnection()
+        self.assertIsNone(pool.acquire())
+        for connection in (first, second):
+            self.assertTrue(pool.release(connection, opened=10**9))
+        # The pool is full, the third connection gets closed
+        self.assertFalse(pool.release(third, opened=10**9))
+        self.assertTrue(third.closed)
+
+        # Most recently released first
+        self.assertIs(pool.acquire()[0], second)
+        second.broken = True
+        pool.release(second, opened=10**9)
+        self.assertIs(pool.acquire(check=FakeConnection.ping)[0], first)
+        self.assertTrue(second.closed)
+
+        # Too old
+        pool.release(first, opened=0)
+        self.assertIsNone(pool.acquire())
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.discarded, 2)
+
+    def test_replica_reads_within_decorated_views(self):
+        router = ReplicaRouter()
+        template = engines["django"].from_string("{{ database }}")
+
+        @read_from_replica()
+        def view(request):
+            # Rendered after the view returns, like the ListView templates
+            return TemplateResponse(
+                request, template, {"database": lambda: router.db_for_read(Service)}
+            )
+
+        request = RequestFactory().get("/")
+        # No replica configured, reads stay on the primary
+        self.assertEqual(view(request).content, b"None")
+        with override_settings(REPLICA_DATABASE=DEFAULT_DB_ALIAS):
+            self.assertEqual(view(request).content, b"default")
+            self.assertIsNone(router.db_for_read(Service))
+
+        service = Service(name="Read from the replica")
+        service._state.db = "replica"
+        self.assertEqual(router.db_for_write(Service, instance=service), "default")
+
+    def test_metrics_of_connections_and_queries(self):
+        metrics.reset()
+        list(Service.objects.all())
+        queries = metrics.snapshot()["databases"]["default"]["queries"]
+        self.assertGreaterEqual(queries["count"], 1)
+        self.assertIsNotNone(queries["ms"]["p50"])
+
+        url = reverse("db_metrics")
+        user = User.objects.create_user(username="user", password="testpass123")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        user.is_staff = True
+        user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("connections", response.json()["databases"]["default"])
@@ -20,9 +20,11 @@ from django.contrib import admin
 from django.urls import path, include
 
 from LifeCoach import settings
+from LifeCoach.db.metrics import metrics_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics/db/", metrics_view, name="db_metrics"),
     path("accounts/", include("accounts.urls", namespace="accounts")),
     path("", include("viewer.urls", namespace="viewer")),
     path("accounts/", include("allauth.urls")),
@@ -0,0 +1,91 @@
+"""
+Login activity (last login IP, last seen) of profiles.
+
+Recording only updates an in-process buffer; the buffered values are
+written in one UPDATE ... WHERE user_id IN (...) per flush, at most every
+LOGIN_ACTIVITY_FLUSH_SECONDS or once LOGIN_ACTIVITY_BATCH_SIZE users are
+waiting. Repeated requests of a user coalesce into one row of the batch,
+and the UPDATE doesn't touch Profile.updated, so activity never
+invalidates cached pages. Values not flushed when a process dies are lost,
+which is acceptable for this kind of data. LastSeenMiddleware records
+activity of authenticated requests.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.db.models import (
+    Case,
+    DateTimeField,
+    F,
+    GenericIPAddressField,
+    Value,
+    When,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Profile
+
+FLUSH_SECONDS = getattr(settings, "LOGIN_ACTIVITY_FLUSH_SECONDS", 60)
+BATCH_SIZE = getattr(settings, "LOGIN_ACTIVITY_BATCH_SIZE", 500)
+
+_lock = threading.Lock()
+_pending = {}  # user_id -> {"last_login_ip": ..., "last_seen": ...}
+_last_flush = time.monotonic()
+
+
+def client_ip(request):
+    return request.META.get("REMOTE_ADDR") or None
+
+
+def record(user_id, **values):
+    """Buffers activity values of a user and flushes when it is time."""
+    global _last_flush
+    with _lock:
+        _pending.setdefault(user_id, {}).update(values)
+        due = (
+            len(_pending) >= BATCH_SIZE
+            or time.monotonic() - _last_flush >= FLUSH_SECONDS
+        )
+    if due:
+        flush()
+
+
+def flush():
+    """Writes the buffered values, returns the number of users."""
+    global _last_flush, _pending
+    with _lock:
+        pending, _pending = _pending, {}
+        _last_flush = time.monotonic()
+    items = list(pending.items())
+    for start in range(0, len(items), BATCH_SIZE):
+        _write(dict(items[start : start + BATCH_SIZE]))
+    return len(items)
+
+
+def _write(batch):
+    """One UPDATE for the batch, fields a user has no new value for are kept."""
+    fields = {
+        "last_login_ip": GenericIPAddressField(),
+        "last_seen": DateTimeField(),
+    }
+    updates = {}
+    for name, output_field in fields.items():
+        whens = [
+            When(user_id=user_id, then=Value(row[name]))
+            for user_id, row in batch.items()
+            if name in row
+        ]
+        if whens:
+            updates[name] = Case(*whens, default=F(name), output_field=output_field)
+    Profile.objects.filter(user_id__in=batch).update(**updates)
+
+
+@receiver(user_logged_in)
+def record_login(sender, request, user, **kwargs):
+    if request is None:
+        return
+    record(user.pk, last_login_ip=client_ip(request), last_seen=timezone.now())
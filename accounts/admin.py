@@ -1,9 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-import pytz
 
-from accounts.models import Profile
+from accounts.models import ClientIntake, Profile
+from accounts.timezones import timezone_label
+from viewer.utils.bulk_admin import BulkImportExportMixin
+from viewer.utils.changelist import LargeTableMixin
 
 
 class ProfileInline(admin.StackedInline):
@@ -13,6 +15,13 @@ class ProfileInline(admin.StackedInline):
     fk_name = "user"
 
 
+class ClientIntakeInline(admin.StackedInline):
+    model = ClientIntake
+    can_delete = False
+    verbose_name_plural = "Intake questionnaire"
+    classes = ("collapse",)
+
+
 class CustomUserAdmin(UserAdmin):
     inlines = (ProfileInline,)
     list_display = (
@@ -58,7 +67,9 @@ class CustomUserAdmin(UserAdmin):
 
 
 @admin.register(Profile)
-class ProfileAdmin(admin.ModelAdmin):
+class ProfileAdmin(LargeTableMixin, BulkImportExportMixin, admin.ModelAdmin):
+    bulk_resource = "profile"
+    inlines = (ClientIntakeInline,)
     list_display = (
         "get_full_name",
         "user",
@@ -70,6 +81,7 @@ class ProfileAdmin(admin.ModelAdmin):
         "preferred_contact",
         "get_city_state",
     )
+    list_select_related = ("user",)
     list_filter = ("is_coach", "is_client", "is_admin", "timezone", "city", "state")
     search_fields = (
         "user__username",
@@ -82,13 +94,17 @@ class ProfileAdmin(admin.ModelAdmin):
         "state",
     )
     raw_id_fields = ("user",)
-    readonly_fields = ("user",)
+    readonly_fields = ("user", "last_login_ip", "last_seen")
     fieldsets = (
         (
             "User Information",
             {"fields": ("user", "phone", "timezone", "preferred_contact")},
         ),
         ("Role", {"fields": ("is_coach", "is_client", "is_admin")}),
+        (
+            "Booking",
+            {"fields": ("slot_granularity", "booking_horizon_days")},
+        ),
         (
             "Personal Information",
             {
@@ -111,6 +127,10 @@ class ProfileAdmin(admin.ModelAdmin):
                 "classes": ("collapse",),
             },
         ),
+        (
+            "Activity",
+            {"fields": ("last_login_ip", "last_seen"), "classes": ("collapse",)},
+        ),
     )
 
     def get_full_name(self, obj):
@@ -129,22 +149,7 @@ class ProfileAdmin(admin.ModelAdmin):
     get_city_state.short_description = "Location"
 
     def get_timezone_display(self, obj):
-        try:
-            tz = pytz.timezone(obj.timezone)
-            now = pytz.datetime.datetime.now(tz)
-            # Získání popisu časového pásma
-            tzname = tz.tzname(now)
-            # Pokus o srozumitelný popis
-            tzdesc = (
-                tz._tzname
-                if hasattr(tz, "_tzname") and tz._tzname
-                else tz.zone.replace("_", " ")
-            )
-            # Pokud je k dispozici oficiální popis v pytz.common_timezones, použijeme jej
-            pretty = tz.zone.replace("_", " ")
-            return f"{obj.timezone} ({now.strftime('%z')}) – {tzname if tzname else pretty}"
-        except Exception:
-            return obj.timezone
+        return timezone_label(obj.timezone)
 
     get_timezone_display.short_description = "Timezone"
     get_timezone_display.admin_order_field = "timezone"
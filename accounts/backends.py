@@ -0,0 +1,47 @@
+"""
+Authentication backends that load the session's user together with the
+profile, so request.user.profile and the role checks built on it cost no
+extra query.
+"""
+
+from allauth.account import auth_backends
+from django.contrib.auth import backends, get_user_model
+
+
+class ProfileUserMixin:
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related("profile").get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        # request.auser() of the async views, ModelBackend's own doesn't
+        # call get_user()
+        UserModel = get_user_model()
+        try:
+            user = await UserModel._default_manager.select_related("profile").aget(
+                pk=user_id
+            )
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+class ModelBackend(ProfileUserMixin, backends.ModelBackend):
+    pass
+
+
+class AuthenticationBackend(ProfileUserMixin, auth_backends.AuthenticationBackend):
+    pass
+
+
+# Backends stored in sessions created before these ones
+LEGACY_BACKENDS = {
+    "django.contrib.auth.backends.ModelBackend": "accounts.backends.ModelBackend",
+    "allauth.account.auth_backends.AuthenticationBackend": (
+        "accounts.backends.AuthenticationBackend"
+    ),
+}
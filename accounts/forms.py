@@ -19,6 +19,8 @@ from crispy_forms.bootstrap import FormActions
 import re
 
 from accounts.models import (
+    INTAKE_FIELDS,
+    ClientIntake,
     Profile,
     PHONE_PREFIXES,
     SPECIALIZATION_CHOICES,
@@ -26,9 +28,9 @@ from accounts.models import (
     MARITAL_STATUS_CHOICES,
     MEDICAL_CONDITIONS,
     REFERRAL_SOURCES,
-    TIMEZONE_CHOICES,
     CONTACT_CHOICES,
 )
+from accounts.timezones import timezone_choices
 
 
 class SignUpForm(UserCreationForm):
@@ -383,6 +385,14 @@ class SignUpForm(UserCreationForm):
             occupation=self.cleaned_data.get("occupation"),
             # Contact Information
             phone=f"{self.cleaned_data.get('phone_prefix')}{self.cleaned_data.get('phone')}",
+            # Goals and Interests
+            specialization=self.cleaned_data.get("specialization"),
+            # Set default values
+            is_coach=False,
+            is_client=True,
+        )
+        intake = ClientIntake(
+            profile=profile,
             # Medical History
             emotional_treatment_history=(
                 self.cleaned_data.get("emotional_treatment_explanation")
@@ -391,16 +401,12 @@ class SignUpForm(UserCreationForm):
             ),
             medical_conditions=self.cleaned_data.get("medical_conditions", []),
             # Goals and Interests
-            specialization=self.cleaned_data.get("specialization"),
             fears_phobias=self.cleaned_data.get("fears_phobias"),
             # Referral Information
             referral_source=self.cleaned_data.get("referral_source"),
             referral_source_other=self.cleaned_data.get("referral_source_other"),
             # Consent
             therapy_consent=self.cleaned_data.get("therapy_consent", False),
-            # Set default values
-            is_coach=False,
-            is_client=True,
         )
 
         # Generate bio if specialization is set
@@ -409,6 +415,7 @@ class SignUpForm(UserCreationForm):
 
         if commit:
             profile.save()
+            intake.save()
         return user
 
 
@@ -446,6 +453,8 @@ class ProfileUpdateForm(ModelForm):
             "preferred_contact",
             "notifications_enabled",
             "avatar",
+            "slot_granularity",
+            "booking_horizon_days",
         ]
         labels = {
             "phone": "Phone Number",
@@ -455,6 +464,8 @@ class ProfileUpdateForm(ModelForm):
             "avatar": "Profile Picture",
             "bio": "Biography",
             "specialization": "Specialization",
+            "slot_granularity": "Slot Interval",
+            "booking_horizon_days": "Booking Horizon (days)",
         }
         widgets = {
             "bio": Textarea(attrs={"rows": 4, "class": "form-control"}),
@@ -544,7 +555,7 @@ class ClientProfileUpdateForm(ModelForm):
     occupation = forms.CharField(max_length=100, required=False, label="Occupation")
     phone = forms.CharField(label="Mobile Phone", required=False)
     timezone = forms.ChoiceField(
-        choices=TIMEZONE_CHOICES, required=True, label="Time Zone"
+        choices=timezone_choices, required=True, label="Time Zone"
     )
     emotional_treatment_history = forms.CharField(
         required=False,
@@ -566,6 +577,22 @@ class ClientProfileUpdateForm(ModelForm):
     referral_source_other = forms.CharField(
         required=False, label="Other Referral Source"
     )
+    hypnosis_experience = forms.CharField(
+        required=False,
+        label="Hypnosis experience",
+        widget=forms.Textarea(attrs={"rows": 2}),
+    )
+    hypnosis_goals = forms.CharField(
+        required=False, label="Hypnosis goals", widget=forms.Textarea(attrs={"rows": 2})
+    )
+    previous_solution_attempts = forms.CharField(
+        required=False,
+        label="Previous solution attempts",
+        widget=forms.Textarea(attrs={"rows": 2}),
+    )
+    hypnotherapy_consent = forms.BooleanField(
+        required=False, label="Hypnotherapy consent"
+    )
     preferred_contact = forms.ChoiceField(
         choices=CONTACT_CHOICES, required=False, label="Preferred Contact Method"
     )
@@ -574,20 +601,33 @@ class ClientProfileUpdateForm(ModelForm):
     )
     avatar = forms.ImageField(required=False, label="Profile Picture")
 
+    # Pole dotazníku se ukládají do ClientIntake
+    intake_fields = [name for name in INTAKE_FIELDS if name != "therapy_consent"]
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.instance and self.instance.user:
             self.initial["first_name"] = self.instance.user.first_name
             self.initial["last_name"] = self.instance.user.last_name
+        if self.instance.pk:
+            intake = self.instance.get_intake()
+            for name in self.intake_fields:
+                self.initial.setdefault(name, getattr(intake, name))
 
     def save(self, commit=True):
         profile = super().save(commit=False)
         user = profile.user
         user.first_name = self.cleaned_data["first_name"]
         user.last_name = self.cleaned_data["last_name"]
+        intake = profile.get_intake()
+        for name in self.intake_fields:
+            setattr(intake, name, self.cleaned_data.get(name))
         if commit:
             user.save()
             profile.save()
+            # Prázdný dotazník se neukládá
+            if not intake._state.adding or not intake.is_empty():
+                intake.save()
         return profile
 
     class Meta:
@@ -600,5 +640,8 @@ class ClientProfileUpdateForm(ModelForm):
             "is_client",
             "user",
             "last_login_ip",
+            "last_seen",
             "google_refresh_token",
+            "slot_granularity",
+            "booking_horizon_days",
         ]
@@ -0,0 +1,24 @@
+import os
+from django.conf import settings
+
+# Path to your credentials.json
+GOOGLE_CLIENT_SECRETS_FILE = os.path.join(
+    settings.BASE_DIR, "config", "credentials.json"
+)
+GOOGLE_SCOPES = ["https://www.googleapis.com/auth/calendar.events"]
+
+
+def build_flow(redirect_uri, state=None):
+    """
+    OAuth2 flow for connecting a coach's Google Calendar.
+    google_auth_oauthlib is imported here so that it is only loaded by the
+    two OAuth views, not by every worker at startup.
+    """
+    from google_auth_oauthlib.flow import Flow
+
+    return Flow.from_client_secrets_file(
+        GOOGLE_CLIENT_SECRETS_FILE,
+        scopes=GOOGLE_SCOPES,
+        state=state,
+        redirect_uri=redirect_uri,
+    )
@@ -1,21 +1,124 @@
-from django.core.management.base import BaseCommand
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+
 from accounts.models import Profile
 
 
 class Command(BaseCommand):
     help = "Creates missing user profiles"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Profiles created per bulk insert",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the users without a profile",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Parallel workers, each backfilling its own range of user ids",
+        )
+
     def handle(self, *args, **options):
-        users_without_profile = User.objects.filter(profile__isnull=True)
-        created_count = 0
+        batch_size = options["batch_size"]
+        workers = options["workers"]
+        if batch_size < 1 or workers < 1:
+            raise CommandError("--batch-size and --workers must be positive")
+
+        missing = User.objects.filter(profile__isnull=True)
+        if options["dry_run"]:
+            count = missing.count()
+            self.stdout.write(
+                f"Dry run: {count} user(s) without a profile, "
+                f"{-(-count // batch_size)} batch(es) of {batch_size}"
+            )
+            return
+
+        bounds = missing.aggregate(first=Min("pk"), last=Max("pk"))
+        if bounds["first"] is None:
+            self.stdout.write(self.style.SUCCESS("No missing profiles"))
+            return
 
-        for user in users_without_profile:
-            Profile.objects.create(user=user)
-            created_count += 1
+        self.started = time.perf_counter()
+        self.created_total = 0
+        self.lock = threading.Lock()
+        # Disjoint id ranges, so the workers never insert the same profile
+        step = -(-(bounds["last"] - bounds["first"] + 1) // workers)
+        ranges = [
+            (first, min(first + step - 1, bounds["last"]))
+            for first in range(bounds["first"], bounds["last"] + 1, step)
+        ]
+        if workers == 1:
+            created = self.backfill(*ranges[0], batch_size)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                created = sum(
+                    executor.map(
+                        lambda id_range: self.worker(*id_range, batch_size), ranges
+                    )
+                )
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"Successfully created {created_count} missing profile(s)"
+                f"Successfully created {created} missing profile(s) "
+                f"in {time.perf_counter() - self.started:.1f} s"
             )
         )
+
+    def backfill(self, first_id, last_id, batch_size):
+        """
+        Creates the missing profiles of users first_id..last_id in batches,
+        paging by primary key instead of OFFSET. bulk_create sends no
+        post_save signals, so no cascading profile saves happen.
+        """
+        created = 0
+        last_seen = first_id - 1
+        while True:
+            user_ids = list(
+                User.objects.filter(
+                    profile__isnull=True, pk__gt=last_seen, pk__lte=last_id
+                )
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not user_ids:
+                return created
+            # A profile created meanwhile by the signal is skipped and not
+            # counted; ignore_conflicts leaves no other way to tell
+            profiles = Profile.objects.filter(user_id__in=user_ids)
+            existing = profiles.count()
+            Profile.objects.bulk_create(
+                [Profile(user_id=user_id) for user_id in user_ids],
+                ignore_conflicts=True,
+            )
+            inserted = profiles.count() - existing
+            created += inserted
+            last_seen = user_ids[-1]
+            self.report_progress(inserted)
+
+    def worker(self, first_id, last_id, batch_size):
+        try:
+            return self.backfill(first_id, last_id, batch_size)
+        finally:
+            # Every thread opens its own database connection
+            connections.close_all()
+
+    def report_progress(self, count):
+        with self.lock:
+            self.created_total += count
+            total = self.created_total
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f"{total} profile(s) created ({total / elapsed:.0f}/s)")
@@ -0,0 +1,66 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.utils import timezone
+
+from .activity import record
+from .backends import LEGACY_BACKENDS
+
+
+class HybridMiddleware:
+    """
+    Base of middleware running natively both under WSGI and ASGI, so that
+    async views are not pushed through a shared sync thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.call(request)
+
+
+class UserProfileMiddleware(HybridMiddleware):
+    """
+    Makes request.user load with its profile in one query (see backends.py),
+    also for sessions logged in through the previous backends. Must follow
+    AuthenticationMiddleware, whose lazy user is resolved only later.
+    """
+
+    def call(self, request):
+        backend = request.session.get(BACKEND_SESSION_KEY)
+        if backend in LEGACY_BACKENDS:
+            request.session[BACKEND_SESSION_KEY] = LEGACY_BACKENDS[backend]
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        backend = await request.session.aget(BACKEND_SESSION_KEY)
+        if backend in LEGACY_BACKENDS:
+            await request.session.aset(BACKEND_SESSION_KEY, LEGACY_BACKENDS[backend])
+        return await self.get_response(request)
+
+
+class LastSeenMiddleware(HybridMiddleware):
+    """Records when an authenticated user was last active, see activity.py."""
+
+    def call(self, request):
+        response = self.get_response(request)
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            record(user.pk, last_seen=timezone.now())
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if hasattr(request, "auser"):
+            user = await request.auser()
+            if user.is_authenticated:
+                # Usually only buffers, a due flush writes to the database
+                await sync_to_async(record)(user.pk, last_seen=timezone.now())
+        return response
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-19 11:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0007_profile_is_admin"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="updated",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 10:51
+
+import accounts.timezones
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0008_profile_updated"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="profile",
+            name="timezone",
+            field=models.CharField(
+                choices=accounts.timezones.timezone_choices,
+                default="UTC",
+                max_length=50,
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 10:54
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0009_profile_timezone_choices"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="booking_horizon_days",
+            field=models.PositiveSmallIntegerField(
+                default=7,
+                help_text="How many days ahead clients can book",
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(90),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="slot_granularity",
+            field=models.PositiveSmallIntegerField(
+                choices=[(15, "15 minutes"), (30, "30 minutes"), (60, "60 minutes")],
+                default=60,
+                help_text="Minutes between offered slot start times",
+            ),
+        ),
+    ]
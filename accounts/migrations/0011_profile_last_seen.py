@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0010_coach_booking_settings"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="last_seen",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
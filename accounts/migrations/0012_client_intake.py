@@ -0,0 +1,147 @@
+# Generated by Django 5.2 on 2026-10-19 11:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+INTAKE_FIELDS = [
+    "emotional_treatment_history",
+    "medical_conditions",
+    "hypnosis_experience",
+    "hypnosis_goals",
+    "previous_solution_attempts",
+    "fears_phobias",
+    "referral_source",
+    "referral_source_other",
+    "therapy_consent",
+    "hypnotherapy_consent",
+]
+BATCH_SIZE = 1000
+
+
+def copy_intake(apps, schema_editor):
+    """Intake rows only for profiles with some questionnaire data."""
+    Profile = apps.get_model("accounts", "Profile")
+    ClientIntake = apps.get_model("accounts", "ClientIntake")
+    rows = Profile.objects.order_by().values_list("pk", *INTAKE_FIELDS)
+    batch = []
+    for pk, *values in rows.iterator(chunk_size=BATCH_SIZE):
+        if any(values):
+            batch.append(
+                ClientIntake(profile_id=pk, **dict(zip(INTAKE_FIELDS, values)))
+            )
+        if len(batch) == BATCH_SIZE:
+            ClientIntake.objects.bulk_create(batch)
+            batch = []
+    ClientIntake.objects.bulk_create(batch)
+
+
+def restore_intake(apps, schema_editor):
+    Profile = apps.get_model("accounts", "Profile")
+    ClientIntake = apps.get_model("accounts", "ClientIntake")
+    for intake in ClientIntake.objects.iterator(chunk_size=BATCH_SIZE):
+        Profile.objects.filter(pk=intake.profile_id).update(
+            **{name: getattr(intake, name) for name in INTAKE_FIELDS}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0011_profile_last_seen"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClientIntake",
+            fields=[
+                (
+                    "profile",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="intake",
+                        serialize=False,
+                        to="accounts.profile",
+                    ),
+                ),
+                (
+                    "emotional_treatment_history",
+                    models.TextField(blank=True, null=True),
+                ),
+                (
+                    "medical_conditions",
+                    models.JSONField(blank=True, default=list, null=True),
+                ),
+                ("hypnosis_experience", models.TextField(blank=True, null=True)),
+                ("hypnosis_goals", models.TextField(blank=True, null=True)),
+                ("previous_solution_attempts", models.TextField(blank=True, null=True)),
+                ("fears_phobias", models.TextField(blank=True, null=True)),
+                (
+                    "referral_source",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("medical_referral", "Medical Referral"),
+                            ("relative", "Relative"),
+                            ("friend", "Friend"),
+                            ("newspaper", "Newspaper"),
+                            ("radio", "Radio"),
+                            ("television", "Television"),
+                            ("phone_book", "Phone Book"),
+                            ("other", "Other"),
+                        ],
+                        max_length=50,
+                        null=True,
+                    ),
+                ),
+                (
+                    "referral_source_other",
+                    models.CharField(blank=True, max_length=100, null=True),
+                ),
+                ("therapy_consent", models.BooleanField(default=False)),
+                ("hypnotherapy_consent", models.BooleanField(default=False)),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(copy_intake, restore_intake),
+        migrations.RemoveField(
+            model_name="profile",
+            name="emotional_treatment_history",
+        ),
+        migrations.RemoveField(
+            model_name="profile",
+            name="fears_phobias",
+        ),
+        migrations.RemoveField(
+            model_name="profile",
+            name="hypnosis_experience",
+        ),
+        migrations.RemoveField(
+            model_name="profile",
+            name="hypnosis_goals",
+        ),
+        migrations.RemoveField(
+            model_name="profile",
+            name="hypnotherapy_consent",
+        ),
+        migrations.RemoveField(
+            model_name="profile",
+            name="medical_conditions",
+        ),
+        migrations.RemoveField(
+            model_name="profile",
+            name="previous_solution_attempts",
+        ),
+        migrations.RemoveField(
+            model_name="profile",
+            name="referral_source",
+        ),
+        migrations.RemoveField(
+            model_name="profile",
+            name="referral_source_other",
+        ),
+        migrations.RemoveField(
+            model_name="profile",
+            name="therapy_consent",
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.contrib.auth.models import User
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.db.models import (
     Model,
@@ -8,7 +9,8 @@ from django.db.models import (
     TextField,
     ManyToManyField,
 )
-import pytz
+
+from accounts.timezones import timezone_choices, zone_or_default
 
 CONTACT_CHOICES = [
     ("email", "Email"),
@@ -16,8 +18,6 @@ CONTACT_CHOICES = [
     ("both", "Both Email and Phone"),
 ]
 
-TIMEZONE_CHOICES = [(tz, tz) for tz in pytz.all_timezones]
-
 PHONE_PREFIXES = [
     ("+1", "United States (+1)"),
     ("+420", "Czech Republic (+420)"),
@@ -60,6 +60,12 @@ MEDICAL_CONDITIONS = [
     ("digestive_problems", "Digestive Problems"),
 ]
 
+SLOT_GRANULARITY_CHOICES = [
+    (15, "15 minutes"),
+    (30, "30 minutes"),
+    (60, "60 minutes"),
+]
+
 REFERRAL_SOURCES = [
     ("medical_referral", "Medical Referral"),
     ("relative", "Relative"),
@@ -77,13 +83,14 @@ class Profile(Model):
     date_of_birth = DateField(null=True, blank=True)
     phone = TextField(null=True, blank=True)
     bio = TextField(null=True, blank=True)
-    timezone = models.CharField(max_length=50, choices=TIMEZONE_CHOICES, default="UTC")
+    timezone = models.CharField(max_length=50, choices=timezone_choices, default="UTC")
     preferred_contact = models.CharField(
         max_length=20, choices=CONTACT_CHOICES, default="email"
     )
     notifications_enabled = models.BooleanField(default=True)
     avatar = models.ImageField(upload_to="avatars/", null=True, blank=True)
     last_login_ip = models.GenericIPAddressField(null=True, blank=True)
+    last_seen = models.DateTimeField(null=True, blank=True)
     is_coach = models.BooleanField(default=False)
     is_client = models.BooleanField(default=True)
     is_admin = models.BooleanField(default=False)
@@ -107,28 +114,28 @@ class Profile(Model):
     )
     occupation = models.CharField(max_length=100, blank=True, null=True)
 
-    # Medical History
-    emotional_treatment_history = models.TextField(blank=True, null=True)
-    medical_conditions = models.JSONField(default=list, blank=True, null=True)
-    hypnosis_experience = models.TextField(blank=True, null=True)
+    # Intake questionnaire and medical data are in ClientIntake
 
-    # Goals and Concerns
-    hypnosis_goals = models.TextField(blank=True, null=True)
-    previous_solution_attempts = models.TextField(blank=True, null=True)
-    fears_phobias = models.TextField(blank=True, null=True)
+    # Google refresh token
+    google_refresh_token = models.CharField(max_length=255, blank=True, null=True)
 
-    # Referral Information
-    referral_source = models.CharField(
-        max_length=50, choices=REFERRAL_SOURCES, blank=True, null=True
+    # Booking settings (coach)
+    slot_granularity = models.PositiveSmallIntegerField(
+        choices=SLOT_GRANULARITY_CHOICES,
+        default=60,
+        help_text="Minutes between offered slot start times",
+    )
+    booking_horizon_days = models.PositiveSmallIntegerField(
+        default=7,
+        validators=[MinValueValidator(1), MaxValueValidator(90)],
+        help_text="How many days ahead clients can book",
     )
-    referral_source_other = models.CharField(max_length=100, blank=True, null=True)
 
-    # Consent
-    therapy_consent = models.BooleanField(default=False)
-    hypnotherapy_consent = models.BooleanField(default=False)
+    # Hodnocení koučových sezení, udržuje viewer.ratings
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
 
-    # Google refresh token
-    google_refresh_token = models.CharField(max_length=255, blank=True, null=True)
+    updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["user__username"]
@@ -139,12 +146,16 @@ class Profile(Model):
     def __str__(self):
         return self.user.username
 
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
     def get_timezone(self):
-        return pytz.timezone(self.timezone)
+        return zone_or_default(self.timezone)
 
     def set_last_login_ip(self, ip_address):
         self.last_login_ip = ip_address
-        self.save()
+        self.save(update_fields=["last_login_ip"])
 
     def get_goals_list(self):
         """Returns goals as a list."""
@@ -161,6 +172,48 @@ class Profile(Model):
             parts.append(f"I specialize in {self.specialization}.")
         return " ".join(parts) if parts else ""
 
+    def get_intake(self):
+        """Intake data of the profile, an unsaved empty one when not filled in."""
+        try:
+            return self.intake
+        except ClientIntake.DoesNotExist:
+            return ClientIntake(profile=self)
+
+
+class ClientIntake(Model):
+    """
+    Intake questionnaire of a client. Kept out of Profile, which is loaded
+    on every request, and read only on the profile and client pages.
+    """
+
+    profile = OneToOneField(
+        Profile, on_delete=CASCADE, primary_key=True, related_name="intake"
+    )
+    # Medical History
+    emotional_treatment_history = models.TextField(blank=True, null=True)
+    medical_conditions = models.JSONField(default=list, blank=True, null=True)
+    hypnosis_experience = models.TextField(blank=True, null=True)
+
+    # Goals and Concerns
+    hypnosis_goals = models.TextField(blank=True, null=True)
+    previous_solution_attempts = models.TextField(blank=True, null=True)
+    fears_phobias = models.TextField(blank=True, null=True)
+
+    # Referral Information
+    referral_source = models.CharField(
+        max_length=50, choices=REFERRAL_SOURCES, blank=True, null=True
+    )
+    referral_source_other = models.CharField(max_length=100, blank=True, null=True)
+
+    # Consent
+    therapy_consent = models.BooleanField(default=False)
+    hypnotherapy_consent = models.BooleanField(default=False)
+
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Intake of {self.profile}"
+
     def get_medical_conditions(self):
         """Returns medical conditions as a list."""
         return self.medical_conditions or []
@@ -168,3 +221,14 @@ class Profile(Model):
     def set_medical_conditions(self, conditions):
         """Sets medical conditions from a list."""
         self.medical_conditions = conditions if conditions else []
+
+    def is_empty(self):
+        return not any(getattr(self, name) for name in INTAKE_FIELDS)
+
+
+# Questionnaire fields of ClientIntake
+INTAKE_FIELDS = [
+    field.name
+    for field in ClientIntake._meta.concrete_fields
+    if field.name not in ("profile", "updated")
+]
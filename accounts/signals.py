@@ -1,4 +1,4 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete
 from django.contrib.auth.models import User
 from django.dispatch import receiver
 from .models import Profile
@@ -11,10 +11,39 @@ def create_user_profile(sender, instance, created, **kwargs):
         Profile.objects.create(user=instance)
 
 
+# Uživatelská pole zobrazovaná s profilem (navbar, about me), jejich změna
+# musí posunout Profile.updated, podle kterého se invalidují cache a ETagy
+PROFILE_USER_FIELDS = ("first_name", "last_name", "email")
+
+
+def _profile_user_values(user):
+    # __dict__, aby se nenačítala odložená (deferred) pole
+    return tuple(user.__dict__.get(name) for name in PROFILE_USER_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_profile_user_values(sender, instance, **kwargs):
+    instance._profile_user_values = _profile_user_values(instance)
+
+
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Uloží profil při uložení uživatele"""
-    instance.profile.save()
+def save_user_profile(sender, instance, created, update_fields, **kwargs):
+    """
+    Synchronizuje profil jen při změně polí z PROFILE_USER_FIELDS. Uložení
+    last_login při přihlášení ani změna hesla do profilu nezapisují.
+    """
+    if update_fields is not None and update_fields.isdisjoint(PROFILE_USER_FIELDS):
+        return
+    values = _profile_user_values(instance)
+    changed = values != instance._profile_user_values
+    instance._profile_user_values = values
+    if created or not changed:
+        return
+    try:
+        profile = instance.profile
+    except Profile.DoesNotExist:
+        return
+    profile.save(update_fields=["updated"])
 
 
 @receiver(post_delete, sender=User)
@@ -3,6 +3,8 @@ from django.urls import reverse
 from django.contrib.auth.models import User
 from .models import Profile
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+import datetime
 import os
 
 
@@ -72,6 +74,40 @@ class AccountsTests(TestCase):
             response.status_code, 302
         )  # Přesměrování po úspěšném přihlášení
 
+    def test_login_does_not_write_profile(self):
+        """Přihlášení uloží jen last_login, profil se nenačítá ani neukládá"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from accounts import activity
+
+        activity.flush()
+
+        # uživatel, vytvoření session, last_login, uložení session
+        with self.assertNumQueries(9), CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("accounts:login"),
+                {"username": "testuser", "password": "testpass123"},
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(
+            [query for query in queries if "accounts_profile" in query["sql"]]
+        )
+
+    def test_name_change_touches_profile(self):
+        """Změna jména posune Profile.updated, změna hesla ne"""
+        updated = self.profile.updated
+        self.user.set_password("otherpass123")
+        with self.assertNumQueries(1):
+            self.user.save()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.updated, updated)
+
+        self.user.first_name = "Jana"
+        self.user.save()
+        self.profile.refresh_from_db()
+        self.assertGreater(self.profile.updated, updated)
+
     def test_profile_view(self):
         """Test zobrazení profilu"""
         self.client.login(username="testuser", password="testpass123")
@@ -113,6 +149,42 @@ class AccountsTests(TestCase):
         self.assertEqual(updated_profile.phone, "999888777")
         self.assertEqual(updated_profile.timezone, "Europe/Prague")
 
+    def test_profile_edit_saves_intake(self):
+        """Dotazník se ukládá do ClientIntake, Profile ho neobsahuje"""
+        from accounts.models import ClientIntake
+
+        self.client.login(username="testuser", password="testpass123")
+        data = {
+            "first_name": "Test",
+            "last_name": "User",
+            "street_address": "Test Street 123",
+            "city": "Test City",
+            "state": "Test State",
+            "zip_code": "12345",
+            "date_of_birth": "1990-01-01",
+            "sex": "F",
+            "phone_prefix": "+1",
+            "phone": "123456789",
+            "timezone": "UTC",
+        }
+        self.client.post(reverse("accounts:profile_edit"), data)
+        self.assertFalse(ClientIntake.objects.exists())
+
+        data.update(fears_phobias="Heights", medical_conditions=["epilepsy"])
+        response = self.client.post(reverse("accounts:profile_edit"), data)
+        self.assertEqual(response.status_code, 302)
+        intake = ClientIntake.objects.get(profile=self.profile)
+        self.assertEqual(intake.fears_phobias, "Heights")
+        self.assertEqual(intake.get_medical_conditions(), ["epilepsy"])
+        self.assertNotIn(
+            "fears_phobias", [field.name for field in Profile._meta.concrete_fields]
+        )
+
+        response = self.client.get(
+            reverse("accounts:profile", kwargs={"pk": self.profile.pk})
+        )
+        self.assertContains(response, "Heights")
+
     def test_avatar_upload(self):
         """Test nahrávání avatara"""
         self.client.login(username="testuser", password="testpass123")
@@ -179,3 +251,147 @@ class AccountsTests(TestCase):
         self.client.logout()
         login_successful = self.client.login(username="testuser", password="newpass123")
         self.assertTrue(login_successful)
+
+
+class TimezoneTests(TestCase):
+    def test_get_zone_is_cached(self):
+        from accounts.timezones import get_zone
+
+        self.assertIs(get_zone("Europe/Prague"), get_zone("Europe/Prague"))
+        self.assertIsNone(get_zone("Mars/Olympus_Mons"))
+        self.assertIsNone(get_zone(""))
+
+    def test_profile_timezone_fallback(self):
+        user = User.objects.create_user(username="tzuser", password="testpass123")
+        profile = user.profile
+        profile.timezone = "America/New_York"
+        self.assertEqual(str(profile.get_timezone()), "America/New_York")
+        profile.timezone = "Invalid/Zone"
+        self.assertEqual(str(profile.get_timezone()), "UTC")
+
+
+class LoginActivityTests(TestCase):
+    def test_activity_is_flushed_in_one_update(self):
+        from accounts import activity
+
+        activity.flush()
+        users = [
+            User.objects.create_user(username=f"active{i}", password="testpass123")
+            for i in range(3)
+        ]
+        for user in users:
+            self.client.post(
+                reverse("accounts:login"),
+                {"username": user.username, "password": "testpass123"},
+                REMOTE_ADDR="10.0.0.7",
+            )
+        self.assertFalse(Profile.objects.filter(last_seen__isnull=False).exists())
+
+        updated = users[0].profile.updated
+        with self.assertNumQueries(1):
+            self.assertEqual(activity.flush(), 3)
+        profiles = Profile.objects.filter(user__in=users)
+        self.assertEqual(
+            {(p.last_login_ip, p.last_seen is not None) for p in profiles},
+            {("10.0.0.7", True)},
+        )
+        # Aktivita neinvaliduje cache odvozené z Profile.updated
+        self.assertEqual(profiles.get(user=users[0]).updated, updated)
+
+
+class CreateMissingProfilesTests(TestCase):
+    def test_backfill_in_batches(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        # bulk_create does not send post_save, so these users have no profile
+        User.objects.bulk_create(User(username=f"bulk{i}") for i in range(5))
+        out = StringIO()
+        call_command(
+            "create_missing_profiles", "--dry-run", "--batch-size", "2", stdout=out
+        )
+        self.assertIn("5 user(s) without a profile, 3 batch(es)", out.getvalue())
+        self.assertFalse(
+            Profile.objects.filter(user__username__startswith="bulk").exists()
+        )
+
+        call_command("create_missing_profiles", "--batch-size", "2", stdout=out)
+        self.assertIn("Successfully created 5 missing profile(s)", out.getvalue())
+        self.assertFalse(User.objects.filter(profile__isnull=True).exists())
+
+    def test_profiles_created_meanwhile_are_not_counted(self):
+        from io import StringIO
+        from unittest import mock
+
+        from django.core.management import call_command
+
+        users = User.objects.bulk_create(User(username=f"bulk{i}") for i in range(3))
+        filter_profiles = Profile.objects.filter
+
+        def racing_filter(**kwargs):
+            # The signal creates one of them after the users were selected
+            Profile.objects.get_or_create(user=users[0])
+            return filter_profiles(**kwargs)
+
+        out = StringIO()
+        with mock.patch.object(Profile.objects, "filter", racing_filter):
+            call_command("create_missing_profiles", stdout=out)
+        self.assertIn("Successfully created 2 missing profile(s)", out.getvalue())
+        self.assertFalse(User.objects.filter(profile__isnull=True).exists())
+
+
+class ClientListTests(TestCase):
+    def setUp(self):
+        from viewer.models import Service, Session
+
+        self.coach = User.objects.create_user(username="coach", password="testpass123")
+        self.coach.profile.is_coach = True
+        self.coach.profile.save()
+        service = Service.objects.create(
+            name="Coaching", price=100, duration=60, coach=self.coach
+        )
+        self.clients = []
+        for i, (first_name, sessions) in enumerate([("Alena", 2), ("Boris", 1)]):
+            user = User.objects.create_user(
+                username=f"client{i}",
+                password="testpass123",
+                first_name=first_name,
+                email=f"client{i}@example.com",
+            )
+            self.clients.append(user.profile)
+            for day in range(sessions):
+                Session.objects.create(
+                    client=user.profile,
+                    coach=self.coach.profile,
+                    service=service,
+                    duration=60,
+                    date_time=timezone.now() + datetime.timedelta(days=day + 1),
+                )
+        # Klient bez rezervace u kouče se nezobrazí
+        User.objects.create_user(username="stranger")
+
+    def test_coach_sees_own_clients_with_session_stats(self):
+        self.client.login(username="coach", password="testpass123")
+        url = reverse("accounts:client_list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        clients = list(response.context["clients"])
+        self.assertEqual(clients, self.clients)
+        self.assertEqual([client.session_count for client in clients], [2, 1])
+
+        response = self.client.get(url, {"q": "boris EXAMPLE"})
+        self.assertEqual(list(response.context["clients"]), self.clients[1:])
+
+    def test_page_queries_do_not_grow_with_clients(self):
+        self.client.login(username="coach", password="testpass123")
+        url = reverse("accounts:client_list")
+        self.client.get(url)
+        # session, uživatel s profilem, počet klientů, stránka klientů
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+    def test_client_cannot_list_clients(self):
+        self.client.login(username="client0", password="testpass123")
+        response = self.client.get(reverse("accounts:client_list"))
+        self.assertNotEqual(response.status_code, 200)
@@ -0,0 +1,62 @@
+"""
+Timezone lookups shared by profiles, forms, the admin and slot generation.
+
+Uses the standard library ``zoneinfo`` instead of pytz: aware datetimes work
+with plain ``astimezone``/``make_aware`` and no ``localize``/``normalize``
+round trips are needed.
+"""
+
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+from django.utils import timezone
+
+
+@lru_cache(maxsize=1)
+def timezone_choices():
+    """All IANA timezone names as choices, built on first use only."""
+    return [(name, name) for name in sorted(available_timezones())]
+
+
+@lru_cache(maxsize=1024)
+def get_zone(name):
+    """Returns the cached ZoneInfo for ``name`` or None if it is unknown."""
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def zone_or_default(name):
+    """Like get_zone(), falling back to the current Django timezone."""
+    return get_zone(name) or timezone.get_current_timezone()
+
+
+def user_timezone(user):
+    """Timezone from the user's profile, or the current Django timezone."""
+    profile = getattr(user, "profile", None) if user else None
+    return zone_or_default(getattr(profile, "timezone", None))
+
+
+@lru_cache(maxsize=4096)
+def _timezone_label(name, moment):
+    tz = get_zone(name)
+    if tz is None:
+        return name
+    local = moment.astimezone(tz)
+    # Zkratka časového pásma, jinak čitelný název zóny
+    tzname = local.tzname() or name.replace("_", " ")
+    return f"{name} ({local.strftime('%z')}) – {tzname}"
+
+
+def timezone_label(name):
+    """
+    "Europe/Prague (+0200) – CEST" for lists of profiles. Cached per zone
+    and quarter of an hour, the granularity of offset changes, so a page of
+    profiles converts every zone once.
+    """
+    now = timezone.now()
+    moment = now.replace(minute=now.minute - now.minute % 15, second=0, microsecond=0)
+    return _timezone_label(name, moment)
@@ -1,27 +1,18 @@
 from django.contrib.auth import logout
 from django.contrib.auth.views import LoginView
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy, reverse
 from django.views.generic import CreateView, DetailView, UpdateView, ListView
+from django.db.models import Count, F, Max, Q
 from django.contrib import messages
 import os
-from django.conf import settings
 from django.contrib.auth.decorators import login_required
 
 from accounts.forms import SignUpForm, ProfileUpdateForm, ClientProfileUpdateForm
+from accounts.google_oauth import build_flow
 from accounts.models import Profile
-
-# Google OAuth2 imports
-from google_auth_oauthlib.flow import Flow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-
-# Path to your credentials.json
-GOOGLE_CLIENT_SECRETS_FILE = os.path.join(
-    settings.BASE_DIR, "config", "credentials.json"
-)
-GOOGLE_SCOPES = ["https://www.googleapis.com/auth/calendar.events"]
+from viewer.utils.conditional import conditional_page
 
 
 class SubmittableLoginView(LoginView):
@@ -76,12 +67,8 @@ def profile_edit(request):
 
 @login_required
 def google_oauth_start(request):
-    flow = Flow.from_client_secrets_file(
-        GOOGLE_CLIENT_SECRETS_FILE,
-        scopes=GOOGLE_SCOPES,
-        redirect_uri=request.build_absolute_uri(
-            reverse("accounts:google_oauth_callback")
-        ),
+    flow = build_flow(
+        request.build_absolute_uri(reverse("accounts:google_oauth_callback"))
     )
     authorization_url, state = flow.authorization_url(
         access_type="offline",
@@ -98,13 +85,9 @@ def google_oauth_callback(request):
     os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
 
     state = request.session.get("google_oauth_state")
-    flow = Flow.from_client_secrets_file(
-        GOOGLE_CLIENT_SECRETS_FILE,
-        scopes=GOOGLE_SCOPES,
+    flow = build_flow(
+        request.build_absolute_uri(reverse("accounts:google_oauth_callback")),
         state=state,
-        redirect_uri=request.build_absolute_uri(
-            reverse("accounts:google_oauth_callback")
-        ),
     )
     flow.fetch_token(authorization_response=request.build_absolute_uri())
     credentials = flow.credentials
@@ -129,18 +112,64 @@ class ClientDetailView(LoginRequiredMixin, DetailView):
 
     def get_queryset(self):
         # Jen kouč může zobrazit detail klienta
-        return Profile.objects.filter(is_client=True)
+        return Profile.objects.filter(is_client=True).select_related("user", "intake")
+
 
+class ClientListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+    """
+    Clients of the coach with the number and date of their sessions, or all
+    clients for a superuser. Search matches every word of ?q= against name,
+    username and email. A page costs a count and one select.
+    """
 
-class ClientListView(LoginRequiredMixin, ListView):
     model = Profile
     template_name = "accounts/client_list.html"
     context_object_name = "clients"
+    paginate_by = 24
+
+    def test_func(self):
+        user = self.request.user
+        profile = getattr(user, "profile", None)
+        return user.is_superuser or (profile is not None and profile.is_coach)
+
+    def get_search_query(self):
+        return self.request.GET.get("q", "").strip()
 
     def get_queryset(self):
-        return Profile.objects.filter(is_client=True)
+        clients = Profile.objects.filter(is_client=True)
+        coach = getattr(self.request.user, "profile", None)
+        if coach is not None and coach.is_coach:
+            # Filtr před annotate omezí i počty na relace s tímto koučem
+            clients = clients.filter(client_sessions__coach=coach)
+        clients = clients.annotate(
+            session_count=Count("client_sessions"),
+            last_session=Max("client_sessions__date_time"),
+        )
+        for word in self.get_search_query().split()[:5]:
+            clients = clients.filter(
+                Q(user__first_name__icontains=word)
+                | Q(user__last_name__icontains=word)
+                | Q(user__username__icontains=word)
+                | Q(user__email__icontains=word)
+            )
+        return clients.select_related("user").order_by(
+            F("last_session").desc(nulls_last=True), "pk"
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["q"] = self.get_search_query()
+        return context
+
+
+def about_me_state(request, *args, **kwargs):
+    coach = Profile.objects.filter(is_coach=True).values("pk", "updated").first()
+    if coach is None:
+        return None
+    return coach["updated"], coach["pk"]
 
 
+@conditional_page(about_me_state)
 def about_me(request):
     coach = Profile.objects.filter(is_coach=True).first()
     return render(request, "accounts/about_me.html", {"coach": coach})
@@ -0,0 +1,20 @@
+'use strict';
+// Reloads the change list filtered by the object picked in an AutocompleteFilter
+{
+    const $ = django.jQuery;
+
+    $(function() {
+        $('.autocomplete-filter select').on('change', function() {
+            const lookup = this.closest('.autocomplete-filter').dataset.lookup;
+            const params = new URLSearchParams(window.location.search);
+            if (this.value) {
+                params.set(lookup, this.value);
+            } else {
+                params.delete(lookup);
+            }
+            // Page numbers of the previous filter make no sense
+            params.delete('p');
+            window.location.search = params.toString();
+        });
+    });
+}
@@ -1,6 +1,11 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from .holds import SlotTaken
 from .models import SessionType, SessionStatus, PaymentMethod, Session, Payment, Review
 from .models import Category, Service
+from .models import WorkingHours, Break, AvailabilityException, SlotHold, SessionSeries
+from .utils.bulk_admin import BulkImportExportMixin
+from .utils.changelist import AutocompleteFilter, LargeTableMixin
 
 admin.site.register(Category)
 
@@ -24,32 +29,108 @@ class PaymentMethodAdmin(admin.ModelAdmin):
 
 
 @admin.register(Service)
-class ServiceAdmin(admin.ModelAdmin):
+class ServiceAdmin(LargeTableMixin, BulkImportExportMixin, admin.ModelAdmin):
+    bulk_resource = "service"
     list_display = ("name", "description", "duration", "price", "coach")
-    list_filter = ("coach", "session_type")
+    list_select_related = ("coach",)
+    list_filter = (("coach", AutocompleteFilter), "session_type")
     search_fields = ("name", "description", "coach__username")
     raw_id_fields = ("coach",)
 
 
 @admin.register(Session)
-class SessionAdmin(admin.ModelAdmin):
-    list_display = ("service", "client", "coach", "date_time", "status")
-    list_filter = ("status", "service", "client", "coach")
+class SessionAdmin(LargeTableMixin, BulkImportExportMixin, admin.ModelAdmin):
+    bulk_resource = "session"
+    list_display = (
+        "service",
+        "client",
+        "coach",
+        "date_time",
+        "status",
+        "payment_status",
+    )
+    # Service.__str__ shows the coach's name, Profile.__str__ the username
+    list_select_related = ("service__coach", "client__user", "coach__user")
+    list_filter = (
+        "status",
+        "payment_status",
+        ("service", AutocompleteFilter),
+        ("client", AutocompleteFilter),
+        ("coach", AutocompleteFilter),
+    )
     search_fields = ("client__username", "coach__username", "service__name", "notes")
     raw_id_fields = ("client", "coach", "service")
 
+    def changeform_view(self, request, *args, **kwargs):
+        # Reinstating a cancelled session whose time was booked meanwhile
+        try:
+            return super().changeform_view(request, *args, **kwargs)
+        except SlotTaken:
+            messages.error(
+                request, "The time of the session has been taken, it was not saved."
+            )
+            return redirect(request.get_full_path())
+
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableMixin, BulkImportExportMixin, admin.ModelAdmin):
+    bulk_resource = "payment"
     list_display = ("session", "amount", "payment_method", "paid_at")
+    list_select_related = ("session__service", "payment_method")
     list_filter = ("payment_method", "paid_at")
     search_fields = ("session__client__username", "session__service__name")
     raw_id_fields = ("session", "payment_method")
 
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(LargeTableMixin, admin.ModelAdmin):
     list_display = ("session", "rating", "created")
+    list_select_related = ("session__service",)
     list_filter = ("rating", "created")
     search_fields = ("session__client__username", "session__coach__username", "comment")
     raw_id_fields = ("session",)
+
+
+@admin.register(WorkingHours)
+class WorkingHoursAdmin(admin.ModelAdmin):
+    list_display = ("coach", "weekday", "start", "end")
+    list_filter = ("weekday",)
+    search_fields = ("coach__user__username",)
+    list_select_related = ("coach__user",)
+    raw_id_fields = ("coach",)
+
+
+@admin.register(Break)
+class BreakAdmin(admin.ModelAdmin):
+    list_display = ("coach", "weekday", "start", "end")
+    list_filter = ("weekday",)
+    search_fields = ("coach__user__username",)
+    list_select_related = ("coach__user",)
+    raw_id_fields = ("coach",)
+
+
+@admin.register(AvailabilityException)
+class AvailabilityExceptionAdmin(admin.ModelAdmin):
+    list_display = ("coach", "date", "start", "end", "is_available", "note")
+    list_filter = ("is_available", "date")
+    search_fields = ("coach__user__username", "note")
+    list_select_related = ("coach__user",)
+    raw_id_fields = ("coach",)
+
+
+@admin.register(SlotHold)
+class SlotHoldAdmin(admin.ModelAdmin):
+    list_display = ("coach", "cell", "client", "session", "expires_at")
+    list_filter = ("cell",)
+    search_fields = ("coach__user__username", "client__user__username")
+    list_select_related = ("coach__user", "client__user", "session__service")
+    raw_id_fields = ("coach", "client", "session")
+
+
+@admin.register(SessionSeries)
+class SessionSeriesAdmin(admin.ModelAdmin):
+    list_display = ("service", "client", "coach", "start", "frequency", "count")
+    list_filter = ("frequency",)
+    search_fields = ("client__user__username", "coach__user__username")
+    list_select_related = ("service__coach", "client__user", "coach__user")
+    raw_id_fields = ("client", "coach", "service")
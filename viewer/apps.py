@@ -6,4 +6,5 @@ class ViewerConfig(AppConfig):
     name = "viewer"
 
     def ready(self):
+        import LifeCoach.db.metrics  # noqa
         import viewer.signals  # noqa
@@ -0,0 +1,398 @@
+"""
+Slot generation on a per-minute availability mask.
+
+The booking window is a bytearray with one byte per minute, counted from
+local midnight of the first day in the coach's timezone. Working hours set
+ranges to 1, breaks, exceptions, the past and booked sessions clear ranges
+with slice assignment, so every interval costs one bulk operation instead of
+one check per candidate slot. Free runs are then found with a regex scan.
+
+The coaches' free intervals are cached per coach and day; the slot API and
+the service page read them through client_slots() and coach_slots(), the
+availability search through free_interval_index() and window_slots().
+"""
+
+import bisect
+import datetime
+import re
+import time
+from collections import defaultdict
+from operator import itemgetter
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import AvailabilityException, Break, Session, WorkingHours
+
+# Sessions in these states block the coach's time
+BLOCKING_STATUSES = ["CONFIRMED", "PENDING"]
+
+# Entries are invalidated explicitly, the timeout only bounds their lifetime
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60
+
+# Used for coaches who have not set up their working hours yet
+DEFAULT_WORKING_HOURS = [(datetime.time(9), datetime.time(17))]
+
+_FREE_RUN = re.compile(b"\x01+")
+
+
+def _aware(day, time, tz):
+    return timezone.make_aware(datetime.datetime.combine(day, time), timezone=tz)
+
+
+def _offset(origin, dt):
+    """
+    Whole minutes between the mask origin and ``dt``, rounded down.
+    The origin is in UTC, so this is elapsed time even across DST changes.
+    """
+    return int((dt - origin).total_seconds() // 60)
+
+
+def _offset_ceil(origin, dt):
+    """Like _offset(), rounded up."""
+    return -int((origin - dt).total_seconds() // 60)
+
+
+def _local_range(origin, day, start, end, tz):
+    """Mask offsets of a local time range; an end of 00:00 means midnight."""
+    end_day = day + datetime.timedelta(days=1) if end <= start else day
+    return (
+        _offset(origin, _aware(day, start, tz)),
+        _offset(origin, _aware(end_day, end, tz)),
+    )
+
+
+def _fill(mask, start, end, value):
+    start = max(start, 0)
+    end = min(end, len(mask))
+    if start < end:
+        mask[start:end] = value * (end - start)
+
+
+def availability_mask(
+    tz,
+    first_day,
+    days,
+    weekly_hours=None,
+    breaks=None,
+    exceptions=None,
+    busy=(),
+    now=None,
+):
+    """
+    Returns (origin, mask): origin is the UTC datetime of mask[0] (local
+    midnight of first_day) and every byte of the mask is 1 when that minute
+    is free for a booking.
+
+    weekly_hours: {weekday: [(start_time, end_time), ...]}, weekday 0 = Monday
+    breaks: {weekday or None: [(start_time, end_time), ...]}, None = every day
+    exceptions: {date: [(start_time or None, end_time or None, is_available)]}
+    busy: iterable of (start, end) aware datetimes, e.g. booked sessions
+    now: minutes before it are not bookable
+    """
+    weekly_hours = weekly_hours or {}
+    breaks = breaks or {}
+    exceptions = exceptions or {}
+
+    origin = _aware(first_day, datetime.time(), tz).astimezone(datetime.timezone.utc)
+    window_end = _aware(first_day + datetime.timedelta(days=days), datetime.time(), tz)
+    # Not always days * 1440, DST changes make days 23 or 25 hours long
+    mask = bytearray(_offset(origin, window_end))
+
+    for index in range(days):
+        day = first_day + datetime.timedelta(days=index)
+        weekday = day.weekday()
+        for start, end in weekly_hours.get(weekday, DEFAULT_WORKING_HOURS):
+            _fill(mask, *_local_range(origin, day, start, end, tz), b"\x01")
+        for start, end in breaks.get(weekday, []) + breaks.get(None, []):
+            _fill(mask, *_local_range(origin, day, start, end, tz), b"\x00")
+        # Blocking exceptions first, so that added hours win on the same day
+        for start, end, is_available in sorted(
+            exceptions.get(day, []), key=lambda exception: exception[2]
+        ):
+            if start is None or end is None:
+                start, end = datetime.time(), datetime.time()
+            value = b"\x01" if is_available else b"\x00"
+            _fill(mask, *_local_range(origin, day, start, end, tz), value)
+
+    if now is not None:
+        _fill(mask, 0, _offset_ceil(origin, now), b"\x00")
+    for start, end in busy:
+        _fill(mask, _offset(origin, start), _offset_ceil(origin, end), b"\x00")
+    return origin, mask
+
+
+def free_intervals(origin, mask):
+    """Free time as a list of (start, end) UTC datetimes."""
+    return [
+        (
+            origin + datetime.timedelta(minutes=run.start()),
+            origin + datetime.timedelta(minutes=run.end()),
+        )
+        for run in _FREE_RUN.finditer(mask)
+    ]
+
+
+def slot_starts(origin, mask, duration, granularity=60):
+    """
+    UTC start times of all slots of ``duration`` minutes that fit entirely
+    into free time, aligned to ``granularity`` minutes from local midnight.
+    """
+    slots = []
+    for run in _FREE_RUN.finditer(mask):
+        first = -(-run.start() // granularity) * granularity
+        for minute in range(first, run.end() - duration + 1, granularity):
+            slots.append(origin + datetime.timedelta(minutes=minute))
+    return slots
+
+
+def load_schedules(coaches, first_days, days):
+    """
+    Reads working hours, breaks and exceptions of the given coaches in three
+    queries, {coach_id: (weekly_hours, breaks, exceptions)} in the shape
+    availability_mask() expects.
+    first_days: {coach_id: first day of the window in the coach's timezone}
+    """
+    ids = [coach.pk for coach in coaches]
+
+    weekly_hours = defaultdict(lambda: defaultdict(list))
+    for coach_id, weekday, start, end in WorkingHours.objects.filter(
+        coach__in=ids
+    ).values_list("coach_id", "weekday", "start", "end"):
+        weekly_hours[coach_id][weekday].append((start, end))
+
+    breaks = defaultdict(lambda: defaultdict(list))
+    for coach_id, weekday, start, end in Break.objects.filter(
+        coach__in=ids
+    ).values_list("coach_id", "weekday", "start", "end"):
+        breaks[coach_id][weekday].append((start, end))
+
+    exceptions = defaultdict(lambda: defaultdict(list))
+    for coach_id, day, start, end, is_available in AvailabilityException.objects.filter(
+        coach__in=ids,
+        date__gte=min(first_days.values()),
+        date__lt=max(first_days.values()) + datetime.timedelta(days=days),
+    ).values_list("coach_id", "date", "start", "end", "is_available"):
+        exceptions[coach_id][day].append((start, end, is_available))
+
+    schedules = {}
+    for coach_id in ids:
+        hours = weekly_hours.get(coach_id)
+        if hours:
+            # A coach with a schedule does not work on days without hours
+            hours = {weekday: hours.get(weekday, []) for weekday in range(7)}
+        schedules[coach_id] = (
+            hours or {},
+            dict(breaks.get(coach_id, {})),
+            dict(exceptions.get(coach_id, {})),
+        )
+    return schedules
+
+
+def _version_key(coach_id):
+    return f"availability:version:{coach_id}"
+
+
+def availability_versions(coach_ids):
+    """
+    {coach_id: version}; a version changes whenever a session of the coach
+    is saved or deleted.
+    """
+    keys = {coach_id: _version_key(coach_id) for coach_id in coach_ids}
+    found = cache.get_many(keys.values())
+    missing = {key: time.time_ns() for key in keys.values() if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {coach_id: found[key] for coach_id, key in keys.items()}
+
+
+def availability_version(coach_id):
+    return availability_versions([coach_id])[coach_id]
+
+
+def invalidate_availability(coach_id):
+    cache.set(_version_key(coach_id), time.time_ns(), None)
+
+
+def sessions_busy(coach_ids, start, end):
+    """
+    {coach_id: [(start, end), ...]} of the coaches' blocking sessions that
+    can reach into [start, end), in one query.
+    """
+    busy = defaultdict(list)
+    for coach_id, session_start, duration in Session.objects.filter(
+        coach__in=coach_ids,
+        status__in=BLOCKING_STATUSES,
+        # Sessions starting the day before can reach into the window
+        date_time__gte=start - datetime.timedelta(days=1),
+        date_time__lt=end,
+    ).values_list("coach_id", "date_time", "duration"):
+        busy[coach_id].append(
+            (session_start, session_start + datetime.timedelta(minutes=duration))
+        )
+    return busy
+
+
+def _build_free_intervals(coaches, first_days):
+    days = {coach.pk: coach.booking_horizon_days for coach in coaches}
+    schedules = load_schedules(coaches, first_days, max(days.values()))
+    window_starts = [
+        _aware(first_days[coach.pk], datetime.time(), coach.get_timezone())
+        for coach in coaches
+    ]
+    busy = sessions_busy(
+        [coach.pk for coach in coaches],
+        min(window_starts),
+        max(window_starts) + datetime.timedelta(days=max(days.values()) + 1),
+    )
+
+    entries = {}
+    for coach in coaches:
+        origin, mask = availability_mask(
+            coach.get_timezone(),
+            first_days[coach.pk],
+            days[coach.pk],
+            *schedules[coach.pk],
+            busy=busy[coach.pk],
+        )
+        entries[coach.pk] = (
+            origin,
+            len(mask),
+            [(run.start(), run.end()) for run in _FREE_RUN.finditer(mask)],
+        )
+    return entries
+
+
+def free_interval_index(coaches, now=None):
+    """
+    Free time of each coach over their booking horizon,
+    {coach_id: (origin, length, intervals)} with intervals being sorted
+    (start, end) minute offsets from origin.
+
+    Working hours, breaks, exceptions and the coaches' sessions are applied,
+    the current time is not, so an entry stays valid for the whole day.
+    The cache key contains the coach profile's timestamp (bumped by schedule
+    changes) and the session version, so stale entries are never read.
+    Cached entries come from one get_many, missing ones are built together
+    in four queries.
+    """
+    now = now or timezone.now()
+    coaches = {coach.pk: coach for coach in coaches}
+    if not coaches:
+        return {}
+    versions = availability_versions(coaches)
+    first_days = {}
+    keys = {}
+    for coach in coaches.values():
+        first_days[coach.pk] = now.astimezone(coach.get_timezone()).date()
+        keys[coach.pk] = (
+            f"availability:{coach.pk}:{versions[coach.pk]}:"
+            f"{coach.updated.timestamp()}:{first_days[coach.pk]}:"
+            f"{coach.booking_horizon_days}"
+        )
+
+    cached = cache.get_many(keys.values())
+    index = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [coach for pk, coach in coaches.items() if pk not in index]
+    if missing:
+        built = _build_free_intervals(missing, first_days)
+        cache.set_many(
+            {keys[pk]: entry for pk, entry in built.items()},
+            AVAILABILITY_CACHE_TIMEOUT,
+        )
+        index.update(built)
+    return index
+
+
+def coach_free_intervals(coach, now=None):
+    return free_interval_index([coach], now)[coach.pk]
+
+
+def window_slots(entry, start, end, duration, granularity=60, now=None):
+    """
+    UTC slot starts from a free_interval_index() entry for sessions of
+    ``duration`` minutes lying entirely inside [start, end), aligned like
+    slot_starts(). Intervals ending before the window are skipped by bisection.
+    """
+    origin, length, intervals = entry
+    low = max(_offset_ceil(origin, start), 0)
+    if now is not None:
+        low = max(low, _offset_ceil(origin, now))
+    high = min(_offset(origin, end), length)
+
+    slots = []
+    first_interval = bisect.bisect_right(intervals, low, key=itemgetter(1))
+    for interval_start, interval_end in intervals[first_interval:]:
+        if interval_start >= high:
+            break
+        first = -(-max(interval_start, low) // granularity) * granularity
+        last = min(interval_end, high) - duration
+        for minute in range(first, last + 1, granularity):
+            slots.append(origin + datetime.timedelta(minutes=minute))
+    return slots
+
+
+def coach_slots(coach, duration, busy=(), now=None):
+    """
+    Bookable slot starts (UTC) for a coach over their booking horizon, in
+    the coach's slot granularity.
+    busy: extra (start, end) aware datetimes to leave out, e.g. the sessions
+    of the client asking; the coach's own sessions are already applied.
+    """
+    now = now or timezone.now()
+    origin, length, intervals = coach_free_intervals(coach, now)
+    mask = bytearray(length)
+    for start, end in intervals:
+        _fill(mask, start, end, b"\x01")
+    _fill(mask, 0, _offset_ceil(origin, now), b"\x00")
+    for start, end in busy:
+        _fill(mask, _offset(origin, start), _offset_ceil(origin, end), b"\x00")
+    return slot_starts(origin, mask, duration, coach.slot_granularity)
+
+
+def client_slots(coach, client, duration, now=None):
+    """
+    coach_slots() as the client sees them: the client's own blocking sessions
+    within the coach's booking horizon are left out too.
+    """
+    now = now or timezone.now()
+    busy = [
+        (start, start + datetime.timedelta(minutes=minutes))
+        for start, minutes in Session.objects.filter(
+            client=client,
+            status__in=BLOCKING_STATUSES,
+            date_time__gte=now - datetime.timedelta(days=1),
+            date_time__lt=now + datetime.timedelta(days=coach.booking_horizon_days + 1),
+        ).values_list("date_time", "duration")
+    ]
+    return coach_slots(coach, duration, busy, now)
+
+
+def unavailable_starts(coach, starts, duration, busy=(), now=None):
+    """
+    Those of ``starts`` at which the coach cannot take a session of
+    ``duration`` minutes. All of them are checked against one mask spanning
+    the whole range, built from the schedule and the coach's sessions in four
+    queries, so a long series does not cost one availability check each.
+    busy: extra (start, end) aware datetimes, e.g. the client's sessions
+    """
+    if not starts:
+        return []
+    now = now or timezone.now()
+    tz = coach.get_timezone()
+    first_day = min(starts).astimezone(tz).date()
+    end = max(starts) + datetime.timedelta(minutes=duration)
+    days = (end.astimezone(tz).date() - first_day).days + 1
+    schedule = load_schedules([coach], {coach.pk: first_day}, days)[coach.pk]
+    coach_busy = sessions_busy([coach.pk], min(starts), end)[coach.pk]
+    origin, mask = availability_mask(
+        tz, first_day, days, *schedule, busy=coach_busy + list(busy), now=now
+    )
+    conflicts = []
+    for start in starts:
+        first = _offset(origin, start)
+        last = _offset_ceil(origin, start + datetime.timedelta(minutes=duration))
+        if first < 0 or last > len(mask) or mask.find(b"\x00", first, last) != -1:
+            conflicts.append(start)
+    return conflicts
@@ -0,0 +1,238 @@
+"""
+Booking of sessions.
+
+A booking is saved in one transaction: the claim on the coach's time, the
+session or the sessions of a series, and their payments. External side
+effects, the coach's Google Calendar event and the emails, are queued with
+transaction.on_commit, so a failed booking leaves no event or email behind
+and a slow calendar API doesn't hold the transaction's locks.
+
+Booking requests carry an idempotency key, stored with the (first) session
+under a unique constraint per client. A retried request, e.g. a double
+click, a resubmitted form or a client retrying after a timeout, gets the
+booking made by the first one instead of booking again, for the price of
+one indexed lookup.
+"""
+
+from functools import partial
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .availability import invalidate_availability
+from .holds import SlotTaken, claim_series, claim_slot
+from .models import Payment, Session, SessionSeries, SlotHold
+from .search import index_document
+from .utils.google_calendar import create_coach_calendar_event, instance_event_id
+
+
+class Booking:
+    """
+    Booked sessions. created is False for a booking found by its key;
+    calendar_event / calendar_error are set by the side effects after
+    commit.
+    """
+
+    def __init__(self, sessions, series=None, created=True):
+        self.sessions = sessions
+        self.series = series
+        self.created = created
+        self.calendar_event = None
+        self.calendar_error = None
+
+
+def find_booking(client, key):
+    """The booking the client made with the key, or None."""
+    if not key:
+        return None
+    session = (
+        Session.objects.filter(client=client, idempotency_key=key)
+        .select_related("series")
+        .first()
+    )
+    if session is None:
+        return None
+    if session.series_id is None:
+        return Booking([session], created=False)
+    sessions = list(session.series.sessions.order_by("date_time"))
+    return Booking(sessions, series=session.series, created=False)
+
+
+def _book(client, key, save):
+    """
+    Runs save() in a transaction, returns its Booking. A request that lost
+    the race against a retry with the same key gets the retry's booking.
+    """
+    booking = find_booking(client, key)
+    if booking is not None:
+        return booking
+    try:
+        with transaction.atomic():
+            return save()
+    except (SlotTaken, IntegrityError):
+        booking = find_booking(client, key)
+        if booking is None:
+            raise
+        return booking
+
+
+def book_session(session, payment_method, key=None, hold=None):
+    """
+    Saves an unsaved session with its claim and payment. hold is the token
+    of the client's slot hold. Raises SlotTaken.
+    """
+
+    def save():
+        claim = claim_slot(
+            session.coach,
+            session.client,
+            session.date_time,
+            session.duration,
+            token=hold,
+        )
+        session.save()
+        claim.update(session=session)
+        Payment.objects.create(
+            session=session,
+            amount=session.service.price,
+            payment_method=payment_method,
+        )
+        booking = Booking([session])
+        transaction.on_commit(partial(_session_event, booking))
+        return booking
+
+    session.idempotency_key = key or None
+    try:
+        return _book(session.client, key, save)
+    except (SlotTaken, IntegrityError):
+        session.pk = None
+        raise
+
+
+def book_series(series, starts, template, payment_method, key=None):
+    """
+    Saves a series with a session at each start, copying the template
+    session's fields, their claims and payments. Raises SlotTaken.
+    """
+    service = series.service
+
+    def save():
+        series.save()
+        claims = claim_series(series.coach, series.client, starts, service.duration)
+        Session.objects.bulk_create(
+            Session(
+                client=series.client,
+                coach=series.coach,
+                service=service,
+                series=series,
+                date_time=start,
+                duration=service.duration,
+                type=service.session_type,
+                status="PENDING",
+                notes=template.notes,
+                # Each gets an unpaid payment below, without signals
+                payment_status="UNPAID",
+                idempotency_key=(key or None) if start == starts[0] else None,
+            )
+            for start in starts
+        )
+        # Read back, bulk_create does not return primary keys on MySQL
+        sessions = list(series.sessions.order_by("date_time"))
+        Payment.objects.bulk_create(
+            Payment(
+                session=created,
+                amount=service.price,
+                payment_method=payment_method,
+            )
+            for created in sessions
+        )
+        held = []
+        for created in sessions:
+            for claim in claims[created.date_time]:
+                claim.session = created
+                held.append(claim)
+        SlotHold.objects.bulk_update(held, ["session"])
+        # bulk_create sends no post_save signals, the notes are indexed here
+        for created in sessions:
+            index_document("session", created, created=True)
+        booking = Booking(sessions, series=series)
+        transaction.on_commit(partial(invalidate_availability, series.coach_id))
+        transaction.on_commit(partial(_series_event, booking))
+        transaction.on_commit(partial(_series_email, booking))
+        return booking
+
+    try:
+        return _book(series.client, key, save)
+    except (SlotTaken, IntegrityError):
+        series.pk = None
+        raise
+
+
+def _session_event(booking):
+    session = booking.sessions[0]
+    client_name = session.client.user.get_full_name()
+    try:
+        event = create_coach_calendar_event(
+            coach_profile=session.coach,
+            summary=f"Session with {client_name}",
+            description=f"Service: {session.service.name}\nClient: {client_name}",
+            start_dt=session.date_time,
+            end_dt=session.date_time + timezone.timedelta(minutes=session.duration),
+            timezone_str=str(timezone.get_current_timezone()),
+        )
+    except Exception as e:
+        print(f"Google Calendar error: {e}")
+        booking.calendar_error = e
+        return
+    if event:
+        # update() so that the status change notification is not sent
+        Session.objects.filter(pk=session.pk).update(
+            google_calendar_event_id=event["id"]
+        )
+    booking.calendar_event = event
+
+
+def _series_event(booking):
+    """One recurring event, each session cancels only its own occurrence."""
+    series = booking.series
+    first = booking.sessions[0]
+    coach_tz = series.coach.get_timezone()
+    client_name = series.client.user.get_full_name()
+    try:
+        event = create_coach_calendar_event(
+            coach_profile=series.coach,
+            summary=f"Session with {client_name}",
+            description=f"Service: {series.service.name}\nClient: {client_name}",
+            start_dt=first.date_time.astimezone(coach_tz),
+            end_dt=(
+                first.date_time + timezone.timedelta(minutes=first.duration)
+            ).astimezone(coach_tz),
+            timezone_str=str(coach_tz),
+            recurrence=[series.rrule],
+        )
+    except Exception as e:
+        print(f"Google Calendar error: {e}")
+        booking.calendar_error = e
+        return
+    SessionSeries.objects.filter(pk=series.pk).update(
+        google_calendar_event_id=event["id"]
+    )
+    for session in booking.sessions:
+        session.google_calendar_event_id = instance_event_id(
+            event["id"], session.date_time
+        )
+    Session.objects.bulk_update(booking.sessions, ["google_calendar_event_id"])
+    booking.calendar_event = event
+
+
+def _series_email(booking):
+    send_mail(
+        "Nová série rezervací",
+        "Byly vytvořeny rezervace na "
+        + ", ".join(f"{session.date_time}" for session in booking.sessions),
+        settings.EMAIL_HOST_USER,
+        [booking.series.client.user.email],
+        fail_silently=True,
+    )
@@ -0,0 +1,138 @@
+"""
+Local stand-ins for Google Calendar, PayPal and SMTP, for load testing.
+
+With FAKE_EXTERNAL_SERVICES on, the calendar helpers get CalendarService
+instead of the Google API client, EMAIL_BACKEND is EmailBackend and
+PAYPAL_API_BASE points to a PayPal served by serve_paypal() (the
+run_fake_paypal command runs one next to runserver). Each answers after
+FAKE_SERVICE_LATENCY seconds, so the load shows how workers cope with slow
+third parties without calling them. Orders of the fake PayPal are
+approved at once.
+"""
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+
+
+def service_latency():
+    return getattr(settings, "FAKE_SERVICE_LATENCY", 0.2)
+
+
+class _Call:
+    """An API call of the Google client, run by execute()."""
+
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        time.sleep(service_latency())
+        return self.result
+
+
+class CalendarService:
+    """The part of the Google Calendar API the calendar helpers use."""
+
+    def events(self):
+        return self
+
+    def insert(self, calendarId, body):
+        event_id = uuid.uuid4().hex
+        return _Call(
+            dict(
+                body,
+                id=event_id,
+                status="confirmed",
+                htmlLink=f"https://calendar.invalid/event?eid={event_id}",
+            )
+        )
+
+    def delete(self, calendarId, eventId):
+        return _Call("")
+
+
+class EmailBackend(BaseEmailBackend):
+    """Discards the messages after the time an SMTP delivery would take."""
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        time.sleep(service_latency())
+        return len(email_messages)
+
+
+class PayPalHandler(BaseHTTPRequestHandler):
+    """The OAuth token and Orders v2 endpoints used by viewer.utils.paypal."""
+
+    def _send(self, status, data):
+        time.sleep(self.server.latency)
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path == "/v1/oauth2/token":
+            self._send(200, {"access_token": uuid.uuid4().hex, "expires_in": 32400})
+        elif self.path == "/v2/checkout/orders":
+            order_id = uuid.uuid4().hex[:17].upper()
+            self._send(
+                201,
+                {
+                    "id": order_id,
+                    "status": "CREATED",
+                    "links": [
+                        {
+                            "rel": "approve",
+                            "href": f"{self.server.url}/checkoutnow?token={order_id}",
+                        }
+                    ],
+                },
+            )
+        else:
+            self._send(404, {"name": "RESOURCE_NOT_FOUND"})
+
+    def do_GET(self):
+        if self.path.startswith("/v2/checkout/orders/"):
+            order_id = self.path.rsplit("/", 1)[-1]
+            self._send(200, {"id": order_id, "status": self.server.order_status})
+        else:
+            self._send(404, {"name": "RESOURCE_NOT_FOUND"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PayPalServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 would drop concurrent connections
+    request_queue_size = 256
+
+    def __init__(self, address, latency, order_status):
+        super().__init__(address, PayPalHandler)
+        self.latency = latency
+        self.order_status = order_status
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def serve_paypal(host="127.0.0.1", port=0, latency=None, order_status="APPROVED"):
+    """Starts a fake PayPal in a thread, returns the server (see .url)."""
+    server = PayPalServer(
+        (host, port),
+        latency=service_latency() if latency is None else latency,
+        order_status=order_status,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,9 +1,53 @@
 from django import forms
 from django.utils import timezone
-import pytz
 
 import datetime
-from viewer.models import Session, Service, Review, PaymentMethod
+from accounts.timezones import user_timezone
+from viewer.availability import BLOCKING_STATUSES
+from viewer.models import Session, SessionSeries, Service, Review, PaymentMethod
+
+# Sessions starting up to a day earlier can reach into the booked time,
+# like in availability.sessions_busy
+OVERLAP_WINDOW = datetime.timedelta(days=1)
+
+
+def _overlaps(sessions, start, end, exclude):
+    """Whether a blocking session of the queryset overlaps [start, end)."""
+    sessions = sessions.filter(
+        status__in=BLOCKING_STATUSES,
+        date_time__lt=end,
+        date_time__gt=start - OVERLAP_WINDOW,
+    )
+    if exclude:
+        sessions = sessions.exclude(pk=exclude)
+    return any(
+        session_start + datetime.timedelta(minutes=duration) > start
+        for session_start, duration in sessions.values_list("date_time", "duration")
+    )
+
+
+def check_overlaps(instance, service, start, user):
+    """
+    Raises ValidationError when the coach or the client already has a session
+    at the time. Sessions with a claim on the coach's time are left to the
+    SlotHold constraint when saving (see holds.py), the scan only covers
+    sessions without one, e.g. imported ones.
+    """
+    end = start + datetime.timedelta(minutes=service.duration)
+    coach_sessions = Session.objects.filter(
+        coach=service.coach.profile, slot_holds__isnull=True
+    )
+    if _overlaps(coach_sessions, start, end, instance.pk):
+        raise forms.ValidationError(
+            "This coach already has a session that overlaps with this time. (Termín je již obsazený)"
+        )
+    # Claims are per coach, the client's other sessions are always checked
+    if user and hasattr(user, "profile"):
+        client_sessions = Session.objects.filter(client=user.profile)
+        if _overlaps(client_sessions, start, end, instance.pk):
+            raise forms.ValidationError(
+                "You already has a session that overlaps with this time. (Termín je již obsazený)"
+            )
 
 
 class BaseStyledForm(forms.ModelForm):
@@ -74,24 +118,9 @@ class SessionForm(BaseStyledForm):
         service = cleaned_data.get("service")
         date_time = cleaned_data.get("date_time")
         if service and date_time:
-            start = date_time
-            end = date_time + timezone.timedelta(minutes=service.duration)
-
-            def overlaps(qs, who):
-                qs = qs.filter(status__in=["CONFIRMED", "PENDING"])
-                if self.instance and self.instance.pk:
-                    qs = qs.exclude(pk=self.instance.pk)
-                for s in qs:
-                    s_start = s.date_time
-                    s_end = s.date_time + timezone.timedelta(minutes=s.duration)
-                    if (start < s_end) and (end > s_start):
-                        raise forms.ValidationError(
-                            f"{who} already has a session that overlaps with this time. (Termín je již obsazený)"
-                        )
-
-            overlaps(Session.objects.filter(coach=service.coach.profile), "This coach")
-            if hasattr(self, "user") and self.user and hasattr(self.user, "profile"):
-                overlaps(Session.objects.filter(client=self.user.profile), "You")
+            check_overlaps(
+                self.instance, service, date_time, getattr(self, "user", None)
+            )
         return cleaned_data
 
 
@@ -154,6 +183,31 @@ class BookingForm(BaseStyledForm):
         widget=forms.Textarea(attrs={"rows": 3, "class": "form-control"}),
         label="Additional Notes",
     )
+    # Token of the slot hold taken when the time was chosen
+    hold = forms.UUIDField(required=False, widget=forms.HiddenInput)
+    # Key of the booking request, a resubmitted form books nothing new
+    idempotency_key = forms.CharField(
+        required=False, max_length=64, widget=forms.HiddenInput
+    )
+    repeat = forms.ChoiceField(
+        choices=[("", "Does not repeat")] + SessionSeries.FREQUENCY_CHOICES,
+        required=False,
+        label="Repeat",
+        widget=forms.Select(attrs={"class": "form-control"}),
+    )
+    repeat_interval = forms.IntegerField(
+        min_value=1,
+        max_value=4,
+        initial=1,
+        required=False,
+        label="Every (days / weeks)",
+    )
+    repeat_count = forms.IntegerField(
+        min_value=2,
+        max_value=SessionSeries.MAX_OCCURRENCES,
+        required=False,
+        label="Number of sessions",
+    )
 
     class Meta:
         model = Session
@@ -184,12 +238,7 @@ class BookingForm(BaseStyledForm):
         super().__init__(*args, **kwargs)
 
         # Get user's timezone
-        user_timezone = timezone.get_current_timezone()
-        if self.user and hasattr(self.user, "profile") and self.user.profile.timezone:
-            try:
-                user_timezone = pytz.timezone(self.user.profile.timezone)
-            except pytz.exceptions.UnknownTimeZoneError:
-                pass
+        user_tz = user_timezone(self.user)
 
         # Set up service choices
         if self.user and hasattr(self.user, "profile"):
@@ -200,9 +249,14 @@ class BookingForm(BaseStyledForm):
             else:
                 self.fields["service"].queryset = Service.objects.filter(is_active=True)
 
+        # Opakování jde nastavit jen při vytvoření rezervace
+        if self.instance and self.instance.pk:
+            for field in ("repeat", "repeat_interval", "repeat_count"):
+                del self.fields[field]
+
         # Pokud editujeme existující session, předvyplň date_time i když není mezi sloty
         if self.instance and self.instance.pk and self.instance.date_time:
-            dt = self.instance.date_time.astimezone(user_timezone)
+            dt = self.instance.date_time.astimezone(user_tz)
             dt_str = dt.strftime("%Y-%m-%d %H:%M")
             # Pokud není mezi choices, přidej ji na začátek
             choices = list(self.fields["date_time"].widget.choices)
@@ -214,8 +268,8 @@ class BookingForm(BaseStyledForm):
 
         # Ostatní readonly logika zůstává
         if self.instance and self.instance.pk:
-            session_time = self.instance.date_time.astimezone(user_timezone)
-            now = timezone.now().astimezone(user_timezone)
+            session_time = self.instance.date_time.astimezone(user_tz)
+            now = timezone.now().astimezone(user_tz)
             if (
                 self.user
                 and hasattr(self.user, "profile")
@@ -249,20 +303,11 @@ class BookingForm(BaseStyledForm):
             date_time = timezone.make_aware(date_time)
 
             # Get user's timezone
-            user_timezone = timezone.get_current_timezone()
-            if (
-                self.user
-                and hasattr(self.user, "profile")
-                and self.user.profile.timezone
-            ):
-                try:
-                    user_timezone = pytz.timezone(self.user.profile.timezone)
-                except pytz.exceptions.UnknownTimeZoneError:
-                    pass
+            user_tz = user_timezone(self.user)
 
             # Convert the date_time to user's timezone for comparison
-            date_time_local = date_time.astimezone(user_timezone)
-            now_local = timezone.now().astimezone(user_timezone)
+            date_time_local = date_time.astimezone(user_tz)
+            now_local = timezone.now().astimezone(user_tz)
 
             # Check if the selected time is in the future
             if date_time_local <= now_local:
@@ -280,27 +325,9 @@ class BookingForm(BaseStyledForm):
         date_time = cleaned_data.get("date_time")
 
         if service and date_time:
-            # Check for overlapping sessions
-            start = date_time
-            end = date_time + timezone.timedelta(minutes=service.duration)
-
-            # Helper for overlap: (A starts before B ends) and (A ends after B starts)
-            def overlaps(qs, who):
-                qs = qs.filter(status__in=["CONFIRMED", "PENDING"])
-                if self.instance and self.instance.pk:
-                    qs = qs.exclude(pk=self.instance.pk)
-                for s in qs:
-                    s_start = s.date_time
-                    s_end = s.date_time + timezone.timedelta(minutes=s.duration)
-                    if (start < s_end) and (end > s_start):
-                        raise forms.ValidationError(
-                            f"{who} already has a session that overlaps with this time. (Termín je již obsazený)"
-                        )
-
-            # Check for overlapping sessions for the coach
-            overlaps(Session.objects.filter(coach=service.coach.profile), "This coach")
-            # Check for overlapping sessions for the client
-            if self.user and hasattr(self.user, "profile"):
-                overlaps(Session.objects.filter(client=self.user.profile), "You")
+            check_overlaps(self.instance, service, date_time, self.user)
+
+        if cleaned_data.get("repeat") and not cleaned_data.get("repeat_count"):
+            self.add_error("repeat_count", "Please enter the number of sessions.")
 
         return cleaned_data
@@ -0,0 +1,137 @@
+"""
+Slot holds: short leases on a coach's time between choosing a slot and
+submitting the booking.
+
+Time is claimed in HOLD_CELL_MINUTES cells, one SlotHold row per cell, and
+the (coach, cell) unique constraint decides who gets overlapping time, so
+concurrent bookings need neither table locks nor overlap scans. A converted
+hold stays as the session's claim until the session is cancelled.
+"""
+
+import datetime
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import SlotHold
+
+HOLD_CELL_MINUTES = 15
+
+# How long a chosen slot is kept for the client
+HOLD_MINUTES = getattr(settings, "SLOT_HOLD_MINUTES", 10)
+
+
+class SlotTaken(Exception):
+    """The time is held or booked by someone else."""
+
+
+def hold_cells(start, duration):
+    """UTC starts of the cells covered by a session, partial cells included."""
+    cell = datetime.timedelta(minutes=HOLD_CELL_MINUTES)
+    start = start.astimezone(datetime.timezone.utc)
+    end = start + datetime.timedelta(minutes=duration)
+    first = start.replace(
+        minute=start.minute - start.minute % HOLD_CELL_MINUTES,
+        second=0,
+        microsecond=0,
+    )
+    cells = []
+    while first < end:
+        cells.append(first)
+        first += cell
+    return cells
+
+
+def _insert(coach, client, cells, token, expires_at, now):
+    """Creates claim rows for the cells, raises SlotTaken on a conflict."""
+    # Expired holds of other clients no longer count
+    SlotHold.objects.filter(coach=coach, cell__in=cells, expires_at__lt=now).delete()
+    try:
+        with transaction.atomic():
+            return SlotHold.objects.bulk_create(
+                SlotHold(
+                    coach=coach,
+                    cell=cell,
+                    client=client,
+                    token=token,
+                    expires_at=expires_at,
+                )
+                for cell in cells
+            )
+    except IntegrityError:
+        raise SlotTaken
+
+
+def acquire_hold(coach, client, start, duration, now=None):
+    """
+    Holds the time for the client for HOLD_MINUTES and releases the client's
+    previous unconverted hold. Returns (token, expires_at).
+    """
+    now = now or timezone.now()
+    token = uuid.uuid4()
+    expires_at = now + datetime.timedelta(minutes=HOLD_MINUTES)
+    with transaction.atomic():
+        SlotHold.objects.filter(client=client, session__isnull=True).delete()
+        _insert(coach, client, hold_cells(start, duration), token, expires_at, now)
+    return token, expires_at
+
+
+def claim_slot(coach, client, start, duration, token=None, now=None):
+    """
+    Makes the time permanently claimed, converting the client's hold when
+    the token matches and claiming the remaining cells otherwise. Must run in
+    the transaction that saves the session; returns the claimed rows so that
+    the caller can attach them to it. Raises SlotTaken.
+    """
+    now = now or timezone.now()
+    cells = hold_cells(start, duration)
+    converted = set()
+    if token:
+        SlotHold.objects.filter(
+            token=token,
+            client=client,
+            coach=coach,
+            session__isnull=True,
+            expires_at__gt=now,
+            cell__in=cells,
+        ).update(expires_at=None)
+        # Cells of the hold outside the booked time are given back
+        SlotHold.objects.filter(
+            token=token, session__isnull=True, expires_at__isnull=False
+        ).delete()
+        converted = set(
+            SlotHold.objects.filter(
+                token=token, session__isnull=True, expires_at__isnull=True
+            ).values_list("cell", flat=True)
+        )
+    missing = [cell for cell in cells if cell not in converted]
+    if missing:
+        _insert(coach, client, missing, token or uuid.uuid4(), None, now)
+    return SlotHold.objects.filter(coach=coach, cell__in=cells)
+
+
+def claim_series(coach, client, starts, duration, now=None):
+    """
+    Claims the time of all sessions of a series with one insert; returns
+    {start: [claim rows]} for attaching them to the sessions. Raises
+    SlotTaken when any of them is taken.
+    """
+    now = now or timezone.now()
+    cells = {start: hold_cells(start, duration) for start in starts}
+    all_cells = [cell for start_cells in cells.values() for cell in start_cells]
+    _insert(coach, client, all_cells, uuid.uuid4(), None, now)
+    rows = {
+        row.cell: row
+        for row in SlotHold.objects.filter(coach=coach, cell__in=all_cells)
+    }
+    return {
+        start: [rows[cell] for cell in start_cells]
+        for start, start_cells in cells.items()
+    }
+
+
+def release_session(session):
+    """Frees the time claimed by a session."""
+    SlotHold.objects.filter(session=session).delete()
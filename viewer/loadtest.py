@@ -0,0 +1,272 @@
+"""
+Scripted load of clients booking sessions.
+
+Each virtual client repeats a visit: it browses the services and a
+service page, opens the booking form and polls the slot API like the open
+form does, holds and books a slot, pays it through PayPal and cancels some
+of the bookings again. The clients run concurrently on one event loop and
+talk HTTP through httpx, either to a running server or in-process to the
+ASGI application; external services are the stand-ins of viewer/fakes.py.
+
+The load runs as prepared loadtest-* users, logged in with sessions made
+directly in the database, and finds the booked session by its idempotency
+key, so it needs the server's database. Stats reports throughput and
+latency percentiles per endpoint.
+"""
+
+import asyncio
+import datetime
+import random
+import time
+import uuid
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.test import Client
+from django.utils import timezone
+
+from .models import PaymentMethod, Service, Session
+
+USER_PREFIX = "loadtest-"
+# Slots booked by the load can still be cancelled (see Session.can_cancel)
+MIN_LEAD_TIME = datetime.timedelta(days=2)
+
+# Endpoint -> statuses of a successful response
+EXPECTED = {
+    "services": {200},
+    "service_detail": {200},
+    "booking_form": {200},
+    "available_slots": {200},
+    "slot_hold": {201},
+    "booking": {302},
+    "paypal_create_order": {200},
+    "paypal_return": {302},
+    "session_cancel": {302},
+}
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Stats:
+    """Latencies and unexpected statuses of the requests per endpoint."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.visits = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, name, seconds, status):
+        self.latencies[name].append(seconds)
+        if status not in EXPECTED[name]:
+            self.errors[name][status] += 1
+
+    def rows(self):
+        """(endpoint, requests, errors, req/s, p50, p95, p99, max), seconds."""
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        rows = []
+        for name in EXPECTED:
+            ordered = sorted(self.latencies.get(name, []))
+            if not ordered:
+                continue
+            rows.append(
+                (
+                    name,
+                    len(ordered),
+                    sum(self.errors[name].values()),
+                    len(ordered) / elapsed,
+                    percentile(ordered, 50),
+                    percentile(ordered, 95),
+                    percentile(ordered, 99),
+                    ordered[-1],
+                )
+            )
+        return rows
+
+
+def prepare(clients, coaches):
+    """
+    Creates the missing load test coaches, their services and clients;
+    returns (client users, service ids, payment method id).
+    """
+    coach_users = []
+    for number in range(coaches):
+        user, created = User.objects.get_or_create(
+            username=f"{USER_PREFIX}coach-{number}",
+            defaults={"email": f"{USER_PREFIX}coach-{number}@example.com"},
+        )
+        coach_users.append(user)
+        if created:
+            profile = user.profile
+            profile.is_coach = True
+            profile.is_client = False
+            profile.timezone = "UTC"
+            # Calendar calls go to the fake, they only need a token
+            profile.google_refresh_token = "fake"
+            profile.save()
+            Service.objects.create(
+                name=f"Load test session {number}",
+                description="Session booked by the load test",
+                price=50,
+                duration=60,
+                coach=user,
+            )
+    client_users = []
+    for number in range(clients):
+        user, created = User.objects.get_or_create(
+            username=f"{USER_PREFIX}client-{number}",
+            defaults={"email": f"{USER_PREFIX}client-{number}@example.com"},
+        )
+        if created:
+            user.profile.is_client = True
+            user.profile.timezone = "UTC"
+            user.profile.save()
+        client_users.append(user)
+    service_ids = list(
+        Service.objects.filter(coach__in=coach_users, is_active=True).values_list(
+            "pk", flat=True
+        )
+    )
+    payment_method, _ = PaymentMethod.objects.get_or_create(name="paypal")
+    return client_users, service_ids, payment_method.pk
+
+
+def cleanup():
+    """Deletes the load test users with their services and sessions."""
+    return User.objects.filter(username__startswith=USER_PREFIX).delete()[0]
+
+
+def session_cookies(user):
+    """Cookies of a new logged in session of the user."""
+    client = Client()
+    client.force_login(user)
+    return {name: morsel.value for name, morsel in client.cookies.items()}
+
+
+class Visitor:
+    """One virtual client."""
+
+    def __init__(self, http, stats, service_ids, payment_method, options, rng):
+        self.http = http
+        self.stats = stats
+        self.service_ids = service_ids
+        self.payment_method = payment_method
+        self.polls = options["polls"]
+        self.cancel_ratio = options["cancel_ratio"]
+        self.think = options["think"]
+        self.rng = rng
+
+    async def request(self, name, method, url, **kwargs):
+        if self.think:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.think))
+        headers = {}
+        if method == "POST":
+            headers["X-CSRFToken"] = self.http.cookies.get("csrftoken", "")
+        started = time.perf_counter()
+        response = await self.http.request(method, url, headers=headers, **kwargs)
+        self.stats.record(name, time.perf_counter() - started, response.status_code)
+        return response
+
+    async def visit(self):
+        """One visit, ends early when a step fails."""
+        await self.request("services", "GET", "/services/")
+        service = self.rng.choice(self.service_ids)
+        await self.request("service_detail", "GET", f"/services/{service}/")
+        await self.request("booking_form", "GET", f"/booking/create/?service={service}")
+        for _ in range(self.polls):
+            response = await self.request(
+                "available_slots", "GET", f"/api/available-slots/?service={service}"
+            )
+        if response.status_code != 200:
+            return
+        earliest = timezone.now() + MIN_LEAD_TIME
+        starts = [
+            start
+            for start in (
+                datetime.datetime.fromisoformat(slot["value"])
+                for slot in response.json()["slots"]
+            )
+            if start >= earliest
+        ]
+        if not starts:
+            return
+        date_time = self.rng.choice(starts).strftime("%Y-%m-%d %H:%M")
+
+        response = await self.request(
+            "slot_hold",
+            "POST",
+            "/api/slot-holds/",
+            data={"service": service, "date_time": date_time},
+        )
+        if response.status_code != 201:
+            return
+        key = uuid.uuid4().hex
+        response = await self.request(
+            "booking",
+            "POST",
+            "/booking/create/",
+            data={
+                "service": service,
+                "date_time": date_time,
+                "type": "online",
+                "payment_method": self.payment_method,
+                "hold": response.json()["hold"],
+                "idempotency_key": key,
+            },
+        )
+        if response.status_code != 302:
+            return
+        session_id = (
+            await Session.objects.filter(idempotency_key=key)
+            .values_list("pk", flat=True)
+            .afirst()
+        )
+
+        response = await self.request(
+            "paypal_create_order",
+            "POST",
+            "/api/paypal/create-order/",
+            data={"session_id": session_id},
+        )
+        if response.status_code != 200:
+            return
+        await self.request("paypal_return", "GET", f"/paypal/return/{session_id}/")
+        if self.rng.random() < self.cancel_ratio:
+            await self.request(
+                "session_cancel", "POST", f"/sessions/{session_id}/cancel/"
+            )
+        self.stats.visits += 1
+
+
+async def run(transport, base_url, cookies, service_ids, payment_method, options):
+    """Runs the visits of all clients, returns Stats."""
+    import httpx
+
+    stats = Stats()
+
+    async def client(number, client_cookies):
+        async with httpx.AsyncClient(
+            transport=transport,
+            base_url=base_url,
+            cookies=client_cookies,
+            timeout=60,
+        ) as http:
+            visitor = Visitor(
+                http,
+                stats,
+                service_ids,
+                payment_method,
+                options,
+                random.Random(options["seed"] + number),
+            )
+            for _ in range(options["visits"]):
+                await visitor.visit()
+
+    await asyncio.gather(
+        *(client(number, value) for number, value in enumerate(cookies))
+    )
+    stats.finished = time.perf_counter()
+    return stats
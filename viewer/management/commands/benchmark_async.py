@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from viewer.fakes import serve_paypal
+from viewer.loadtest import percentile
+from viewer.models import Payment
+from viewer.utils import paypal
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares one worker serving the async PayPal return view under WSGI "
+        "(a thread per request) and ASGI (one event loop), against a local "
+        "PayPal answering with a delay"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--session", type=int, help="Session with a payment (default: any)"
+        )
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--threads", type=int, default=4, help="Threads of the WSGI worker"
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="Requests in flight against the ASGI worker",
+        )
+        parser.add_argument(
+            "--latency", type=float, default=0.2, help="PayPal delay in seconds"
+        )
+
+    def handle(self, *args, **options):
+        payments = Payment.objects.select_related("session__client__user")
+        if options["session"]:
+            payments = payments.filter(session=options["session"])
+        payment = payments.first()
+        if payment is None:
+            raise CommandError("No session with a payment found.")
+        # Requests go through the real WSGI / ASGI handlers, logged in with
+        # a session made by the test client
+        login = Client()
+        login.force_login(payment.session.client.user)
+        cookies = {name: morsel.value for name, morsel in login.cookies.items()}
+        url = reverse("viewer:paypal_return", kwargs={"session_id": payment.session_id})
+
+        # Orders are never approved, so the view writes nothing
+        server = serve_paypal(latency=options["latency"], order_status="CREATED")
+        paypal.PAYPAL_API_BASE = server.url
+        self.stdout.write(
+            f"{options['requests']} requests, PayPal latency "
+            f"{options['latency'] * 1000:.0f} ms (2 calls per request)"
+        )
+        try:
+            # The test clients send Host: testserver
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                self.report(
+                    f"WSGI, {options['threads']} threads",
+                    *self.run_wsgi(
+                        cookies, url, options["requests"], options["threads"]
+                    ),
+                )
+                self.report(
+                    f"ASGI, {options['concurrency']} in flight",
+                    *asyncio.run(
+                        self.run_asgi(
+                            cookies, url, options["requests"], options["concurrency"]
+                        )
+                    ),
+                )
+        finally:
+            server.shutdown()
+
+    def run_wsgi(self, cookies, url, count, threads):
+        import httpx
+
+        from LifeCoach.wsgi import application
+
+        local = threading.local()
+
+        def request(_):
+            if not hasattr(local, "client"):
+                local.client = httpx.Client(
+                    transport=httpx.WSGITransport(app=application),
+                    base_url="http://testserver",
+                    cookies=cookies,
+                )
+            started = time.perf_counter()
+            response = local.client.get(url)
+            assert response.status_code == 302, response.status_code
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            latencies = list(executor.map(request, range(count)))
+        return time.perf_counter() - started, latencies
+
+    async def run_asgi(self, cookies, url, count, concurrency):
+        import httpx
+
+        from LifeCoach.asgi import application
+
+        remaining = iter(range(count))
+        latencies = []
+
+        async def worker(client):
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await client.get(url)
+                assert response.status_code == 302, response.status_code
+                latencies.append(time.perf_counter() - started)
+
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=application),
+            base_url="http://testserver",
+            cookies=cookies,
+        ) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        return time.perf_counter() - started, latencies
+
+    def report(self, name, seconds, latencies):
+        ordered = sorted(latencies)
+        self.stdout.write(
+            f"{name:<24} {len(ordered) / seconds:8.1f} req/s   "
+            f"p50 {percentile(ordered, 50) * 1000:7.1f} ms   "
+            f"p95 {percentile(ordered, 95) * 1000:7.1f} ms   "
+            f"p99 {percentile(ordered, 99) * 1000:7.1f} ms"
+        )
@@ -0,0 +1,79 @@
+import os
+import resource
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# What a WSGI worker imports before serving its first request
+WORKER_BOOT = "import django; django.setup(); import LifeCoach.wsgi, LifeCoach.urls"
+
+# Integrations that should only be loaded by the code paths that use them
+LAZY_MODULES = [
+    "googleapiclient.discovery",
+    "google_auth_oauthlib.flow",
+    "openpyxl",
+    "httpx",
+]
+
+
+def parse_importtime(stderr):
+    """Returns {module: (self_us, cumulative_us)} from `python -X importtime`."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Measures worker boot import time with python -X importtime"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top", type=int, default=15, help="Number of slowest imports to show"
+        )
+        parser.add_argument(
+            "--code", default=WORKER_BOOT, help="Python code to measure"
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", options["code"]],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            self.stderr.write(result.stderr[-2000:])
+            return
+
+        modules = parse_importtime(result.stderr)
+        total_ms = sum(self_us for self_us, _ in modules.values()) / 1000
+        # ru_maxrss is in kilobytes on Linux
+        max_rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+        self.stdout.write(f"modules imported: {len(modules)}")
+        self.stdout.write(f"total import time: {total_ms:.1f} ms")
+        self.stdout.write(f"max RSS: {max_rss_mb:.1f} MB")
+
+        self.stdout.write("\nslowest imports (cumulative):")
+        slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (_, cumulative_us) in slowest[: options["top"]]:
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+        self.stdout.write("\nlazy integrations:")
+        for name in LAZY_MODULES:
+            if name in modules:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"  {name}: loaded at boot ({modules[name][1] / 1000:.1f} ms)"
+                    )
+                )
+            else:
+                self.stdout.write(self.style.SUCCESS(f"  {name}: not loaded"))
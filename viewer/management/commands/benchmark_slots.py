@@ -0,0 +1,89 @@
+import datetime
+import time
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.timezones import get_zone, timezone_choices
+from viewer.availability import availability_mask, slot_starts
+
+BENCHMARK_TIMEZONES = [
+    "UTC",
+    "Europe/Prague",
+    "America/New_York",
+    "America/Los_Angeles",
+    "Asia/Kolkata",
+    "Asia/Kathmandu",
+    "Australia/Lord_Howe",
+    "Pacific/Chatham",
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmarks slot generation across timezones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=200, help="Runs per timezone")
+        parser.add_argument(
+            "--busy", type=int, default=20, help="Number of booked sessions"
+        )
+        parser.add_argument(
+            "--duration", type=int, default=60, help="Service duration in minutes"
+        )
+        parser.add_argument(
+            "--days", type=int, default=30, help="Booking horizon in days"
+        )
+        parser.add_argument(
+            "--granularity",
+            type=int,
+            default=15,
+            choices=[15, 30, 60],
+            help="Slot granularity in minutes",
+        )
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        duration = options["duration"]
+        days = options["days"]
+        granularity = options["granularity"]
+        now = timezone.now()
+        busy = [
+            (start, start + datetime.timedelta(minutes=duration))
+            for start in (
+                now + datetime.timedelta(hours=7 * i + 1)
+                for i in range(options["busy"])
+            )
+        ]
+
+        timezone_choices.cache_clear()
+        started = time.perf_counter()
+        choices = timezone_choices()
+        self.stdout.write(
+            f"timezone_choices: {len(choices)} zones, "
+            f"first call {(time.perf_counter() - started) * 1000:.2f} ms"
+        )
+        lookups = repeat * 100
+        seconds = timeit.timeit(lambda: get_zone("Europe/Prague"), number=lookups)
+        self.stdout.write(f"get_zone: {seconds / lookups * 1e6:.3f} µs/lookup")
+
+        self.stdout.write(
+            f"horizon {days} days, {granularity} min granularity, "
+            f"{duration} min sessions"
+        )
+        for name in BENCHMARK_TIMEZONES:
+            tz = get_zone(name)
+            first_day = now.astimezone(tz).date()
+
+            def run():
+                origin, mask = availability_mask(
+                    tz, first_day, days, busy=busy, now=now
+                )
+                return slot_starts(origin, mask, duration, granularity)
+
+            slots = run()
+            seconds = timeit.timeit(run, number=repeat)
+            self.stdout.write(
+                f"{name:<22} {seconds / repeat * 1000:8.3f} ms/run "
+                f"{len(slots):4d} slots"
+            )
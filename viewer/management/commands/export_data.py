@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from viewer.utils.bulk_io import FORMATS, RESOURCES, export_rows
+
+
+class Command(BaseCommand):
+    help = "Exports services, sessions, payments or profiles as CSV / JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(RESOURCES))
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", default="-", help="File to write, - for stdout")
+
+    def handle(self, *args, **options):
+        resource = RESOURCES[options["resource"]]
+        output = options["output"]
+        rows = export_rows(resource, fmt=options["format"])
+        if output == "-":
+            for chunk in rows:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(output, "w", newline="", encoding="utf-8") as stream:
+            stream.writelines(rows)
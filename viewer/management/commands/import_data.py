@@ -0,0 +1,89 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from viewer.utils.bulk_io import (
+    DEFAULT_BATCH_SIZE,
+    FORMATS,
+    RESOURCES,
+    after_import,
+    import_file,
+)
+
+
+class Command(BaseCommand):
+    help = "Imports services, sessions, payments or profiles from CSV / JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(RESOURCES))
+        parser.add_argument("path", help="File to import, - for stdin")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format, by default taken from the file extension",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Validate without saving"
+        )
+        parser.add_argument(
+            "--max-errors", type=int, default=50, help="Number of errors to print"
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or (
+            "json" if path.endswith((".json", ".jsonl")) else "csv"
+        )
+        resource = RESOURCES[options["resource"]]
+        started = time.perf_counter()
+
+        def progress(result):
+            self.stdout.write(
+                f"{result.rows} rows, {result.created} created, "
+                f"{result.updated} updated, {len(result.errors)} errors "
+                f"({time.perf_counter() - started:.1f} s)"
+            )
+
+        try:
+            stream = (
+                sys.stdin
+                if path == "-"
+                else open(path, newline="", encoding="utf-8-sig")
+            )
+        except OSError as error:
+            raise CommandError(error)
+        with stream:
+            try:
+                result = import_file(
+                    resource,
+                    stream,
+                    fmt,
+                    batch_size=options["batch_size"],
+                    dry_run=options["dry_run"],
+                    progress=progress if options["verbosity"] > 1 else None,
+                )
+            except ValueError as error:
+                raise CommandError(error)
+
+        if not options["dry_run"]:
+            note = after_import(options["resource"], result)
+            if note:
+                self.stdout.write(note)
+
+        for line, message in result.errors[: options["max_errors"]]:
+            self.stderr.write(f"Line {line}: {message}")
+        if len(result.errors) > options["max_errors"]:
+            self.stderr.write(
+                f"... {len(result.errors) - options['max_errors']} more errors"
+            )
+        prefix = "Dry run: " if options["dry_run"] else ""
+        style = self.style.SUCCESS if not result.errors else self.style.WARNING
+        self.stdout.write(
+            style(
+                f"{prefix}{result.created} created, {result.updated} updated, "
+                f"{len(result.errors)} rows with errors "
+                f"in {time.perf_counter() - started:.1f} s"
+            )
+        )
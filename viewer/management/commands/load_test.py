@@ -0,0 +1,148 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from LifeCoach.db import metrics
+from viewer import loadtest
+from viewer.fakes import serve_paypal
+from viewer.utils import paypal
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulates clients browsing, polling slots, booking, paying and "
+        "cancelling; reports throughput and latency percentiles per endpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            help=(
+                "Server to load, running with FAKE_EXTERNAL_SERVICES=1 on the "
+                "same database (default: the ASGI application in-process)"
+            ),
+        )
+        parser.add_argument("--clients", type=int, default=20)
+        parser.add_argument("--coaches", type=int, default=5)
+        parser.add_argument(
+            "--visits", type=int, default=3, help="Visits of each client"
+        )
+        parser.add_argument(
+            "--polls", type=int, default=3, help="Slot API polls per visit"
+        )
+        parser.add_argument(
+            "--cancel-ratio",
+            type=float,
+            default=0.3,
+            help="Share of bookings cancelled again",
+        )
+        parser.add_argument(
+            "--think",
+            type=float,
+            default=0,
+            help="Mean pause of a client before each request in seconds",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--cleanup",
+            action="store_true",
+            help="Delete the load test users and their sessions, then exit",
+        )
+
+    def handle(self, *args, **options):
+        if options["cleanup"]:
+            deleted = loadtest.cleanup()
+            self.stdout.write(f"Deleted {deleted} load test objects.")
+            return
+        if options["polls"] < 1:
+            raise CommandError("--polls must be at least 1.")
+
+        users, service_ids, payment_method = loadtest.prepare(
+            options["clients"], options["coaches"]
+        )
+        cookies = [loadtest.session_cookies(user) for user in users]
+        if options["url"]:
+            stats = asyncio.run(
+                loadtest.run(
+                    None, options["url"], cookies, service_ids, payment_method, options
+                )
+            )
+        else:
+            metrics.reset()
+            stats = self.run_in_process(cookies, service_ids, payment_method, options)
+        self.report(stats)
+        if not options["url"]:
+            # The server of --url serves its numbers at /metrics/db/
+            self.report_databases(metrics.snapshot())
+
+    def run_in_process(self, cookies, service_ids, payment_method, options):
+        import httpx
+
+        from LifeCoach.asgi import application
+
+        server = serve_paypal()
+        paypal.PAYPAL_API_BASE = server.url
+        try:
+            with override_settings(
+                FAKE_EXTERNAL_SERVICES=True,
+                EMAIL_BACKEND="viewer.fakes.EmailBackend",
+                # httpx sends Host: testserver
+                ALLOWED_HOSTS=["testserver"],
+            ):
+                return asyncio.run(
+                    loadtest.run(
+                        httpx.ASGITransport(app=application),
+                        "http://testserver",
+                        cookies,
+                        service_ids,
+                        payment_method,
+                        options,
+                    )
+                )
+        finally:
+            server.shutdown()
+
+    def report(self, stats):
+        rows = stats.rows()
+        elapsed = stats.finished - stats.started
+        total = sum(row[1] for row in rows)
+        self.stdout.write(
+            f"{stats.visits} visits completed, {total} requests in "
+            f"{elapsed:.1f} s, {total / elapsed:.1f} req/s"
+        )
+        self.stdout.write(
+            f"{'endpoint':<20} {'requests':>8} {'errors':>6} {'req/s':>7} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+        )
+        for name, count, errors, rate, p50, p95, p99, slowest in rows:
+            line = (
+                f"{name:<20} {count:>8} {errors:>6} {rate:>7.1f} "
+                f"{p50 * 1000:>8.1f} {p95 * 1000:>8.1f} {p99 * 1000:>8.1f} "
+                f"{slowest * 1000:>8.1f}"
+            )
+            self.stdout.write(self.style.WARNING(line) if errors else line)
+        for name, statuses in stats.errors.items():
+            for status, count in sorted(statuses.items()):
+                self.stdout.write(f"  {name}: {count} x HTTP {status}")
+
+    def report_databases(self, snapshot):
+        for alias, numbers in snapshot["databases"].items():
+            connections, queries = numbers["connections"], numbers["queries"]
+            self.stdout.write(
+                f"database {alias}: {connections['opened']} connections opened "
+                f"({connections['opened_per_minute']:.0f}/min), "
+                f"{connections['reused']} reused from the pool, "
+                f"{queries['count']} queries"
+            )
+            for name, latency in (
+                ("connect", connections["connect_ms"]),
+                ("query", queries["ms"]),
+            ):
+                if latency:
+                    self.stdout.write(
+                        f"  {name:<8} p50 {latency['p50']:8.2f} ms   "
+                        f"p95 {latency['p95']:8.2f} ms   "
+                        f"p99 {latency['p99']:8.2f} ms   "
+                        f"max {latency['max']:8.2f} ms"
+                    )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from viewer.ratings import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recomputes the rating totals of services and coaches from the reviews"
+
+    def handle(self, *args, **options):
+        services, coaches = rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Corrected ratings of {services} service(s) and {coaches} coach(es)"
+            )
+        )
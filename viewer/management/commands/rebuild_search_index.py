@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from viewer.search import KINDS, rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index of services, reviews and sessions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "kinds", nargs="*", help=f"Any of {', '.join(KINDS)}, all by default"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        kinds = options["kinds"] or KINDS
+        unknown = set(kinds) - set(KINDS)
+        if unknown:
+            raise CommandError(f"Unknown kinds: {', '.join(sorted(unknown))}")
+        started = time.perf_counter()
+        created = rebuild(kinds, batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {', '.join(kinds)}: {created} terms "
+                f"in {time.perf_counter() - started:.1f} s"
+            )
+        )
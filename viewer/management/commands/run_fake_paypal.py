@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from viewer.fakes import PayPalServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Serves the fake PayPal of load tests, for a server running with "
+        "FAKE_EXTERNAL_SERVICES=1"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=settings.FAKE_SERVICE_LATENCY,
+            help="Delay of each answer in seconds",
+        )
+        parser.add_argument(
+            "--order-status",
+            default="APPROVED",
+            help="Status of every order, e.g. CREATED for orders never paid",
+        )
+
+    def handle(self, *args, **options):
+        server = PayPalServer(
+            ("127.0.0.1", options["port"]),
+            latency=options["latency"],
+            order_status=options["order_status"],
+        )
+        self.stdout.write(f"Fake PayPal at {server.url}, quit with CONTROL-C.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
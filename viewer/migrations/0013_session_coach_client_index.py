@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-19 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0012_client_intake"),
+        ("viewer", "0012_session_series"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="session",
+            index=models.Index(
+                fields=["coach", "client", "date_time"], name="session_coach_client_idx"
+            ),
+        ),
+    ]
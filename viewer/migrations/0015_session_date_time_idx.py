@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0012_client_intake"),
+        ("viewer", "0014_search_term"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="session",
+            index=models.Index(fields=["date_time"], name="session_date_time_idx"),
+        ),
+    ]
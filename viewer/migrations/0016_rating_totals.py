@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-19 11:29
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def count_ratings(apps, schema_editor):
+    """Totals of existing reviews, one grouped query per model."""
+    Review = apps.get_model("viewer", "Review")
+    for model, key in [
+        (apps.get_model("viewer", "Service"), "session__service"),
+        (apps.get_model("accounts", "Profile"), "session__coach"),
+    ]:
+        rows = (
+            Review.objects.order_by()
+            .values(key)
+            .annotate(total=Sum("rating"), count=Count("id"))
+        )
+        for row in rows:
+            model.objects.filter(pk=row[key]).update(
+                rating_sum=row["total"], rating_count=row["count"]
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0013_rating_totals"),
+        ("viewer", "0015_session_date_time_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="service",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="service",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_ratings, migrations.RunPython.noop),
+    ]
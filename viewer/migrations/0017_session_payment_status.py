@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-19 11:34
+
+from django.db import migrations, models
+from django.db.models import Case, Exists, OuterRef, Subquery, Value, When
+
+
+def fill_payment_status(apps, schema_editor):
+    """One UPDATE of all sessions from their payments."""
+    Session = apps.get_model("viewer", "Session")
+    Payment = apps.get_model("viewer", "Payment")
+    payments = Payment.objects.filter(session=OuterRef("pk"))
+    paid = payments.filter(paid_at__isnull=False)
+    Session.objects.update(
+        payment_status=Case(
+            When(Exists(paid), then=Value("PAID")),
+            When(Exists(payments), then=Value("UNPAID")),
+            default=Value("NONE"),
+        ),
+        paid_at=Subquery(paid.order_by("-paid_at").values("paid_at")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("viewer", "0016_rating_totals"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="session",
+            name="paid_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="session",
+            name="payment_status",
+            field=models.CharField(
+                choices=[
+                    ("NONE", "No payment"),
+                    ("UNPAID", "Unpaid"),
+                    ("PAID", "Paid"),
+                ],
+                default="NONE",
+                editable=False,
+                max_length=10,
+            ),
+        ),
+        migrations.RunPython(fill_payment_status, migrations.RunPython.noop),
+    ]
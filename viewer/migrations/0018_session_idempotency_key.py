@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0013_rating_totals"),
+        ("viewer", "0017_session_payment_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="session",
+            name="idempotency_key",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="session",
+            constraint=models.UniqueConstraint(
+                fields=("client", "idempotency_key"),
+                name="unique_booking_idempotency_key",
+            ),
+        ),
+    ]
@@ -2,6 +2,20 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.exceptions import PermissionDenied
 
 
+class CachedObjectMixin:
+    """
+    Fetches the view's object once per request, so test_func() and the
+    handler share one query. A view instance serves a single request.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, "_cached_object"):
+            self._cached_object = super().get_object()
+        return self._cached_object
+
+
 class CoachRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
     """Mixin to verify that the user is a coach."""
 
@@ -26,12 +40,12 @@ class ClientRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
         raise PermissionDenied
 
 
-class OwnerRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
+class OwnerRequiredMixin(CachedObjectMixin, LoginRequiredMixin, UserPassesTestMixin):
     """Mixin to verify that the user is the owner of the object."""
 
     def test_func(self):
         obj = self.get_object()
-        return obj.user == self.request.user
+        return obj.user_id == self.request.user.pk
 
     def handle_no_permission(self):
         if not self.request.user.is_authenticated:
@@ -1,4 +1,6 @@
-from django.db import models
+import datetime
+
+from django.db import models, transaction
 from django.db.models import (
     CASCADE,
     CharField,
@@ -11,9 +13,6 @@ from django.db.models import (
 from django.utils import timezone
 from django.conf import settings
 from accounts.models import Profile
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.views.generic import CreateView
-from django.urls import reverse_lazy
 
 
 class SessionType(models.Model):
@@ -72,6 +71,9 @@ class Service(models.Model):
         default="online",
         max_length=20,
     )
+    # Hodnocení z recenzí, udržuje viewer.ratings
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
     created = DateTimeField(auto_now_add=True)
     updated = DateTimeField(auto_now=True)
 
@@ -79,6 +81,10 @@ class Service(models.Model):
         full_name = self.coach.get_full_name()
         return f"{self.name} by {full_name}" if full_name else self.name
 
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
 
 class Session(models.Model):
     SESSION_TYPES = [
@@ -93,6 +99,12 @@ class Session(models.Model):
         ("PENDING", "Pending"),
     ]
 
+    PAYMENT_STATUS = [
+        ("NONE", "No payment"),
+        ("UNPAID", "Unpaid"),
+        ("PAID", "Paid"),
+    ]
+
     client = models.ForeignKey(
         Profile, on_delete=models.CASCADE, related_name="client_sessions"
     )
@@ -104,6 +116,11 @@ class Session(models.Model):
     duration = models.IntegerField(help_text="Duration in minutes")
     type = models.CharField(max_length=10, choices=SESSION_TYPES, default="online")
     status = models.CharField(max_length=20, choices=SESSION_STATUS, default="PENDING")
+    # Stav plateb, udržuje viewer.payments
+    payment_status = models.CharField(
+        max_length=10, choices=PAYMENT_STATUS, default="NONE", editable=False
+    )
+    paid_at = models.DateTimeField(null=True, blank=True, editable=False)
     notes = models.TextField(blank=True, null=True)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
@@ -114,9 +131,36 @@ class Session(models.Model):
     meeting_address = models.CharField(
         max_length=255, blank=True, null=True, help_text="Address for personal session"
     )
+    series = models.ForeignKey(
+        "viewer.SessionSeries",
+        on_delete=models.SET_NULL,
+        related_name="sessions",
+        null=True,
+        blank=True,
+    )
+    # Klíč rezervačního požadavku, opakovaný požadavek nevytvoří druhou
+    # rezervaci (u série jen na první session)
+    idempotency_key = models.CharField(
+        max_length=64, null=True, blank=True, editable=False
+    )
 
     class Meta:
         ordering = ["-date_time"]
+        indexes = [
+            # Default ordering of lists and the admin
+            models.Index(fields=["date_time"], name="session_date_time_idx"),
+            # Clients of a coach with their session counts and last dates
+            models.Index(
+                fields=["coach", "client", "date_time"],
+                name="session_coach_client_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["client", "idempotency_key"],
+                name="unique_booking_idempotency_key",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.service.name} - {self.date_time}"
@@ -145,7 +189,68 @@ class Session(models.Model):
 
     @property
     def is_paid(self):
-        return self.payments.filter(paid_at__isnull=False).exists()
+        """
+        From payment_status, which the Payment signals keep. Payments written
+        with QuerySet.update() or bulk_create() send no signals: call
+        viewer.payments.refresh_payment_status() on their sessions after them.
+        """
+        return self.payment_status == "PAID"
+
+
+class SessionSeries(models.Model):
+    """
+    Recurring booking, a subset of an iCalendar RRULE: FREQ, INTERVAL and
+    COUNT. Occurrences keep the local time of the first session in the
+    coach's timezone, also across DST changes.
+    """
+
+    FREQUENCY_CHOICES = [
+        ("DAILY", "Daily"),
+        ("WEEKLY", "Weekly"),
+    ]
+    MAX_OCCURRENCES = 26
+
+    client = models.ForeignKey(
+        Profile, on_delete=models.CASCADE, related_name="client_series"
+    )
+    coach = models.ForeignKey(
+        Profile, on_delete=models.CASCADE, related_name="coach_series"
+    )
+    service = models.ForeignKey("viewer.Service", on_delete=models.CASCADE)
+    start = models.DateTimeField()
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
+    interval = models.PositiveSmallIntegerField(default=1)
+    count = models.PositiveSmallIntegerField()
+    google_calendar_event_id = models.CharField(max_length=255, blank=True, null=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Session series"
+
+    def __str__(self):
+        return f"{self.service.name} - {self.rrule}"
+
+    @property
+    def rrule(self):
+        return (
+            f"RRULE:FREQ={self.frequency};INTERVAL={self.interval};COUNT={self.count}"
+        )
+
+    def occurrences(self):
+        """Aware start datetimes of all sessions of the series."""
+        tz = self.coach.get_timezone()
+        first = self.start.astimezone(tz)
+        step = datetime.timedelta(
+            days=self.interval * (7 if self.frequency == "WEEKLY" else 1)
+        )
+        return [
+            timezone.make_aware(
+                datetime.datetime.combine(first.date() + step * index, first.time()),
+                timezone=tz,
+            )
+            for index in range(self.count)
+        ]
 
 
 class Payment(models.Model):
@@ -162,6 +267,11 @@ class Payment(models.Model):
     def __str__(self):
         return f"Payment for {self.session} - {self.amount}"
 
+    def save(self, *args, **kwargs):
+        # The session's payment state is updated in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Review(models.Model):
     session = ForeignKey("viewer.Session", on_delete=CASCADE, related_name="reviews")
@@ -183,3 +293,142 @@ class Category(models.Model):
 
     def __str__(self):
         return self.name
+
+
+WEEKDAY_CHOICES = [
+    (0, "Monday"),
+    (1, "Tuesday"),
+    (2, "Wednesday"),
+    (3, "Thursday"),
+    (4, "Friday"),
+    (5, "Saturday"),
+    (6, "Sunday"),
+]
+
+
+class WorkingHours(models.Model):
+    """Weekly working hours of a coach, in the coach's timezone."""
+
+    coach = ForeignKey(Profile, on_delete=CASCADE, related_name="working_hours")
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start = models.TimeField()
+    end = models.TimeField()
+    created = DateTimeField(auto_now_add=True)
+    updated = DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Working hours"
+        ordering = ["coach", "weekday", "start"]
+
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.start:%H:%M}-{self.end:%H:%M}"
+
+
+class Break(models.Model):
+    """Recurring break, on one weekday or every day when weekday is empty."""
+
+    coach = ForeignKey(Profile, on_delete=CASCADE, related_name="breaks")
+    weekday = models.PositiveSmallIntegerField(
+        choices=WEEKDAY_CHOICES, null=True, blank=True
+    )
+    start = models.TimeField()
+    end = models.TimeField()
+    created = DateTimeField(auto_now_add=True)
+    updated = DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["coach", "weekday", "start"]
+
+    def __str__(self):
+        day = self.get_weekday_display() if self.weekday is not None else "Daily"
+        return f"{day} break {self.start:%H:%M}-{self.end:%H:%M}"
+
+
+class AvailabilityException(models.Model):
+    """
+    One-off change of the weekly schedule on a given date. Without times the
+    whole day is off; with times the interval is blocked, or added when
+    is_available is set.
+    """
+
+    coach = ForeignKey(
+        Profile, on_delete=CASCADE, related_name="availability_exceptions"
+    )
+    date = models.DateField()
+    start = models.TimeField(null=True, blank=True)
+    end = models.TimeField(null=True, blank=True)
+    is_available = BooleanField(default=False)
+    note = CharField(max_length=255, blank=True)
+    created = DateTimeField(auto_now_add=True)
+    updated = DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["coach", "date", "start"]
+
+    def __str__(self):
+        return f"{self.date} ({'available' if self.is_available else 'off'})"
+
+
+class SlotHold(models.Model):
+    """
+    A coach's time claimed in 15 minute cells. A hold chosen in the booking
+    form expires after a few minutes unless it is converted, then it belongs
+    to the session. The unique constraint makes two overlapping claims fail
+    in the database instead of relying on overlap scans.
+    """
+
+    coach = ForeignKey(Profile, on_delete=CASCADE, related_name="slot_holds")
+    cell = DateTimeField()
+    client = ForeignKey(Profile, on_delete=CASCADE, related_name="held_slots")
+    token = models.UUIDField(db_index=True)
+    session = ForeignKey(
+        Session,
+        on_delete=CASCADE,
+        related_name="slot_holds",
+        null=True,
+        blank=True,
+    )
+    expires_at = DateTimeField(null=True, blank=True, db_index=True)
+    created = DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["coach", "cell"], name="unique_coach_slot_cell"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.coach} {self.cell:%Y-%m-%d %H:%M}"
+
+
+class SearchTerm(models.Model):
+    """
+    Posting of the full-text inverted index: a term occurring in a service,
+    review or session, with its weight in that document. Maintained by
+    viewer/search.py.
+    """
+
+    KIND_CHOICES = [
+        ("service", "Service"),
+        ("review", "Review"),
+        ("session", "Session"),
+    ]
+
+    term = CharField(max_length=40)
+    kind = CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    weight = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["term", "kind", "object_id"], name="unique_search_posting"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["kind", "object_id"], name="search_document_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.kind} {self.object_id}"
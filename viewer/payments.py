@@ -0,0 +1,32 @@
+"""
+Payment state of sessions.
+
+Session.payment_status and paid_at summarize the session's payments, so
+lists and reports filter and show the state without joining payments.
+The Payment signal refreshes them within the transaction of the payment
+change (Payment.save() is atomic for that); bulk imports refresh the
+sessions they touched. Other bulk writes of payments (QuerySet.update(),
+bulk_create()) send no signals and must call refresh_payment_status() on
+their sessions themselves, as book_series() sets the state it creates.
+"""
+
+from django.db.models import Case, Exists, OuterRef, Subquery, Value, When
+from django.utils import timezone
+
+from .models import Payment, Session
+
+
+def refresh_payment_status(sessions):
+    """Recomputes the state of a Session queryset in one UPDATE."""
+    payments = Payment.objects.filter(session=OuterRef("pk"))
+    paid = payments.filter(paid_at__isnull=False)
+    return sessions.update(
+        payment_status=Case(
+            When(Exists(paid), then=Value("PAID")),
+            When(Exists(payments), then=Value("UNPAID")),
+            default=Value("NONE"),
+        ),
+        paid_at=Subquery(paid.order_by("-paid_at").values("paid_at")[:1]),
+        # Cached session rows are validated by updated
+        updated=timezone.now(),
+    )
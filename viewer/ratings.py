@@ -0,0 +1,67 @@
+"""
+Rating totals of services and coaches.
+
+Service.rating_sum / rating_count and the same fields of the coach's
+Profile are kept by the Review signals with F-expression UPDATEs, so
+concurrent reviews never lose an increment and lists show averages without
+joining the reviews. The UPDATEs also bump updated, which queryset.update()
+doesn't do by itself, so cached cards and pages showing the rating expire.
+rebuild() recomputes the totals from the reviews after bulk changes.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from accounts.models import Profile
+
+from .models import Review, Service
+
+
+def add_rating(session_id, rating, count):
+    """Adds to the totals of the session's service and coach."""
+    values = {
+        "rating_sum": F("rating_sum") + rating,
+        "rating_count": F("rating_count") + count,
+        "updated": timezone.now(),
+    }
+    with transaction.atomic():
+        Service.objects.filter(session=session_id).update(**values)
+        Profile.objects.filter(coach_sessions=session_id).update(**values)
+
+
+def _rebuild(model, key):
+    totals = {
+        row[key]: (row["total"], row["count"])
+        for row in Review.objects.order_by()
+        .values(key)
+        .annotate(total=Sum("rating"), count=Count("id"))
+    }
+    rows = model._default_manager.filter(
+        Q(rating_count__gt=0)
+        | Q(rating_sum__gt=0)
+        | Q(pk__in=Review.objects.values(key))
+    ).only("pk", "rating_sum", "rating_count")
+    now = timezone.now()
+    stale = []
+    for obj in rows.iterator():
+        total, count = totals.get(obj.pk, (0, 0))
+        if (obj.rating_sum, obj.rating_count) != (total, count):
+            obj.rating_sum, obj.rating_count, obj.updated = total, count, now
+            stale.append(obj)
+    model._default_manager.bulk_update(
+        stale, ["rating_sum", "rating_count", "updated"], batch_size=1000
+    )
+    return len(stale)
+
+
+def rebuild():
+    """
+    Corrects the totals that differ from the reviews, returns the numbers
+    of corrected services and coaches. Reviews saved meanwhile may be
+    missed, so run it when reviews aren't being written.
+    """
+    with transaction.atomic():
+        return _rebuild(Service, "session__service"), _rebuild(
+            Profile, "session__coach"
+        )
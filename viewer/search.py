@@ -0,0 +1,274 @@
+"""
+Full-text search over service names and descriptions, review comments and
+session notes.
+
+Texts are split into normalized terms (lower case, without diacritics) and
+stored as SearchTerm postings, so a query is an indexed lookup of its few
+terms instead of LIKE '%x%' scans over joined tables. Signals reindex a
+document on save, writing only the postings that changed; changes made by
+bulk operations are picked up by the rebuild_search_index command.
+
+Query words of three and more letters also match as prefixes, which covers
+Czech inflection and search as you type. Results are ranked by the number
+of matched query words, then by TF-IDF: the term's weight in the document
+(field weight times frequency, normalized by document length) times
+log(1 + N / frequency), prefix matches counting half.
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Max, Q, Sum, Value, When
+from django.urls import reverse
+
+from .models import Review, SearchTerm, Service, Session
+
+MIN_TERM_LENGTH = 2
+MIN_PREFIX_LENGTH = 3
+# Weight of a prefix match ("stres" finding "stresem") relative to an exact one
+PREFIX_MATCH_FACTOR = 0.5
+MAX_TERM_LENGTH = SearchTerm._meta.get_field("term").max_length
+MAX_QUERY_TERMS = 8
+DOCUMENT_COUNT_KEY = "search:documents"
+DOCUMENT_COUNT_TIMEOUT = 60 * 60
+SNIPPET_LENGTH = 160
+
+# kind -> (model, {field: weight})
+INDEXES = {
+    "service": (Service, {"name": 3.0, "description": 1.0}),
+    "review": (Review, {"comment": 1.0}),
+    "session": (Session, {"notes": 1.0}),
+}
+KINDS = list(INDEXES)
+KIND_OF_MODEL = {model: kind for kind, (model, _) in INDEXES.items()}
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(word):
+    word = unicodedata.normalize("NFKD", word.lower())
+    return "".join(char for char in word if not unicodedata.combining(char))
+
+
+def terms(text):
+    """Normalized terms of a text in order, repeats included."""
+    return [
+        term[:MAX_TERM_LENGTH]
+        for term in (normalize(word) for word in _WORD.findall(text or ""))
+        if len(term) >= MIN_TERM_LENGTH
+    ]
+
+
+def postings(instance, fields):
+    """{term: weight} of a document."""
+    counts = Counter()
+    for name, weight in fields.items():
+        for term in terms(getattr(instance, name)):
+            counts[term] += weight
+    if not counts:
+        return {}
+    norm = math.sqrt(sum(counts.values()))
+    return {term: round(count / norm, 6) for term, count in counts.items()}
+
+
+def index_document(kind, instance, created=False):
+    """Brings the postings of one document up to date."""
+    model, fields = INDEXES[kind]
+    new = postings(instance, fields)
+    if created:
+        old = {}
+    else:
+        old = dict(
+            SearchTerm.objects.filter(kind=kind, object_id=instance.pk).values_list(
+                "term", "weight"
+            )
+        )
+    if new == old:
+        return
+    stale = [term for term, weight in old.items() if new.get(term) != weight]
+    with transaction.atomic():
+        if stale:
+            SearchTerm.objects.filter(
+                kind=kind, object_id=instance.pk, term__in=stale
+            ).delete()
+        SearchTerm.objects.bulk_create(
+            SearchTerm(kind=kind, object_id=instance.pk, term=term, weight=weight)
+            for term, weight in new.items()
+            if old.get(term) != weight
+        )
+
+
+def remove_document(kind, pk):
+    SearchTerm.objects.filter(kind=kind, object_id=pk).delete()
+
+
+def rebuild(kinds=KINDS, batch_size=1000):
+    """Reindexes all documents of the kinds, returns the number of postings."""
+    created = 0
+    for kind in kinds:
+        model, fields = INDEXES[kind]
+        SearchTerm.objects.filter(kind=kind).delete()
+        batch = []
+        rows = model._default_manager.order_by().only("pk", *fields)
+        for instance in rows.iterator(chunk_size=batch_size):
+            batch.extend(
+                SearchTerm(kind=kind, object_id=instance.pk, term=term, weight=weight)
+                for term, weight in postings(instance, fields).items()
+            )
+            if len(batch) >= batch_size:
+                created += len(SearchTerm.objects.bulk_create(batch))
+                batch = []
+        created += len(SearchTerm.objects.bulk_create(batch))
+    cache.delete(DOCUMENT_COUNT_KEY)
+    return created
+
+
+def document_count():
+    """Number of searchable documents, N of the IDF; cached, as it barely moves."""
+    count = cache.get(DOCUMENT_COUNT_KEY)
+    if count is None:
+        count = sum(model._default_manager.count() for model, _ in INDEXES.values())
+        cache.set(DOCUMENT_COUNT_KEY, count, DOCUMENT_COUNT_TIMEOUT)
+    return count
+
+
+def visible_documents(user):
+    """Postings the user may find: active services, reviews and own sessions."""
+    visible = Q(
+        kind="service",
+        object_id__in=Service.objects.filter(is_active=True).values("pk"),
+    )
+    if not user.is_authenticated:
+        return visible
+    visible |= Q(kind="review")
+    if user.is_superuser:
+        return visible | Q(kind="session")
+    own_sessions = Session.objects.filter(
+        Q(client__user=user) | Q(coach__user=user)
+    ).values("pk")
+    return visible | Q(kind="session", object_id__in=own_sessions)
+
+
+def _term_filter(term):
+    """Query terms match index terms exactly or, from 3 letters, as prefixes."""
+    if len(term) >= MIN_PREFIX_LENGTH:
+        return Q(term__startswith=term)
+    return Q(term=term)
+
+
+def search(query, user, kinds=KINDS, limit=20):
+    """
+    Ranked [(kind, object_id, score)] of documents matching any term of the
+    query, in two queries: term frequencies and the scored postings.
+    """
+    query_terms = list(dict.fromkeys(terms(query)))[:MAX_QUERY_TERMS]
+    if not query_terms:
+        return []
+    matching = Q()
+    for term in query_terms:
+        matching |= _term_filter(term)
+    frequencies = SearchTerm.objects.filter(matching).aggregate(
+        **{
+            str(i): Count("id", filter=_term_filter(term))
+            for i, term in enumerate(query_terms)
+        }
+    )
+    total = max(document_count(), *frequencies.values())
+    whens = []
+    matched = []
+    for i, term in enumerate(query_terms):
+        df = frequencies[str(i)]
+        if not df:
+            continue
+        idf = math.log(1 + total / df)
+        whens.append(When(term=term, then=F("weight") * Value(idf)))
+        if len(term) >= MIN_PREFIX_LENGTH:
+            whens.append(
+                When(
+                    term__startswith=term,
+                    then=F("weight") * Value(idf * PREFIX_MATCH_FACTOR),
+                )
+            )
+        matched.append(Max(Case(When(_term_filter(term), then=1), default=0)))
+    if not whens:
+        return []
+    rows = (
+        SearchTerm.objects.filter(matching, kind__in=kinds)
+        .filter(visible_documents(user))
+        .values("kind", "object_id")
+        .annotate(
+            matched=sum(matched[1:], matched[0]),
+            score=Sum(Case(*whens, output_field=FloatField())),
+        )
+        .order_by("-matched", "-score", "kind", "object_id")[:limit]
+    )
+    return [(row["kind"], row["object_id"], row["score"]) for row in rows]
+
+
+def snippet(text, query_terms, length=SNIPPET_LENGTH):
+    """Part of the text around the first matched word."""
+    text = " ".join((text or "").split())
+    prefixes = tuple(term for term in query_terms if len(term) >= MIN_PREFIX_LENGTH)
+    start = 0
+    for match in _WORD.finditer(text):
+        word = normalize(match.group())
+        if word in query_terms or word.startswith(prefixes):
+            start = max(0, match.start() - length // 4)
+            break
+    part = text[start : start + length]
+    return ("…" if start else "") + part + ("…" if start + length < len(text) else "")
+
+
+def _describe(kind, obj):
+    """(title, text, url) of a result."""
+    if kind == "service":
+        url = reverse("viewer:service_detail", kwargs={"pk": obj.pk})
+        return obj.name, obj.description, url
+    if kind == "review":
+        url = reverse(
+            "viewer:service_review_list",
+            kwargs={"service_id": obj.session.service_id},
+        )
+        return f"Review of {obj.session.service.name}", obj.comment, url
+    url = reverse("viewer:session_detail", kwargs={"pk": obj.pk})
+    return str(obj), obj.notes, url
+
+
+def results(query, user, kinds=KINDS, limit=20):
+    """search() with the found objects described for the API, one query per kind."""
+    ranked = search(query, user, kinds, limit)
+    query_terms = set(terms(query))
+    related = {
+        "service": [],
+        "review": ["session__service"],
+        "session": ["service"],
+    }
+    objects = {}
+    for kind in {kind for kind, _, _ in ranked}:
+        model, _ = INDEXES[kind]
+        ids = [object_id for found, object_id, _ in ranked if found == kind]
+        objects[kind] = model._default_manager.select_related(*related[kind]).in_bulk(
+            ids
+        )
+    found = []
+    for kind, object_id, score in ranked:
+        obj = objects[kind].get(object_id)
+        if obj is None:
+            # Deleted by a bulk operation since the last rebuild
+            continue
+        title, text, url = _describe(kind, obj)
+        found.append(
+            {
+                "kind": kind,
+                "id": object_id,
+                "score": round(score, 4),
+                "title": title,
+                "snippet": snippet(text, query_terms),
+                "url": url,
+            }
+        )
+    return found
@@ -1,8 +1,32 @@
-from django.db.models.signals import post_save
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    post_init,
+    post_save,
+    post_delete,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
 from django.core.mail import send_mail
 from django.conf import settings
-from .models import Session
+from django.utils import timezone
+from accounts.models import Profile
+from .availability import BLOCKING_STATUSES, invalidate_availability
+from .holds import claim_slot, release_session
+from .payments import refresh_payment_status
+from .ratings import add_rating
+from .search import INDEXES, KIND_OF_MODEL, index_document, remove_document
+from .models import (
+    Service,
+    Session,
+    Payment,
+    Review,
+    WorkingHours,
+    Break,
+    AvailabilityException,
+)
 
 
 @receiver(post_save, sender=Session)
@@ -14,12 +38,16 @@ def notify_session_created(sender, instance, created, **kwargs):
         from_email = settings.EMAIL_HOST_USER
         recipient_list = [instance.client.user.email]
 
-        send_mail(
-            subject,
-            message,
-            from_email,
-            recipient_list,
-            fail_silently=True,
+        # Až po commitu, odvolaná transakce e-mail nepošle
+        transaction.on_commit(
+            partial(
+                send_mail,
+                subject,
+                message,
+                from_email,
+                recipient_list,
+                fail_silently=True,
+            )
         )
 
 
@@ -32,10 +60,160 @@ def notify_session_status_change(sender, instance, **kwargs):
         from_email = settings.EMAIL_HOST_USER
         recipient_list = [instance.client.user.email]
 
-        send_mail(
-            subject,
-            message,
-            from_email,
-            recipient_list,
-            fail_silently=True,
+        # Až po commitu, odvolaná transakce e-mail nepošle
+        transaction.on_commit(
+            partial(
+                send_mail,
+                subject,
+                message,
+                from_email,
+                recipient_list,
+                fail_silently=True,
+            )
         )
+
+
+@receiver([post_save, post_delete], sender=Session)
+def refresh_coach_availability(sender, instance, **kwargs):
+    """
+    Cached free intervals of the coach include their sessions. After commit,
+    a reader could otherwise cache the old intervals under the new version.
+    """
+    transaction.on_commit(partial(invalidate_availability, instance.coach_id))
+
+
+@receiver(post_init, sender=Session)
+def remember_status(sender, instance, **kwargs):
+    """Status as loaded, None when deferred."""
+    instance._loaded_status = instance.__dict__.get("status")
+
+
+@receiver(pre_save, sender=Session)
+def reclaim_reinstated_slot(sender, instance, **kwargs):
+    """
+    A cancelled session set back to pending or confirmed claims its time
+    again before it is saved, unless the caller already did. Raises
+    SlotTaken when the time was taken in the meantime.
+    """
+    if (
+        instance._loaded_status == "CANCELLED"
+        and instance.status in BLOCKING_STATUSES
+        and not (instance.pk and instance.slot_holds.exists())
+    ):
+        claim_slot(
+            instance.coach, instance.client, instance.date_time, instance.duration
+        ).update(session=instance)
+
+
+@receiver(post_save, sender=Session)
+def release_cancelled_slot(sender, instance, **kwargs):
+    """A cancelled session gives its time back for booking."""
+    if instance.status == "CANCELLED":
+        release_session(instance)
+    instance._loaded_status = instance.status
+
+
+@receiver([post_save, post_delete], sender=Review)
+def touch_session(sender, instance, **kwargs):
+    """
+    Session rows are cached by Session.updated, so a review change bumps the
+    timestamp of its session (without firing the Session signals).
+    """
+    Session.objects.filter(pk=instance.session_id).update(updated=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=Payment)
+def update_payment_status(sender, instance, **kwargs):
+    """Payment state of the session, which also bumps its updated."""
+    refresh_payment_status(Session.objects.filter(pk=instance.session_id))
+
+
+@receiver([post_save, post_delete], sender=WorkingHours)
+@receiver([post_save, post_delete], sender=Break)
+@receiver([post_save, post_delete], sender=AvailabilityException)
+def touch_coach_profile(sender, instance, **kwargs):
+    """Slot responses are validated by the coach profile's updated timestamp."""
+    Profile.objects.filter(pk=instance.coach_id).update(updated=timezone.now())
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=Session)
+def update_search_index(sender, instance, created, update_fields, **kwargs):
+    """Reindexes the document when its searchable text may have changed."""
+    kind = KIND_OF_MODEL[sender]
+    if update_fields is not None and update_fields.isdisjoint(INDEXES[kind][1]):
+        return
+    index_document(kind, instance, created=created)
+
+
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=Session)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_document(KIND_OF_MODEL[sender], instance.pk)
+
+
+# The review was loaded with its session or rating deferred
+RATING_NOT_LOADED = object()
+
+
+@receiver(post_init, sender=Review)
+def remember_counted_rating(sender, instance, **kwargs):
+    """(session_id, rating) the totals include, None for a new review."""
+    values = instance.__dict__
+    if not instance.pk:
+        instance._counted_rating = None
+    elif "session_id" in values and "rating" in values:
+        instance._counted_rating = (values["session_id"], values["rating"])
+    else:
+        instance._counted_rating = RATING_NOT_LOADED
+
+
+@receiver(pre_save, sender=Review)
+@receiver(pre_delete, sender=Review)
+def load_counted_rating(sender, instance, update_fields=None, **kwargs):
+    """
+    Reads the counted values of a deferred review before they change. The
+    deferred fields get the stored values, so that the post_delete receivers
+    can still read them.
+    """
+    if instance._counted_rating is not RATING_NOT_LOADED:
+        return
+    if update_fields is not None and update_fields.isdisjoint(("rating", "session")):
+        return
+    counted = (
+        Review.objects.filter(pk=instance.pk)
+        .values_list("session_id", "rating")
+        .first()
+    )
+    if counted is not None:
+        instance.__dict__.setdefault("session_id", counted[0])
+        instance.__dict__.setdefault("rating", counted[1])
+    instance._counted_rating = counted
+
+
+@receiver(post_save, sender=Review)
+def count_review_rating(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and update_fields.isdisjoint(("rating", "session")):
+        return
+    counted = instance._counted_rating
+    current = (instance.session_id, instance.rating)
+    if counted == current:
+        return
+    if counted is None:
+        add_rating(*current, 1)
+    elif counted[0] == current[0]:
+        add_rating(current[0], current[1] - counted[1], 0)
+    else:
+        # Review moved to another session
+        add_rating(counted[0], -counted[1], -1)
+        add_rating(*current, 1)
+    instance._counted_rating = current
+
+
+@receiver(post_delete, sender=Review)
+def discount_review_rating(sender, instance, **kwargs):
+    if instance._counted_rating is not None:
+        session_id, rating = instance._counted_rating
+        add_rating(session_id, -rating, -1)
@@ -0,0 +1,18 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def role_key(user):
+    """Short role identifier used in template fragment cache keys."""
+    if not user.is_authenticated:
+        return "anonymous"
+    profile = getattr(user, "profile", None)
+    if profile is None:
+        return "no-profile"
+    if profile.is_coach:
+        return "coach"
+    if profile.is_client:
+        return "client"
+    return "user"
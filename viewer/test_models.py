@@ -1,7 +1,16 @@
 from django.test import TestCase
 from django.contrib.auth.models import User
-from viewer.models import Service, Session, Review
+from viewer.models import (
+    Service,
+    Session,
+    Review,
+    WorkingHours,
+    Break,
+    AvailabilityException,
+)
+from viewer.availability import coach_slots
 from accounts.models import Profile
+from zoneinfo import ZoneInfo
 from django.utils import timezone
 import datetime
 
@@ -76,6 +85,33 @@ class SessionModelTest(TestCase):
         self.assertEqual(self.session.client, self.client_profile)
         self.assertEqual(self.session.coach, self.coach_profile)
 
+    def test_payment_status_follows_payments(self):
+        from viewer.models import Payment, PaymentMethod
+
+        self.assertEqual(self.session.payment_status, "NONE")
+        payment = Payment.objects.create(
+            session=self.session,
+            amount=100,
+            payment_method=PaymentMethod.objects.create(name="paypal"),
+        )
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.payment_status, "UNPAID")
+        self.assertFalse(self.session.is_paid)
+
+        payment.paid_at = timezone.now()
+        payment.save()
+        self.session.refresh_from_db()
+        self.assertTrue(self.session.is_paid)
+        self.assertEqual(self.session.paid_at, payment.paid_at)
+        self.assertEqual(
+            Session.objects.filter(payment_status="PAID").get(), self.session
+        )
+
+        payment.delete()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.payment_status, "NONE")
+        self.assertIsNone(self.session.paid_at)
+
 
 class ReviewModelTest(TestCase):
     def setUp(self):
@@ -123,3 +159,119 @@ class ReviewModelTest(TestCase):
         self.assertTrue(isinstance(self.review, Review))
         self.assertEqual(self.review.rating, 5)
         self.assertEqual(self.review.comment, "Great session!")
+
+    def assertRatings(self, total, count):
+        self.service.refresh_from_db()
+        self.coach_profile.refresh_from_db()
+        self.assertEqual(
+            (self.service.rating_sum, self.service.rating_count), (total, count)
+        )
+        self.assertEqual(
+            (self.coach_profile.rating_sum, self.coach_profile.rating_count),
+            (total, count),
+        )
+
+    def test_rating_totals_follow_reviews(self):
+        self.assertRatings(5, 1)
+        updated = self.service.updated
+        Review.objects.create(session=self.session, rating=2)
+        self.assertRatings(7, 2)
+        self.assertEqual(self.service.average_rating, 3.5)
+        self.assertGreater(self.service.updated, updated)
+
+        review = Review.objects.get(pk=self.review.pk)
+        review.rating = 4
+        review.save()
+        self.assertRatings(6, 2)
+        review.comment = "Edited"
+        review.save()
+        self.assertRatings(6, 2)
+
+        review.delete()
+        self.assertRatings(2, 1)
+        Review.objects.all().delete()
+        self.assertRatings(0, 0)
+        self.assertIsNone(self.service.average_rating)
+
+    def test_rating_totals_of_deferred_reviews(self):
+        review = Review.objects.defer("rating").get(pk=self.review.pk)
+        review.comment = "Edited"
+        review.save()
+        self.assertRatings(5, 1)
+        review.rating = 3
+        review.save()
+        self.assertRatings(3, 1)
+
+        Review.objects.only("pk").get(pk=self.review.pk).delete()
+        self.assertRatings(0, 0)
+        Review.objects.create(session=self.session, rating=4)
+        Review.objects.defer("rating").delete()
+        self.assertRatings(0, 0)
+
+    def test_rebuild_ratings(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        Review.objects.bulk_create([Review(session=self.session, rating=3)])
+        Service.objects.update(rating_sum=0, rating_count=0)
+        out = StringIO()
+        call_command("rebuild_ratings", stdout=out)
+        self.assertIn("1 service(s) and 1 coach(es)", out.getvalue())
+        self.assertRatings(8, 2)
+
+
+class CoachScheduleTest(TestCase):
+    def setUp(self):
+        self.coach_profile = User.objects.create_user(
+            username="coach", password="testpass123"
+        ).profile
+        self.coach_profile.is_coach = True
+        self.coach_profile.timezone = "Europe/Prague"
+        self.coach_profile.booking_horizon_days = 2
+        self.coach_profile.save()
+        self.tz = ZoneInfo("Europe/Prague")
+        # Pondělí 6.1.2025 o půlnoci pražského času
+        self.now = datetime.datetime(2025, 1, 6, tzinfo=self.tz)
+
+    def local_times(self, slots):
+        return [slot.astimezone(self.tz).strftime("%a %H:%M") for slot in slots]
+
+    def test_default_hours_without_schedule(self):
+        slots = coach_slots(self.coach_profile, 60, [], self.now)
+        self.assertEqual(len(slots), 16)
+        self.assertEqual(self.local_times(slots)[0], "Mon 09:00")
+        self.assertEqual(self.local_times(slots)[-1], "Tue 16:00")
+
+    def test_schedule_breaks_exceptions_and_busy(self):
+        WorkingHours.objects.create(
+            coach=self.coach_profile,
+            weekday=0,
+            start=datetime.time(8),
+            end=datetime.time(12),
+        )
+        Break.objects.create(
+            coach=self.coach_profile, start=datetime.time(10), end=datetime.time(11)
+        )
+        AvailabilityException.objects.create(
+            coach=self.coach_profile,
+            date=datetime.date(2025, 1, 7),
+            start=datetime.time(18),
+            end=datetime.time(20),
+            is_available=True,
+        )
+        booked = datetime.datetime(2025, 1, 6, 8, tzinfo=self.tz)
+        busy = [(booked, booked + datetime.timedelta(minutes=60))]
+        self.coach_profile.slot_granularity = 30
+        slots = coach_slots(self.coach_profile, 60, busy, self.now)
+        self.assertEqual(
+            self.local_times(slots),
+            ["Mon 09:00", "Mon 11:00", "Tue 18:00", "Tue 18:30", "Tue 19:00"],
+        )
+
+    def test_slots_across_dst_change(self):
+        # 30.3.2025 se v Praze posouvá čas o hodinu dopředu
+        now = datetime.datetime(2025, 3, 30, tzinfo=self.tz)
+        self.coach_profile.booking_horizon_days = 1
+        slots = coach_slots(self.coach_profile, 60, [], now)
+        self.assertEqual(self.local_times(slots)[0], "Sun 09:00")
+        self.assertEqual(len(slots), 8)
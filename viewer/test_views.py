@@ -1,4 +1,4 @@
-from django.test import TestCase, Client
+from django.test import AsyncClient, TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
 from viewer.models import Service, Session, Review
@@ -148,6 +148,301 @@ class ViewsTest(TestCase):
         self.session.refresh_from_db()
         self.assertEqual(self.session.notes, 'Updated notes')
 
+    def test_service_list_not_modified(self):
+        url = reverse("viewer:services")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.service.description = "Changed description"
+        self.service.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_available_slots_not_modified(self):
+        self.client.login(username="client", password="testpass123")
+        url = reverse("viewer:available_slots") + f"?service={self.service.id}"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Session.objects.create(
+            client=self.client_profile,
+            coach=self.coach_profile,
+            service=self.service,
+            type="online",
+            duration=60,
+            date_time=timezone.now() + datetime.timedelta(days=2),
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async_views_under_asgi(self):
+        url = reverse("viewer:available_slots") + f"?service={self.service.id}"
+        client = AsyncClient()
+        for response in [
+            await client.get(url),
+            await client.post(reverse("viewer:paypal_create_order")),
+            await client.get(
+                reverse("viewer:paypal_return", kwargs={"session_id": self.session.pk})
+            ),
+        ]:
+            self.assertEqual(response.status_code, 302)
+            self.assertIn(reverse("accounts:login"), response["Location"])
+
+        await client.aforce_login(self.client_user)
+        response = await client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("slots", response.json())
+        response = await client.get(url, headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        response = await client.post(reverse("viewer:paypal_create_order"))
+        self.assertEqual(response.status_code, 400)
+
+    def test_available_slots_queries_and_missing_profile(self):
+        url = reverse("viewer:available_slots") + f"?service={self.service.id}"
+        self.client.login(username="client", password="testpass123")
+        self.client.get(url)
+        # Session, user with profile (sync and async), validator (service,
+        # sessions), service, client's sessions; no profile query, the
+        # coach's free time is cached
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        Profile.objects.filter(user=self.client_user).delete()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_availability_search(self):
+        from viewer.models import Category
+
+        other_coach = User.objects.create_user(
+            username="coach2", password="testpass123"
+        ).profile
+        other_coach.is_coach = True
+        other_coach.save()
+        yoga = Category.objects.create(name="Yoga")
+        Service.objects.create(
+            name="Yoga Session",
+            description="Morning yoga",
+            price=50.00,
+            duration=30,
+            coach=other_coach.user,
+            category=yoga,
+        )
+        other_client = User.objects.create_user(
+            username="client2", password="testpass123"
+        ).profile
+        tomorrow = (timezone.now() + datetime.timedelta(days=1)).date()
+        Session.objects.create(
+            client=other_client,
+            coach=self.coach_profile,
+            service=self.service,
+            type="online",
+            duration=60,
+            status="CONFIRMED",
+            date_time=datetime.datetime.combine(
+                tomorrow, datetime.time(10), tzinfo=datetime.timezone.utc
+            ),
+        )
+        self.client.login(username="client", password="testpass123")
+        url = reverse("viewer:availability_search")
+
+        response = self.client.get(url, {"at": f"{tomorrow}T10:00:00+00:00"})
+        self.assertEqual(
+            [result["name"] for result in response.json()["results"]],
+            ["Yoga Session"],
+        )
+
+        response = self.client.get(
+            url,
+            {
+                "start": f"{tomorrow}T09:00:00+00:00",
+                "end": f"{tomorrow}T12:00:00+00:00",
+            },
+        )
+        results = {result["name"]: result for result in response.json()["results"]}
+        self.assertEqual(results["Life Coaching Session"]["slot_count"], 2)
+        self.assertEqual(results["Yoga Session"]["slot_count"], 3)
+
+        response = self.client.get(
+            url,
+            {
+                "start": f"{tomorrow}T09:00:00+00:00",
+                "end": f"{tomorrow}T12:00:00+00:00",
+                "category": yoga.pk,
+            },
+        )
+        self.assertEqual(len(response.json()["results"]), 1)
+
+        response = self.client.get(url, {"start": "tomorrow"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_conditional_etag_depends_on_user(self):
+        url = reverse("viewer:services")
+        etag = self.client.get(url)["ETag"]
+        self.client.login(username="client", password="testpass123")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_service_detail_slots_match_api(self):
+        self.client.login(username="client", password="testpass123")
+        url = reverse("viewer:service_detail", kwargs={"pk": self.service.pk})
+        response = self.client.get(url)
+        etag = response["ETag"]
+        # The client's own session with another coach takes a slot away
+        taken = response.context["available_slots"][0]
+        other_coach = User.objects.create_user(
+            username="coach2", password="testpass123"
+        ).profile
+        Session.objects.create(
+            client=self.client_profile,
+            coach=other_coach,
+            service=self.service,
+            type="online",
+            duration=60,
+            date_time=taken,
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(taken, response.context["available_slots"])
+        api = self.client.get(
+            reverse("viewer:available_slots") + f"?service={self.service.id}"
+        )
+        self.assertEqual(
+            [slot.isoformat() for slot in response.context["available_slots"]],
+            [
+                datetime.datetime.fromisoformat(slot["value"])
+                .astimezone(datetime.timezone.utc)
+                .isoformat()
+                for slot in api.json()["slots"]
+            ],
+        )
+
+    def test_service_detail_anonymous_uses_cached_availability(self):
+        url = reverse("viewer:service_detail", kwargs={"pk": self.service.pk})
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["available_slots"])
+
+        # A new booking of the coach invalidates the cached free time
+        booked = response.context["available_slots"][0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Session.objects.create(
+                client=self.client_profile,
+                coach=self.coach_profile,
+                service=self.service,
+                type="online",
+                duration=60,
+                date_time=booked,
+            )
+        response = self.client.get(url)
+        self.assertNotIn(booked, response.context["available_slots"])
+
+    def test_request_loads_profile_and_object_once(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.login(username="client", password="testpass123")
+        url = reverse("viewer:session_edit", kwargs={"pk": self.session.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        sqls = [query["sql"] for query in queries]
+        # The user comes with the profile, the session is fetched once
+        user_queries = [sql for sql in sqls if 'FROM "auth_user"' in sql]
+        self.assertEqual(len(user_queries), 1)
+        self.assertIn('JOIN "accounts_profile"', user_queries[0])
+        self.assertFalse([sql for sql in sqls if 'FROM "accounts_profile"' in sql])
+        session_queries = [
+            sql
+            for sql in sqls
+            if 'FROM "viewer_session" WHERE "viewer_session"."id"' in sql
+        ]
+        self.assertEqual(len(session_queries), 1)
+
+    def test_service_review_list_cursor_pages(self):
+        url = reverse(
+            "viewer:service_review_list", kwargs={"service_id": self.service.pk}
+        )
+        self.client.login(username="coach", password="testpass123")
+        Review.objects.create(session=self.session, rating=5)
+        # Session, user with profile, the validator's two, service, the page
+        # and the histogram
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertEqual(response.context["review_count"], 1)
+        # Unchanged reviews: 304 without running the view
+        etag = response["ETag"]
+        with self.assertNumQueries(4):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Review.objects.bulk_create(
+            [Review(session=self.session, rating=1 + i % 5) for i in range(24)]
+        )
+        with self.assertNumQueries(7):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.context["review_count"], 25)
+        self.assertEqual(response.context["average_rating"], 3.0)
+        self.assertEqual(response.context["histogram"][0], (5, 5, 20.0))
+        first_page = response.context["reviews"]
+        self.assertEqual(len(first_page), 20)
+
+        etag = response["ETag"]
+        response = self.client.get(
+            url, {"cursor": response.context["next_cursor"]}, HTTP_IF_NONE_MATCH=etag
+        )
+        # The second page is validated apart from the first
+        self.assertEqual(len(response.context["reviews"]), 5)
+        self.assertIsNone(response.context["next_cursor"])
+        seen = {review.pk for review in first_page + response.context["reviews"]}
+        self.assertEqual(len(seen), 25)
+
+        self.assertEqual(self.client.get(url, {"cursor": "nonsense"}).status_code, 400)
+
+    def test_session_admin_changelist_queries_do_not_grow(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        User.objects.create_superuser("admin", "admin@example.com", "adminpass123")
+        self.client.login(username="admin", password="adminpass123")
+        url = reverse("admin:viewer_session_changelist")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        for i in range(5):
+            other = User.objects.create_user(username=f"other{i}").profile
+            Session.objects.create(
+                client=other,
+                coach=self.coach_profile,
+                service=self.service,
+                duration=60,
+                date_time=timezone.now() + datetime.timedelta(days=i + 2),
+            )
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url)
+        self.assertEqual(response.context["cl"].result_count, 6)
+        # Related rows are searched in a box, not listed as filter links
+        self.assertNotContains(response, "other4</option>")
+        self.assertContains(response, 'data-lookup="client__id__exact"')
+
+        response = self.client.get(url, {"client__id__exact": self.client_profile.pk})
+        self.assertEqual(response.context["cl"].result_count, 1)
+        self.assertContains(
+            response,
+            f'<option value="{self.client_profile.pk}" selected>client</option>',
+        )
+
     # def test_coach_list_view(self):
     #     response = self.client.get(reverse('viewer:coach-list'))
     #     self.assertEqual(response.status_code, 200)
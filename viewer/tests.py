@@ -1,10 +1,20 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from accounts.models import Profile
-from .models import Service, Session, Payment, PaymentMethod
+from .availability import availability_version
+from .fakes import serve_paypal
+from .holds import SlotTaken
+from .models import Service, Session, Payment, PaymentMethod, SlotHold
+from .utils import paypal
 from django.utils import timezone
 import datetime
+import io
+import json
+import tempfile
+
+from django.core import mail
+from django.core.management import CommandError, call_command
 
 
 class ViewerTests(TestCase):
@@ -190,3 +200,445 @@ class ViewerTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "viewer/coach_report.html")
         self.assertContains(response, "Test Service")
+
+    def test_cached_session_row_refreshes_after_payment(self):
+        """Cached session rows are invalidated when a payment changes"""
+        session = Session.objects.create(
+            client=self.client_profile,
+            coach=self.coach_profile,
+            service=self.service,
+            date_time=timezone.now() + datetime.timedelta(days=2),
+            type="online",
+            status="CONFIRMED",
+            duration=60,
+        )
+        payment_method = PaymentMethod.objects.create(name="paypal")
+        payment = Payment.objects.create(
+            session=session, amount=self.service.price, payment_method=payment_method
+        )
+        self.client.login(username="client", password="clientpass123")
+
+        response = self.client.get(reverse("viewer:session_history"))
+        self.assertContains(response, "❌")
+        self.assertNotContains(response, "✔️")
+
+        payment.paid_at = timezone.now()
+        payment.save()
+        response = self.client.get(reverse("viewer:session_history"))
+        self.assertContains(response, "✔️")
+
+        # Přejmenování služby i klienta se v řádcích projeví hned
+        self.service.name = "Renamed Service"
+        self.service.save()
+        self.client_user.first_name = "Klára"
+        self.client_user.save()
+        response = self.client.get(reverse("viewer:session_history"))
+        self.assertContains(response, "Renamed Service")
+        self.assertContains(response, "Klára")
+        # Formulář zrušení s CSRF tokenem je mimo cachovaný řádek
+        self.assertContains(response, f'form="cancel-session-{session.pk}"')
+        self.assertContains(response, f'id="cancel-session-{session.pk}"')
+
+    def test_slot_hold_blocks_other_clients(self):
+        """Podržený slot nemůže zarezervovat jiný klient"""
+        other_user = User.objects.create_user(
+            username="other", email="other@example.com", password="otherpass123"
+        )
+        other_user.profile.is_client = True
+        other_user.profile.save()
+        payment_method = PaymentMethod.objects.create(name="paypal")
+        slot = (timezone.now() + datetime.timedelta(days=2)).strftime("%Y-%m-%d %H:00")
+
+        self.client.login(username="client", password="clientpass123")
+        response = self.client.post(
+            reverse("viewer:slot_hold"), {"service": self.service.id, "date_time": slot}
+        )
+        self.assertEqual(response.status_code, 201)
+        hold = response.json()["hold"]
+
+        other = Client()
+        other.login(username="other", password="otherpass123")
+        response = other.post(
+            reverse("viewer:slot_hold"), {"service": self.service.id, "date_time": slot}
+        )
+        self.assertEqual(response.status_code, 409)
+        booking = {
+            "service": self.service.id,
+            "date_time": slot,
+            "type": "online",
+            "payment_method": payment_method.id,
+        }
+        response = other.post(reverse("viewer:booking_create"), booking)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("date_time", response.context["form"].errors)
+        self.assertFalse(Session.objects.exists())
+
+        response = self.client.post(
+            reverse("viewer:booking_create"), dict(booking, hold=hold)
+        )
+        self.assertEqual(response.status_code, 302)
+        session = Session.objects.get()
+        self.assertEqual(session.slot_holds.count(), 4)
+        self.assertFalse(session.slot_holds.filter(expires_at__isnull=False).exists())
+
+        # Zrušená session uvolní čas
+        session.status = "CANCELLED"
+        session.save()
+        response = other.post(
+            reverse("viewer:slot_hold"), {"service": self.service.id, "date_time": slot}
+        )
+        self.assertEqual(response.status_code, 201)
+
+        # Obnovení zrušené session znovu zabere čas, dokud ho někdo drží, nejde
+        session.status = "PENDING"
+        with self.assertRaises(SlotTaken):
+            session.save()
+        # Podržení vyprší
+        SlotHold.objects.filter(session__isnull=True).update(
+            expires_at=timezone.now() - datetime.timedelta(minutes=1)
+        )
+        session.save()
+        self.assertEqual(session.slot_holds.count(), 4)
+        response = other.post(
+            reverse("viewer:slot_hold"), {"service": self.service.id, "date_time": slot}
+        )
+        self.assertEqual(response.status_code, 409)
+
+        # Nesmyslný čas je chyba požadavku, ne serveru
+        response = other.post(
+            reverse("viewer:slot_hold"),
+            {"service": self.service.id, "date_time": "2030-13-45 10:00"},
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_reinstating_cancelled_session(self):
+        """Kouč obnoví zrušenou session, s přesunem i bez něj"""
+        from .holds import claim_slot
+
+        start = (timezone.now() + datetime.timedelta(days=2)).replace(
+            minute=0, second=0, microsecond=0
+        )
+        session = Session.objects.create(
+            client=self.client_profile,
+            coach=self.coach_profile,
+            service=self.service,
+            date_time=start,
+            type="online",
+            status="CANCELLED",
+            duration=60,
+            meeting_url="https://meet.test/session",
+        )
+        url = reverse("viewer:session_edit", args=[session.id])
+        data = {
+            "service": self.service.id,
+            "type": "online",
+            "meeting_url": "https://meet.test/session",
+            "payment_method": PaymentMethod.objects.create(name="paypal").id,
+            "confirm_and_save": "1",
+        }
+        self.client.login(username="coach", password="coachpass123")
+
+        # Obnovení s přesunem na volný čas
+        moved = start + datetime.timedelta(hours=3)
+        response = self.client.post(
+            url, dict(data, date_time=moved.strftime("%Y-%m-%d %H:%M"))
+        )
+        self.assertEqual(response.status_code, 302)
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.date_time), ("CONFIRMED", moved))
+        self.assertEqual(session.slot_holds.count(), 4)
+
+        # Obnovení bez přesunu na čas, který mezitím zabral jiný klient
+        session.status = "CANCELLED"
+        session.save()
+        other = User.objects.create_user(username="other", password="otherpass123")
+        claim_slot(self.coach_profile, other.profile, moved, 60)
+        response = self.client.post(
+            url, dict(data, date_time=moved.strftime("%Y-%m-%d %H:%M"))
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("date_time", response.context["form"].errors)
+        session.refresh_from_db()
+        self.assertEqual(session.status, "CANCELLED")
+        self.assertFalse(session.slot_holds.exists())
+
+    def test_recurring_series_booking(self):
+        """Týdenní série se vytvoří najednou včetně plateb"""
+        payment_method = PaymentMethod.objects.create(name="paypal")
+        first = (timezone.now() + datetime.timedelta(days=1)).replace(
+            hour=10, minute=0, second=0, microsecond=0
+        )
+        # Čtvrtý týden je kouč už obsazený
+        other_user = User.objects.create_user(username="other", password="x")
+        taken = Session.objects.create(
+            client=other_user.profile,
+            coach=self.coach_profile,
+            service=self.service,
+            date_time=first + datetime.timedelta(weeks=3),
+            type="online",
+            status="CONFIRMED",
+            duration=60,
+        )
+        self.client.login(username="client", password="clientpass123")
+        booking = {
+            "service": self.service.id,
+            "date_time": first.strftime("%Y-%m-%d %H:%M"),
+            "type": "online",
+            "payment_method": payment_method.id,
+            "repeat": "WEEKLY",
+            "repeat_interval": 1,
+            "repeat_count": 4,
+            "notes": "Dechová cvičení",
+        }
+        response = self.client.post(reverse("viewer:booking_create"), booking)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("date_time", response.context["form"].errors)
+        self.assertEqual(Session.objects.filter(client=self.client_profile).count(), 0)
+
+        taken.delete()
+        response = self.client.post(reverse("viewer:booking_create"), booking)
+        self.assertEqual(response.status_code, 302)
+        sessions = Session.objects.filter(client=self.client_profile).order_by(
+            "date_time"
+        )
+        self.assertEqual(
+            [session.date_time for session in sessions],
+            [first + datetime.timedelta(weeks=week) for week in range(4)],
+        )
+        self.assertEqual(Payment.objects.filter(session__in=sessions).count(), 4)
+        self.assertEqual(
+            sessions[0].series.rrule, "RRULE:FREQ=WEEKLY;INTERVAL=1;COUNT=4"
+        )
+        self.assertEqual(sessions[0].slot_holds.count(), 4)
+
+        # Poznámky sezení série jsou hned k vyhledání
+        found = self.client.get(
+            reverse("viewer:search"), {"q": "dechova", "kind": "session"}
+        ).json()["results"]
+        self.assertEqual(
+            sorted(r["id"] for r in found), [session.pk for session in sessions]
+        )
+
+    def test_booking_is_idempotent(self):
+        """Opakovaný požadavek se stejným klíčem nevytvoří druhou rezervaci"""
+        payment_method = PaymentMethod.objects.create(name="paypal")
+        self.client.login(username="client", password="clientpass123")
+        response = self.client.get(reverse("viewer:booking_create"))
+        key = response.context["form"].initial["idempotency_key"]
+        booking = {
+            "service": self.service.id,
+            "date_time": (timezone.now() + datetime.timedelta(days=1)).strftime(
+                "%Y-%m-%d %H:00"
+            ),
+            "type": "online",
+            "payment_method": payment_method.id,
+            "idempotency_key": key,
+        }
+        # E-mail a nová verze volných časů kouče až po commitu
+        version = availability_version(self.coach_profile.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("viewer:booking_create"), booking)
+            self.assertEqual(len(mail.outbox), 0)
+            self.assertEqual(availability_version(self.coach_profile.pk), version)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertNotEqual(availability_version(self.coach_profile.pk), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("viewer:booking_create"), booking, follow=True
+            )
+        self.assertContains(response, "already been made")
+        session = Session.objects.get(client=self.client_profile)
+        self.assertEqual(session.idempotency_key, key)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+        # Klíč může přijít i v hlavičce
+        del booking["idempotency_key"]
+        response = self.client.post(
+            reverse("viewer:booking_create"), booking, headers={"Idempotency-Key": key}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Session.objects.count(), 1)
+
+    @override_settings(FAKE_EXTERNAL_SERVICES=True, FAKE_SERVICE_LATENCY=0)
+    def test_booking_and_payment_with_fake_services(self):
+        """Rezervace a platba proti náhradám Googlu a PayPalu"""
+        self.coach_profile.google_refresh_token = "fake"
+        self.coach_profile.save()
+        payment_method = PaymentMethod.objects.create(name="paypal")
+        self.client.login(username="client", password="clientpass123")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("viewer:booking_create"),
+                {
+                    "service": self.service.id,
+                    "date_time": (timezone.now() + datetime.timedelta(days=3)).strftime(
+                        "%Y-%m-%d %H:00"
+                    ),
+                    "type": "online",
+                    "payment_method": payment_method.id,
+                },
+            )
+        self.assertEqual(response.status_code, 302)
+        session = Session.objects.get(client=self.client_profile)
+        self.assertTrue(session.google_calendar_event_id)
+
+        server = serve_paypal(latency=0)
+        self.addCleanup(server.shutdown)
+        base = paypal.PAYPAL_API_BASE
+        paypal.PAYPAL_API_BASE = server.url
+        self.addCleanup(setattr, paypal, "PAYPAL_API_BASE", base)
+        response = self.client.post(
+            reverse("viewer:paypal_create_order"), {"session_id": session.pk}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["approval_url"].startswith(server.url))
+        response = self.client.get(
+            reverse("viewer:paypal_return", kwargs={"session_id": session.pk})
+        )
+        self.assertEqual(response.status_code, 302)
+        session.refresh_from_db()
+        self.assertTrue(session.is_paid)
+
+    def test_bulk_import_and_export(self):
+        """Import sessions z CSV s chybným řádkem a export zpět"""
+        rows = [
+            "client_id,coach_id,service_id,date_time,duration,status",
+            f"{self.client_profile.pk},{self.coach_profile.pk},{self.service.pk},"
+            "2030-01-01 10:00,60,CONFIRMED",
+            f"{self.client_profile.pk},{self.coach_profile.pk},{self.service.pk},"
+            "2030-01-02 10:00,60,UNKNOWN",
+            f"{self.client_profile.pk},9999,{self.service.pk},2030-01-03 10:00,60,",
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("\n".join(rows))
+        out, err = io.StringIO(), io.StringIO()
+        call_command(
+            "import_data",
+            "session",
+            f.name,
+            "--batch-size",
+            "2",
+            stdout=out,
+            stderr=err,
+        )
+        self.assertIn("1 created", out.getvalue())
+        self.assertIn("Line 3: status", err.getvalue())
+        self.assertIn("Line 4: coach_id: 9999 does not exist", err.getvalue())
+        session = Session.objects.get()
+        self.assertEqual(session.status, "CONFIRMED")
+        self.assertEqual(session.type, "online")
+
+        out = io.StringIO()
+        call_command("export_data", "session", "--format", "json", stdout=out)
+        exported = json.loads(out.getvalue())
+        self.assertEqual(exported["id"], session.pk)
+        self.assertEqual(exported["coach_id"], self.coach_profile.pk)
+
+        # Řádek s existujícím id se aktualizuje
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write(json.dumps({"id": session.pk, "status": "CANCELLED"}) + "\n")
+        call_command("import_data", "session", f.name, stdout=io.StringIO())
+        session.refresh_from_db()
+        self.assertEqual(session.status, "CANCELLED")
+        self.assertEqual(session.duration, 60)
+
+        # Objekty s jinými klíči než první se odmítnou, ne tiše ořežou
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write(json.dumps({"id": session.pk, "status": "PENDING"}) + "\n")
+            f.write(json.dumps({"id": session.pk, "duration": 90}) + "\n")
+        err = io.StringIO()
+        call_command("import_data", "session", f.name, stdout=io.StringIO(), stderr=err)
+        self.assertIn(
+            "Line 2: keys not in the first object: duration; missing keys: status",
+            err.getvalue(),
+        )
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.duration), ("PENDING", 60))
+
+        # Chybný první řádek import zastaví, sloupce nejsou známé
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write("{nonsense\n")
+            f.write(json.dumps({"id": session.pk, "status": "CONFIRMED"}) + "\n")
+        with self.assertRaisesMessage(CommandError, "Line 1: invalid JSON"):
+            call_command("import_data", "session", f.name, stdout=io.StringIO())
+        session.refresh_from_db()
+        self.assertEqual(session.status, "PENDING")
+
+        # Importované platby aktualizují stav placení session po dávkách
+        method = PaymentMethod.objects.create(name="paypal")
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            for paid_at in (None, "2030-01-01T09:00:00+00:00"):
+                payment = {
+                    "session_id": session.pk,
+                    "amount": "100.00",
+                    "payment_method_id": method.pk,
+                    "paid_at": paid_at,
+                }
+                f.write(json.dumps(payment) + "\n")
+        call_command(
+            "import_data", "payment", f.name, "--batch-size", "1", stdout=io.StringIO()
+        )
+        session.refresh_from_db()
+        self.assertTrue(session.is_paid)
+
+    def test_full_text_search(self):
+        """Test fulltextového vyhledávání a jeho průběžné aktualizace"""
+        from .models import Review, SearchTerm
+
+        Service.objects.create(
+            name="Hypnóza proti stresu",
+            description="Relaxace a práce se stresem.",
+            price=80,
+            duration=60,
+            coach=self.coach_user,
+        )
+        session = Session.objects.create(
+            client=self.client_profile,
+            coach=self.coach_profile,
+            service=self.service,
+            duration=60,
+            date_time=timezone.now() + datetime.timedelta(days=3),
+            notes="Klient zmínil stres v práci.",
+        )
+        Review.objects.create(session=session, rating=5, comment="Stres je pryč!")
+        url = reverse("viewer:search")
+
+        # Anonym najde jen služby, bez ohledu na diakritiku
+        found = self.client.get(url, {"q": "hypnoza stres"}).json()["results"]
+        self.assertEqual(
+            [(r["kind"], r["title"]) for r in found][:1],
+            [("service", "Hypnóza proti stresu")],
+        )
+        self.assertEqual({r["kind"] for r in found}, {"service"})
+
+        self.client.login(username="client", password="clientpass123")
+        found = self.client.get(url, {"q": "stres"}).json()["results"]
+        self.assertEqual({r["kind"] for r in found}, {"service", "review", "session"})
+
+        # Uložení poznámek přeindexuje jen session
+        session.notes = "Probrali jsme spánek."
+        session.save()
+        found = self.client.get(url, {"q": "spanek", "kind": "session"}).json()
+        self.assertEqual([r["id"] for r in found["results"]], [session.pk])
+        self.assertFalse(
+            SearchTerm.objects.filter(kind="session", term="stres").exists()
+        )
+
+        # Cizí klient poznámky session nenajde
+        User.objects.create_user(username="other", password="otherpass123")
+        self.client.login(username="other", password="otherpass123")
+        found = self.client.get(url, {"q": "spanek"}).json()["results"]
+        self.assertEqual(found, [])
+
+        session.delete()
+        self.assertFalse(SearchTerm.objects.filter(kind="session").exists())
+        self.assertEqual(
+            self.client.get(url, {"q": "x", "limit": "0"}).status_code, 400
+        )
+        call_command("rebuild_search_index", stdout=io.StringIO())
+        self.assertTrue(
+            SearchTerm.objects.filter(kind="service", term="hypnoza").exists()
+        )
@@ -60,6 +60,13 @@ urlpatterns = [
         views.AvailableSlotsView.as_view(),
         name="available_slots",
     ),
+    path("api/slot-holds/", views.SlotHoldView.as_view(), name="slot_hold"),
+    path(
+        "api/availability-search/",
+        views.AvailabilitySearchView.as_view(),
+        name="availability_search",
+    ),
+    path("api/search/", views.SearchView.as_view(), name="search"),
     path(
         "sessions/<int:pk>/mark-as-paid/",
         views.MarkAsPaidView.as_view(),
@@ -0,0 +1,102 @@
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from viewer.utils.bulk_io import RESOURCES, after_import, export_rows, import_file
+
+
+class BulkImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV with a header row, or JSON Lines")
+    dry_run = forms.BooleanField(required=False, label="Only validate")
+
+
+class BulkImportExportMixin:
+    """
+    Admin actions streaming the selected rows as CSV / JSON Lines and an
+    import page on the change list. bulk_resource: key of RESOURCES
+    """
+
+    bulk_resource = None
+    change_list_template = "admin/bulk_change_list.html"
+    actions = ["export_csv", "export_json"]
+
+    def _export(self, queryset, fmt):
+        resource = RESOURCES[self.bulk_resource]
+        content_type = "text/csv" if fmt == "csv" else "application/jsonl"
+        response = StreamingHttpResponse(
+            export_rows(resource, queryset, fmt), content_type=content_type
+        )
+        extension = "csv" if fmt == "csv" else "jsonl"
+        response["Content-Disposition"] = (
+            f'attachment; filename="{self.bulk_resource}s.{extension}"'
+        )
+        return response
+
+    @admin.action(description="Export selected as CSV")
+    def export_csv(self, request, queryset):
+        return self._export(queryset, "csv")
+
+    @admin.action(description="Export selected as JSON Lines")
+    def export_json(self, request, queryset):
+        return self._export(queryset, "json")
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path(
+                "import/",
+                self.admin_site.admin_view(self.import_view),
+                name="%s_%s_import" % info,
+            )
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(
+            request
+        ):
+            return redirect("admin:index")
+        form = BulkImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            upload = form.cleaned_data["file"]
+            fmt = "json" if upload.name.endswith((".json", ".jsonl")) else "csv"
+            stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+            try:
+                result = import_file(
+                    RESOURCES[self.bulk_resource],
+                    stream,
+                    fmt,
+                    dry_run=form.cleaned_data["dry_run"],
+                )
+            except ValueError as error:
+                form.add_error("file", str(error))
+            else:
+                if not form.cleaned_data["dry_run"]:
+                    note = after_import(self.bulk_resource, result)
+                    if note:
+                        messages.info(request, note)
+                for line, message in result.errors[:20]:
+                    messages.error(request, f"Line {line}: {message}")
+                level = messages.WARNING if result.errors else messages.SUCCESS
+                prefix = "Dry run: " if form.cleaned_data["dry_run"] else ""
+                messages.add_message(
+                    request,
+                    level,
+                    f"{prefix}{result.created} created, {result.updated} updated, "
+                    f"{len(result.errors)} rows with errors.",
+                )
+                return redirect(
+                    "admin:%s_%s_changelist"
+                    % (self.model._meta.app_label, self.model._meta.model_name)
+                )
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "form": form,
+            "title": f"Import {self.model._meta.verbose_name_plural}",
+        }
+        return TemplateResponse(request, "admin/bulk_import.html", context)
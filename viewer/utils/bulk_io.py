@@ -0,0 +1,392 @@
+"""
+Streaming CSV / JSON Lines import and export of services, sessions,
+payments, profiles and client intake questionnaires.
+
+Files are read row by row and written to the database in chunks with
+bulk_create / bulk_update, so memory stays bounded by the batch size no
+matter how long the file is. Rows are validated field by field; foreign
+keys and existing rows are looked up with one query per chunk. Invalid rows
+are skipped and reported with their line number. JSON files are JSON Lines,
+one object per line, which unlike a JSON array can be streamed.
+"""
+
+import csv
+import datetime
+import itertools
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, models, transaction
+from django.utils import timezone
+
+from accounts.models import ClientIntake, Profile
+from viewer.availability import invalidate_availability
+from viewer.models import Payment, Service, Session
+from viewer.payments import refresh_payment_status
+from viewer.search import KINDS as SEARCH_KINDS
+
+FORMATS = ["csv", "json"]
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Resource:
+    """
+    Columns of a model in import/export files: concrete fields by attname,
+    so foreign keys are ids, without auto timestamps and files.
+    match: column identifying an existing row to update
+    """
+
+    def __init__(self, model, match="id", exclude=()):
+        self.model = model
+        self.match = match
+        self.fields = [
+            field
+            for field in model._meta.concrete_fields
+            if field.name not in exclude
+            and not isinstance(field, models.FileField)
+            and not getattr(field, "auto_now", False)
+            and not getattr(field, "auto_now_add", False)
+        ]
+        self.columns = [field.attname for field in self.fields]
+        self.by_column = {field.attname: field for field in self.fields}
+
+
+# Rating totals follow the reviews, rebuild_ratings recomputes them
+RATING_TOTALS = ["rating_sum", "rating_count"]
+
+RESOURCES = {
+    "service": Resource(Service, exclude=RATING_TOTALS),
+    # Payment state follows the payments
+    "session": Resource(
+        Session, exclude=["payment_status", "paid_at", "idempotency_key"]
+    ),
+    "payment": Resource(Payment),
+    # Tokens are never exported, profiles are matched by their user
+    "profile": Resource(
+        Profile, match="user_id", exclude=["google_refresh_token", *RATING_TOTALS]
+    ),
+    "intake": Resource(ClientIntake, match="profile_id"),
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []  # (line, message)
+
+    @property
+    def rows(self):
+        return self.created + self.updated + len(self.errors)
+
+
+def read_rows(stream, fmt):
+    """Yields (line, row, error) from a text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            if None in row:
+                # DictReader puts values past the header under None
+                yield reader.line_num, None, "more values than header columns"
+                continue
+            yield reader.line_num, row, None
+        return
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as error:
+            yield line, None, f"invalid JSON ({error})"
+            continue
+        if not isinstance(row, dict):
+            yield line, None, "expected a JSON object"
+            continue
+        yield line, row, None
+
+
+def _converter(field, tz):
+    """
+    Function turning a file value into the field's Python value, raises
+    ValidationError. Built once per column, so the per-value work is only
+    the conversion itself.
+    """
+    if isinstance(field, models.ForeignKey):
+        to_python = field.target_field.to_python
+    elif isinstance(field, models.DateTimeField):
+
+        def to_python(value):
+            if isinstance(value, str):
+                try:
+                    # C parser first, Field.clean() gives the proper error
+                    value = datetime.datetime.fromisoformat(value)
+                except ValueError:
+                    pass
+            value = field.clean(value, None)
+            return value.replace(tzinfo=tz) if value.tzinfo is None else value
+
+    elif isinstance(field, models.JSONField):
+
+        def to_python(value):
+            if isinstance(value, str):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    raise ValidationError("Enter a valid JSON.")
+            return field.clean(value, None)
+
+    else:
+
+        def to_python(value):
+            return field.clean(value, None)
+
+    if field.has_default():
+        empty = field.get_default()
+    elif isinstance(field, (models.CharField, models.TextField)):
+        empty = ""
+    else:
+        empty = None
+
+    def convert(value):
+        if value == "" or value is None:
+            if field.null:
+                return None
+            if empty is None:
+                raise ValidationError("This field cannot be null.")
+            value = empty
+        return to_python(value)
+
+    return convert
+
+
+def _parse(converters, row):
+    """Returns (values, error)."""
+    values = {}
+    errors = []
+    for column, convert in converters:
+        try:
+            values[column] = convert(row.get(column))
+        except ValidationError as error:
+            errors.append(f"{column}: {' '.join(error.messages)}")
+    return values, "; ".join(errors) or None
+
+
+def _missing_references(resource, parsed, columns):
+    """Foreign key values of the chunk that do not exist, one query per key."""
+    missing = {}
+    for column in columns:
+        field = resource.by_column[column]
+        if not isinstance(field, models.ForeignKey):
+            continue
+        ids = {values[column] for _, values in parsed if values[column] is not None}
+        existing = set(
+            field.related_model._default_manager.filter(pk__in=ids).values_list(
+                "pk", flat=True
+            )
+        )
+        missing[column] = ids - existing
+    return missing
+
+
+def _invalidate_coaches(coach_ids):
+    for coach_id in coach_ids:
+        invalidate_availability(coach_id)
+
+
+def _refresh_sessions(session_ids):
+    refresh_payment_status(Session.objects.filter(pk__in=session_ids))
+
+
+# What the bulk writes skip as they send no signals, done after each saved
+# chunk: {model: (foreign key column, refresh(ids of the chunk's rows))}
+AFTER_SAVE = {
+    Session: ("coach_id", _invalidate_coaches),
+    Payment: ("session_id", _refresh_sessions),
+}
+
+
+def _import_chunk(resource, chunk, columns, converters, result, dry_run):
+    parsed = []
+    for line, row, error in chunk:
+        if error is None:
+            values, error = _parse(converters, row)
+        if error is not None:
+            result.errors.append((line, error))
+            continue
+        parsed.append((line, values))
+
+    missing = _missing_references(resource, parsed, columns)
+    keys = {values.get(resource.match) for _, values in parsed} - {None}
+    existing = dict(
+        resource.model._default_manager.filter(
+            **{f"{resource.match}__in": keys}
+        ).values_list(resource.match, "pk")
+    )
+
+    to_create, to_update = [], []
+    seen = set()
+    for line, values in parsed:
+        errors = [
+            f"{column}: {values[column]} does not exist"
+            for column, ids in missing.items()
+            if values[column] in ids
+        ]
+        key = values.get(resource.match)
+        if key is not None and key in seen:
+            errors.append(f"{resource.match}: {key} repeats in the file")
+        if errors:
+            result.errors.append((line, "; ".join(errors)))
+            continue
+        seen.add(key)
+        instance = resource.model(**values)
+        if key in existing:
+            instance.pk = existing[key]
+            to_update.append(instance)
+        else:
+            to_create.append(instance)
+
+    if not dry_run:
+        after_save = AFTER_SAVE.get(resource.model)
+        if after_save:
+            column, refresh = after_save
+            touched = {getattr(instance, column) for instance in to_create + to_update}
+            # Updated rows also refresh what they pointed to before
+            touched.update(
+                resource.model._default_manager.filter(
+                    pk__in=[instance.pk for instance in to_update]
+                ).values_list(column, flat=True)
+            )
+            touched.discard(None)
+        update_fields = [
+            resource.by_column[column].name
+            for column in columns
+            if column != resource.match and not resource.by_column[column].primary_key
+        ]
+        try:
+            with transaction.atomic():
+                if to_create:
+                    resource.model._default_manager.bulk_create(to_create)
+                if to_update and update_fields:
+                    resource.model._default_manager.bulk_update(
+                        to_update, update_fields
+                    )
+        except DatabaseError as error:
+            # The whole chunk is rolled back, report it on its first line
+            result.errors.append(
+                (chunk[0][0], f"chunk of {len(chunk)} rows not saved: {error}")
+            )
+            return
+        if after_save:
+            refresh(touched)
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+
+def import_rows(
+    resource, rows, columns, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, progress=None
+):
+    """
+    Imports (line, row, error) tuples from read_rows() in chunks of
+    batch_size. Only the given columns are set on created rows and updated
+    on existing ones. progress(result) is called after every chunk.
+    """
+    unknown = [column for column in columns if column not in resource.by_column]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    tz = timezone.get_current_timezone()
+    converters = [
+        (column, _converter(resource.by_column[column], tz)) for column in columns
+    ]
+    result = ImportResult()
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, batch_size)):
+        _import_chunk(resource, chunk, columns, converters, result, dry_run)
+        if progress:
+            progress(result)
+    return result
+
+
+def _same_keys(rows, columns):
+    """Rejects JSON objects whose keys differ from the first object's."""
+    expected = set(columns)
+    for line, row, error in rows:
+        if error is None and row.keys() != expected:
+            problems = []
+            if extra := sorted(row.keys() - expected):
+                problems.append(f"keys not in the first object: {', '.join(extra)}")
+            if missing := sorted(expected - row.keys()):
+                problems.append(f"missing keys: {', '.join(missing)}")
+            row, error = None, "; ".join(problems)
+        yield line, row, error
+
+
+def import_file(resource, stream, fmt, **kwargs):
+    """
+    Imports a text stream. The columns are the CSV header or the keys of the
+    first JSON object, which every other object must have too; columns
+    missing in the file are left untouched. Raises ValueError when the first
+    object is not valid, there are no columns to import then.
+    """
+    rows = read_rows(stream, fmt)
+    first = next(rows, None)
+    if first is None:
+        return ImportResult()
+    line, row, error = first
+    if error is not None:
+        raise ValueError(f"Line {line}: {error}")
+    columns = list(row)
+    if fmt == "json":
+        rows = _same_keys(rows, columns)
+    return import_rows(resource, itertools.chain([first], rows), columns, **kwargs)
+
+
+def after_import(name, result):
+    """
+    Note for the user about what an import of RESOURCES[name] leaves to be
+    done, or None. Availability and payment state are refreshed per chunk.
+    """
+    if name in SEARCH_KINDS:
+        return (
+            "Imported rows are not in the search index yet, run "
+            f"rebuild_search_index {name}"
+        )
+    return None
+
+
+class _Echo:
+    """File-like object for csv.writer that hands back what is written."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(resource, queryset=None, fmt="csv", chunk_size=2000):
+    """
+    Yields the file as text chunks, one row at a time, for
+    StreamingHttpResponse or writing to a file. Rows are fetched with
+    iterator() so the queryset is never loaded as a whole.
+    """
+    if queryset is None:
+        queryset = resource.model._default_manager.all()
+    rows = (
+        queryset.order_by("pk")
+        .values_list(*resource.columns)
+        .iterator(chunk_size=chunk_size)
+    )
+    json_columns = [isinstance(field, models.JSONField) for field in resource.fields]
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(resource.columns)
+        for values in rows:
+            yield writer.writerow(
+                [
+                    json.dumps(value) if is_json and value is not None else value
+                    for value, is_json in zip(values, json_columns)
+                ]
+            )
+    else:
+        for values in rows:
+            yield json.dumps(
+                dict(zip(resource.columns, values)), cls=DjangoJSONEncoder
+            ) + "\n"
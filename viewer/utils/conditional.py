@@ -0,0 +1,117 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def _has_pending_messages(request):
+    """Flash messages must be rendered, so such a response is never a 304."""
+    if not hasattr(request, "_messages"):
+        return False
+    return len(get_messages(request)) > 0
+
+
+def viewer_key(request):
+    """
+    Part of the validator that depends on who is looking at the page.
+    The navbar shows the user's name, avatar and role based links.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return ("anonymous",)
+    profile = getattr(user, "profile", None)
+    return (
+        user.pk,
+        user.get_full_name(),
+        getattr(profile, "is_coach", None),
+        getattr(profile, "is_client", None),
+        str(getattr(profile, "avatar", "")),
+    )
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False)
+    return quote_etag(digest.hexdigest())
+
+
+def conditional_page(state_func):
+    """
+    Conditional GET (ETag / Last-Modified) for a read-only view.
+
+    state_func(request, *args, **kwargs) returns a tuple
+    (last_modified, fingerprint) describing the data the page is built from,
+    typically Max("updated") and Count("id") of the underlying rows, or None
+    when the page cannot be validated. Matching requests get a 304 without
+    running the view at all. Async views are supported, the validation then
+    runs in a thread.
+    """
+
+    def decorator(view_func):
+        def validate(request, *args, **kwargs):
+            """(etag, timestamp, 304 response or None), None if not validated."""
+            if request.method not in ("GET", "HEAD") or _has_pending_messages(request):
+                return None
+
+            state = state_func(request, *args, **kwargs)
+            if state is None:
+                return None
+
+            last_modified, fingerprint = state
+            etag = make_etag(
+                view_func.__qualname__,
+                last_modified.isoformat() if last_modified else None,
+                fingerprint,
+                viewer_key(request),
+            )
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            return etag, timestamp, response
+
+        def finish(response, validated):
+            if validated is None:
+                return response
+            etag, timestamp, _ = validated
+            if response.status_code == 200:
+                response.headers.setdefault("ETag", etag)
+                if timestamp is not None:
+                    response.headers.setdefault("Last-Modified", http_date(timestamp))
+            # Browsers must revalidate instead of guessing freshness from
+            # Last-Modified, otherwise the slot polling could see stale data.
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        if iscoroutinefunction(view_func):
+
+            @wraps(view_func)
+            async def _wrapped_view(request, *args, **kwargs):
+                validated = await sync_to_async(validate)(request, *args, **kwargs)
+                if validated is not None and validated[2] is not None:
+                    return finish(validated[2], validated)
+                response = await view_func(request, *args, **kwargs)
+                return finish(response, validated)
+
+            return _wrapped_view
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            validated = validate(request, *args, **kwargs)
+            if validated is not None and validated[2] is not None:
+                return finish(validated[2], validated)
+            response = view_func(request, *args, **kwargs)
+            return finish(response, validated)
+
+        return _wrapped_view
+
+    return decorator
+
+
+def latest(*timestamps):
+    """The newest of the given timestamps, ignoring missing ones."""
+    present = [ts for ts in timestamps if ts is not None]
+    return max(present) if present else None
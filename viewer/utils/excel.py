@@ -0,0 +1,24 @@
+from django.http import HttpResponse
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def workbook_response(sheets, filename):
+    """
+    Returns an xlsx attachment response.
+    sheets: list of (title, rows), rows are lists of cell values
+    openpyxl is imported here, only exports need it.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    wb.remove(wb.active)
+    for title, rows in sheets:
+        ws = wb.create_sheet(title=title)
+        for row in rows:
+            ws.append(row)
+
+    response = HttpResponse(content_type=XLSX_CONTENT_TYPE)
+    response["Content-Disposition"] = f"attachment; filename={filename}"
+    wb.save(response)
+    return response
@@ -1,8 +1,7 @@
+import datetime
+import json
 import os
 from django.conf import settings
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from accounts.models import Profile
 
 GOOGLE_CLIENT_SECRETS_FILE = os.path.join(
     settings.BASE_DIR, "config", "credentials.json"
@@ -10,23 +9,25 @@ GOOGLE_CLIENT_SECRETS_FILE = os.path.join(
 GOOGLE_SCOPES = ["https://www.googleapis.com/auth/calendar.events"]
 
 
-def create_coach_calendar_event(
-    coach_profile, summary, description, start_dt, end_dt, timezone_str="UTC"
-):
+def _calendar_service(coach_profile):
     """
-    Vytvoří událost v Google kalendáři kouče.
-    coach_profile: Profile instance kouče (musí mít google_refresh_token)
-    summary: Název události
-    description: Popis události
-    start_dt, end_dt: datetime (aware)
-    timezone_str: např. 'Europe/Prague'
+    Vytvoří klienta Google Calendar API pro kouče.
+    Knihovny Googlu se importují až zde, aby je workery a management
+    commandy nenačítaly při startu.
     """
     if not coach_profile.google_refresh_token:
         raise Exception("Coach does not have a Google refresh token.")
 
-    # Načti client_id a client_secret z credentials.json
-    import json
+    if getattr(settings, "FAKE_EXTERNAL_SERVICES", False):
+        # Zátěžové testy, viz viewer/fakes.py
+        from viewer.fakes import CalendarService
+
+        return CalendarService()
 
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+
+    # Načti client_id a client_secret z credentials.json
     with open(GOOGLE_CLIENT_SECRETS_FILE, "r") as f:
         secrets = json.load(f)
         client_id = secrets["web"]["client_id"]
@@ -43,7 +44,28 @@ def create_coach_calendar_event(
     )
 
     # Vytvoř service objekt
-    service = build("calendar", "v3", credentials=creds)
+    return build("calendar", "v3", credentials=creds)
+
+
+def create_coach_calendar_event(
+    coach_profile,
+    summary,
+    description,
+    start_dt,
+    end_dt,
+    timezone_str="UTC",
+    recurrence=None,
+):
+    """
+    Vytvoří událost v Google kalendáři kouče.
+    coach_profile: Profile instance kouče (musí mít google_refresh_token)
+    summary: Název události
+    description: Popis události
+    start_dt, end_dt: datetime (aware)
+    timezone_str: např. 'Europe/Prague'
+    recurrence: seznam RRULE řádků pro opakovanou událost
+    """
+    service = _calendar_service(coach_profile)
 
     # Vytvoř událost
     event = {
@@ -67,41 +89,30 @@ def create_coach_calendar_event(
         "guestsCanModify": False,
         "guestsCanSeeOtherGuests": False,
     }
+    if recurrence:
+        event["recurrence"] = recurrence
 
     # Vlož událost do kalendáře
     created_event = service.events().insert(calendarId="primary", body=event).execute()
     return created_event
 
 
+def instance_event_id(event_id, start_dt):
+    """
+    ID jednoho výskytu opakované události, lze ho smazat samostatně
+    pomocí delete_coach_calendar_event().
+    """
+    start_utc = start_dt.astimezone(datetime.timezone.utc)
+    return f"{event_id}_{start_utc:%Y%m%dT%H%M%SZ}"
+
+
 def delete_coach_calendar_event(coach_profile, event_id):
     """
     Smaže událost z Google kalendáře kouče.
     coach_profile: Profile instance kouče (musí mít google_refresh_token)
     event_id: ID události v Google kalendáři
     """
-    if not coach_profile.google_refresh_token:
-        raise Exception("Coach does not have a Google refresh token.")
-
-    # Načti client_id a client_secret z credentials.json
-    import json
-
-    with open(GOOGLE_CLIENT_SECRETS_FILE, "r") as f:
-        secrets = json.load(f)
-        client_id = secrets["web"]["client_id"]
-        client_secret = secrets["web"]["client_secret"]
-
-    # Vytvoř credentials objekt
-    creds = Credentials(
-        None,
-        refresh_token=coach_profile.google_refresh_token,
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=client_id,
-        client_secret=client_secret,
-        scopes=GOOGLE_SCOPES,
-    )
-
-    # Vytvoř service objekt
-    service = build("calendar", "v3", credentials=creds)
+    service = _calendar_service(coach_profile)
 
     # Smaž událost
     service.events().delete(calendarId="primary", eventId=event_id).execute()
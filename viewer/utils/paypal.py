@@ -0,0 +1,86 @@
+"""
+Async client for the PayPal Orders API.
+
+The PayPal views are async, so a worker waiting hundreds of milliseconds
+for PayPal serves other requests meanwhile instead of blocking a thread.
+Use one client per request, the token and order calls then share its
+connection:
+
+    async with paypal.client() as api:
+        token = await paypal.get_access_token(api)
+
+``httpx`` is imported inside client() so that only the processes which
+actually talk to PayPal pay for loading it.
+"""
+
+import functools
+import os
+
+from django.conf import settings
+
+# Change to live for production
+PAYPAL_API_BASE = getattr(
+    settings, "PAYPAL_API_BASE", "https://api-m.sandbox.paypal.com"
+)
+PAYPAL_TIMEOUT = getattr(settings, "PAYPAL_TIMEOUT", 10)
+
+
+def _credentials():
+    # PayPal credentials from .env
+    return (
+        os.environ.get("PAYPAL_CLIENT_ID", ""),
+        os.environ.get("PAYPAL_CLIENT_SECRET", ""),
+    )
+
+
+@functools.cache
+def _ssl_context():
+    import httpx
+
+    return httpx.create_ssl_context()
+
+
+def client():
+    import httpx
+
+    # Loading the CA certificates takes ~40 ms of CPU, once per process
+    return httpx.AsyncClient(
+        base_url=PAYPAL_API_BASE, timeout=PAYPAL_TIMEOUT, verify=_ssl_context()
+    )
+
+
+async def get_access_token(api):
+    """Returns an OAuth access token, or None if PayPal rejected the credentials."""
+    response = await api.post(
+        "/v1/oauth2/token",
+        auth=_credentials(),
+        data={"grant_type": "client_credentials"},
+    )
+    if response.status_code != 200:
+        return None
+    return response.json()["access_token"]
+
+
+def _headers(access_token):
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {access_token}",
+    }
+
+
+async def create_order(api, access_token, order_data):
+    """Creates an order, returns the raw response (201 on success)."""
+    return await api.post(
+        "/v2/checkout/orders",
+        headers=_headers(access_token),
+        json=order_data,
+    )
+
+
+async def get_order(api, access_token, order_id):
+    """Returns the order details as a dict."""
+    response = await api.get(
+        f"/v2/checkout/orders/{order_id}",
+        headers=_headers(access_token),
+    )
+    return response.json()
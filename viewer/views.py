@@ -8,9 +8,12 @@ from django.views.generic import (
     DeleteView,
     View,
 )
+from django.views.generic.detail import SingleObjectMixin
 from django.urls import reverse, reverse_lazy
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.contrib import messages
 from django.http import (
     HttpResponseRedirect,
@@ -18,25 +21,154 @@ from django.http import (
     HttpResponseBadRequest,
     HttpResponseForbidden,
     HttpResponse,
+    Http404,
 )
 from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import BadRequest
 import json
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-import requests
-import os
+from asgiref.sync import sync_to_async
 import datetime
-import pytz
-from django.db.models import Q, Count, Sum
-from openpyxl import Workbook
-
-from .models import Session, Service, Profile, Review, Payment
+import uuid
+from django.db import transaction
+from django.db.models import Q, Count, Sum, Max, F, FloatField, Prefetch
+from django.db.models.functions import Cast
+
+from .models import (
+    Session,
+    SessionSeries,
+    Service,
+    Profile,
+    Review,
+    Payment,
+)
 from .forms import ServiceForm, BookingForm, ReviewForm, SessionForm
-from .utils.google_calendar import (
-    create_coach_calendar_event,
-    delete_coach_calendar_event,
+from .mixins import CachedObjectMixin
+from .utils.google_calendar import delete_coach_calendar_event
+from .utils.conditional import conditional_page, latest
+from .utils import cursor, paypal
+from .utils.excel import workbook_response
+from .holds import (
+    SlotTaken,
+    acquire_hold,
+    claim_slot,
+    release_session,
+)
+from .booking import book_series, book_session, find_booking
+from .availability import (
+    BLOCKING_STATUSES,
+    availability_version,
+    client_slots,
+    coach_slots,
+    free_interval_index,
+    unavailable_starts,
+    window_slots,
 )
+from .search import KINDS as SEARCH_KINDS, results as search_results
 from accounts.models import Profile
+from accounts.timezones import user_timezone
+from LifeCoach.db.routers import read_from_replica
+
+
+def _slot_bucket():
+    """
+    Slot lists drop times that already passed, so validators change every
+    15 minutes (every UTC offset in use is a multiple of 15 minutes).
+    """
+    now = timezone.now()
+    return now.replace(minute=now.minute - now.minute % 15, second=0, microsecond=0)
+
+
+def _rows_state(queryset):
+    state = queryset.aggregate(last=Max("updated"), count=Count("id"))
+    return state["last"], state["count"]
+
+
+def service_list_state(request, *args, **kwargs):
+    services = Service.objects.all()
+    user = request.user
+    if user.is_authenticated and hasattr(user, "profile") and user.profile.is_coach:
+        services = services.filter(coach=user)
+    # Inactive services are included so that deactivating one changes the ETag
+    return _rows_state(services)
+
+
+def _detail_service(request, pk):
+    """
+    The service page's service with its coach profile, loaded once per
+    request for both the validator and the view.
+    """
+    if not hasattr(request, "_detail_service"):
+        request._detail_service = (
+            Service.objects.select_related("coach__profile").filter(pk=pk).first()
+        )
+    return request._detail_service
+
+
+def service_detail_state(request, *args, **kwargs):
+    service = _detail_service(request, kwargs.get("pk"))
+    if service is None:
+        return None
+    coach = service.coach.profile
+    user = request.user
+    sessions_last, sessions_count = None, None
+    if user.is_authenticated and hasattr(user, "profile"):
+        # Logged-in clients don't see the slots of their own sessions
+        sessions_last, sessions_count = _rows_state(
+            Session.objects.filter(client=user.profile)
+        )
+    return latest(service.updated, coach.updated, sessions_last), (
+        sessions_count,
+        availability_version(coach.pk),
+        _slot_bucket(),
+    )
+
+
+def service_reviews_state(request, *args, **kwargs):
+    service_updated = (
+        Service.objects.filter(pk=kwargs.get("service_id"))
+        .values_list("updated", flat=True)
+        .first()
+    )
+    if service_updated is None:
+        return None
+    reviews_last, reviews_count = _rows_state(
+        Review.objects.filter(session__service_id=kwargs.get("service_id"))
+    )
+    # Each cursor page is a page of its own
+    return latest(service_updated, reviews_last), (
+        reviews_count,
+        request.GET.get("cursor"),
+    )
+
+
+def available_slots_state(request, *args, **kwargs):
+    service_id = request.GET.get("service")
+    if not service_id or not service_id.isdigit():
+        return None
+    if not hasattr(request.user, "profile"):
+        return None
+    service = (
+        Service.objects.filter(pk=service_id)
+        .values("updated", "duration", "coach__profile", "coach__profile__updated")
+        .first()
+    )
+    if service is None:
+        return None
+    sessions_last, sessions_count = _rows_state(
+        Session.objects.filter(client=request.user.profile)
+    )
+    # The coach's profile timestamp also covers schedule changes
+    last_modified = latest(
+        service["updated"], service["coach__profile__updated"], sessions_last
+    )
+    return last_modified, (
+        sessions_count,
+        availability_version(service["coach__profile"]),
+        request.user.profile.timezone,
+        _slot_bucket(),
+    )
 
 
 class HomeView(TemplateView):
@@ -61,18 +193,20 @@ class SessionHistoryView(LoginRequiredMixin, ListView):
         user_profile = self.request.user.profile
         now = timezone.now()
         # Nadcházející sessions (všechny statusy)
+        # Service a klient jsou v klíčích cache řádků
+        sessions = Session.objects.select_related("service", "client__user")
         if user_profile.is_coach:
-            context["upcoming_sessions"] = Session.objects.filter(
+            context["upcoming_sessions"] = sessions.filter(
                 coach=user_profile, date_time__gt=now
             ).order_by("date_time")
-            context["past_sessions"] = Session.objects.filter(
+            context["past_sessions"] = sessions.filter(
                 coach=user_profile, date_time__lte=now
             ).order_by("-date_time")
         else:
-            context["upcoming_sessions"] = Session.objects.filter(
+            context["upcoming_sessions"] = sessions.filter(
                 client=user_profile, date_time__gt=now
             ).order_by("date_time")
-            context["past_sessions"] = Session.objects.filter(
+            context["past_sessions"] = sessions.filter(
                 client=user_profile, date_time__lte=now
             ).order_by("-date_time")
         # Přidám časové pásmo uživatele
@@ -95,6 +229,14 @@ class SessionDetailView(LoginRequiredMixin, DetailView):
             return Session.objects.filter(client=user_profile)
 
 
+def not_coach(request):
+    """Coaches land on the service list after editing, so read the primary."""
+    profile = getattr(request.user, "profile", None)
+    return not getattr(profile, "is_coach", False)
+
+
+@method_decorator(read_from_replica(not_coach), name="get")
+@method_decorator(conditional_page(service_list_state), name="get")
 class ServiceListView(ListView):
     model = Service
     template_name = "viewer/service_list.html"
@@ -118,64 +260,39 @@ class ServiceListView(ListView):
         return context
 
 
+@method_decorator(conditional_page(service_detail_state), name="get")
 class ServiceDetailView(DetailView):
     model = Service
     template_name = "viewer/service_detail.html"
     context_object_name = "service"
 
+    def get_object(self, queryset=None):
+        service = _detail_service(self.request, self.kwargs.get(self.pk_url_kwarg))
+        if service is None:
+            raise Http404("No service found matching the query")
+        return service
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        if self.request.user.is_authenticated:
-            context["is_coach"] = (
-                hasattr(self.request.user, "profile")
-                and self.request.user.profile.is_coach
-            )
-            if not context["is_coach"]:
-                # Get all confirmed sessions for this service
-                booked_sessions = Session.objects.filter(
-                    service=self.object, status="CONFIRMED"
-                ).values_list("date_time", flat=True)
-
-                # Get all confirmed sessions for the coach
-                coach_sessions = (
-                    Session.objects.filter(
-                        coach=self.object.coach.profile, status="CONFIRMED"
-                    )
-                    .exclude(service=self.object)
-                    .values_list("date_time", flat=True)
+        user = self.request.user
+        coach = self.object.coach.profile
+        context["is_coach"] = (
+            user.is_authenticated and hasattr(user, "profile") and user.profile.is_coach
+        )
+        if not context["is_coach"]:
+            # Same slots as the booking form, from the coach's cached free time
+            if user.is_authenticated and hasattr(user, "profile"):
+                context["available_slots"] = client_slots(
+                    coach, user.profile, self.object.duration
                 )
-
-                # Combine all booked times
-                all_booked_times = list(booked_sessions) + list(coach_sessions)
-
-                # Get today's date
-                today = timezone.now().date()
-
-                # Generate available slots for next 7 days
-                available_slots = []
-                for day in range(7):
-                    current_date = today + timezone.timedelta(days=day)
-                    for hour in range(9, 18):  # 9 AM to 6 PM
-                        slot_time = timezone.make_aware(
-                            timezone.datetime.combine(
-                                current_date, timezone.time(hour=hour)
-                            )
-                        )
-
-                        # Check if this slot is available
-                        is_available = True
-                        for booked_time in all_booked_times:
-                            if (
-                                abs((slot_time - booked_time).total_seconds()) < 3600
-                            ):  # 1 hour
-                                is_available = False
-                                break
-
-                        if is_available:
-                            available_slots.append(slot_time)
-
-                context["available_slots"] = available_slots
-                context["booked_slots"] = all_booked_times
+            else:
+                context["available_slots"] = coach_slots(coach, self.object.duration)
+            context["slot_timezone"] = (
+                user.profile.get_timezone()
+                if user.is_authenticated
+                else coach.get_timezone()
+            )
+            context["booking_horizon_days"] = coach.booking_horizon_days
         return context
 
 
@@ -201,7 +318,9 @@ class ServiceCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
         return context
 
 
-class ServiceUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class ServiceUpdateView(
+    CachedObjectMixin, LoginRequiredMixin, UserPassesTestMixin, UpdateView
+):
     model = Service
     form_class = ServiceForm
     template_name = "viewer/service_form.html"
@@ -209,7 +328,7 @@ class ServiceUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
 
     def test_func(self):
         service = self.get_object()
-        return self.request.user == service.coach
+        return self.request.user.pk == service.coach_id
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -218,14 +337,16 @@ class ServiceUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return context
 
 
-class ServiceDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class ServiceDeleteView(
+    CachedObjectMixin, LoginRequiredMixin, UserPassesTestMixin, DeleteView
+):
     model = Service
     template_name = "viewer/service_confirm_delete.html"
     success_url = reverse_lazy("viewer:services")
 
     def test_func(self):
         service = self.get_object()
-        return self.request.user == service.coach
+        return self.request.user.pk == service.coach_id
 
 
 class BookingCreateView(LoginRequiredMixin, CreateView):
@@ -239,6 +360,26 @@ class BookingCreateView(LoginRequiredMixin, CreateView):
             return HttpResponseForbidden("Only clients can create bookings.")
         return super().dispatch(request, *args, **kwargs)
 
+    def get_initial(self):
+        initial = super().get_initial()
+        # Each rendered form is one booking request
+        initial["idempotency_key"] = uuid.uuid4().hex
+        return initial
+
+    def idempotency_key(self):
+        key = self.request.POST.get("idempotency_key") or self.request.headers.get(
+            "Idempotency-Key", ""
+        )
+        return key[: Session._meta.get_field("idempotency_key").max_length] or None
+
+    def post(self, request, *args, **kwargs):
+        # A resubmitted request shows the booking made by the first one,
+        # before the form would reject its time as taken
+        booking = find_booking(request.user.profile, self.idempotency_key())
+        if booking is not None:
+            return self.booked(booking)
+        return super().post(request, *args, **kwargs)
+
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs["user"] = self.request.user
@@ -273,44 +414,111 @@ class BookingCreateView(LoginRequiredMixin, CreateView):
         form.instance.type = service.session_type  # Nastaví typ podle servisu
         try:
             coach_profile = Profile.objects.get(user=coach_user)
-            form.instance.coach = coach_profile
-            # Vytvoření události v Google kalendáři
-            event = create_coach_calendar_event(
-                coach_profile=coach_profile,
-                summary=f"Session with {self.request.user.get_full_name()}",
-                description=f"Service: {service.name}\nClient: {self.request.user.get_full_name()}",
-                start_dt=form.instance.date_time,
-                end_dt=form.instance.date_time
-                + timezone.timedelta(minutes=service.duration),
-                timezone_str=str(timezone.get_current_timezone()),
-            )
-            if event:
-                form.instance.google_calendar_event_id = event["id"]
-                messages.success(
-                    self.request,
-                    f'Session booked successfully! Google Calendar event created: {event.get("htmlLink")}',
-                )
-            else:
-                messages.success(self.request, "Session booked successfully!")
         except Profile.DoesNotExist:
             raise Exception(f"Coach {coach_user} nemá profil!")
-        except Exception as e:
-            print(f"Google Calendar error: {e}")
+        form.instance.coach = coach_profile
+        key = self.idempotency_key()
+        if form.cleaned_data.get("repeat"):
+            return self.series_valid(form, key)
+        try:
+            booking = book_session(
+                form.instance,
+                form.cleaned_data["payment_method"],
+                key=key,
+                hold=form.cleaned_data.get("hold"),
+            )
+        except SlotTaken:
+            form.add_error(
+                "date_time",
+                "This time slot has just been taken. Please choose another one.",
+            )
+            return self.form_invalid(form)
+        return self.booked(booking)
+
+    def booked(self, booking):
+        self.object = booking.sessions[0]
+        if not booking.created:
+            messages.info(self.request, "This booking has already been made.")
+            return redirect(self.success_url)
+        booked = (
+            f"{len(booking.sessions)} sessions booked"
+            if booking.series
+            else "Session booked"
+        )
+        # The calendar event is created after commit, unless the booking
+        # runs inside an outer transaction
+        if booking.calendar_error is not None:
             messages.warning(
                 self.request,
-                f"Session booked, but failed to create Google Calendar event: {str(e)}",
+                f"{booked}, but failed to create Google Calendar event: {str(booking.calendar_error)}",
+            )
+        elif booking.calendar_event:
+            messages.success(
+                self.request,
+                f"{booked} successfully! Google Calendar event created: {booking.calendar_event.get('htmlLink')}",
             )
-        response = super().form_valid(form)
-        # Vytvoření platby
-        Payment.objects.create(
-            session=self.object,
-            amount=service.price,
-            payment_method=form.cleaned_data["payment_method"],
+        else:
+            messages.success(self.request, f"{booked} successfully!")
+        return redirect(self.success_url)
+
+    def series_valid(self, form, key=None):
+        """
+        Books all sessions of a recurring series at once: one availability
+        pass, then book_series() with one claim insert, bulk_create of
+        sessions and payments, one recurring calendar event and one email.
+        """
+        session = form.instance
+        service = session.service
+        series = SessionSeries(
+            client=session.client,
+            coach=session.coach,
+            service=service,
+            start=session.date_time,
+            frequency=form.cleaned_data["repeat"],
+            interval=form.cleaned_data.get("repeat_interval") or 1,
+            count=form.cleaned_data["repeat_count"],
         )
-        return response
+        starts = series.occurrences()
+        client_busy = [
+            (start, start + timezone.timedelta(minutes=duration))
+            for start, duration in Session.objects.filter(
+                client=session.client,
+                status__in=BLOCKING_STATUSES,
+                date_time__gte=starts[0] - timezone.timedelta(days=1),
+                date_time__lte=starts[-1],
+            ).values_list("date_time", "duration")
+        ]
+        conflicts = unavailable_starts(
+            session.coach, starts, service.duration, busy=client_busy
+        )
+        if conflicts:
+            user_tz = user_timezone(self.request.user)
+            form.add_error(
+                "date_time",
+                "These sessions of the series are not available: "
+                + ", ".join(
+                    start.astimezone(user_tz).strftime("%d.%m.%Y %H:%M")
+                    for start in conflicts
+                ),
+            )
+            return self.form_invalid(form)
+
+        try:
+            booking = book_series(
+                series, starts, session, form.cleaned_data["payment_method"], key=key
+            )
+        except SlotTaken:
+            form.add_error(
+                "date_time",
+                "Some sessions of the series have just been taken. Please try again.",
+            )
+            return self.form_invalid(form)
+        return self.booked(booking)
 
 
-class SessionUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class SessionUpdateView(
+    CachedObjectMixin, LoginRequiredMixin, UserPassesTestMixin, UpdateView
+):
     model = Session
     template_name = "viewer/booking_form.html"
     success_url = reverse_lazy("viewer:session_history")
@@ -331,9 +539,9 @@ class SessionUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         user = self.request.user
         if user.is_superuser:
             return True
-        if user.profile.is_client and session.client.user == user:
+        if user.profile.is_client and session.client_id == user.profile.pk:
             return True
-        if user.profile.is_coach and session.coach.user == user:
+        if user.profile.is_coach and session.coach_id == user.profile.pk:
             return True
         return False
 
@@ -365,10 +573,37 @@ class SessionUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         ):
             session.status = "CONFIRMED"
         elif self.request.user.profile.is_coach and session.status == "PENDING":
-            payment = session.payments.first()
-            if payment and payment.paid_at:
+            if session.is_paid:
                 session.status = "CONFIRMED"
-        return super().form_valid(form)
+
+        moved = {"date_time", "duration"} & set(form.changed_data)
+        reinstated = (
+            session._loaded_status == "CANCELLED"
+            and session.status in BLOCKING_STATUSES
+        )
+        if not (moved or reinstated):
+            return super().form_valid(form)
+        # Moving or reinstating the session moves its claim on the coach's
+        # time. The claim is attached before saving, so the Session signal
+        # doesn't claim the time again.
+        try:
+            with transaction.atomic():
+                release_session(session)
+                if session.status in BLOCKING_STATUSES:
+                    claim_slot(
+                        session.coach,
+                        session.client,
+                        session.date_time,
+                        session.duration,
+                        token=form.cleaned_data.get("hold"),
+                    ).update(session=session)
+                return super().form_valid(form)
+        except SlotTaken:
+            form.add_error(
+                "date_time",
+                "This time slot has just been taken. Please choose another one.",
+            )
+            return self.form_invalid(form)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -400,13 +635,7 @@ class SessionUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         else:
             context["initial_date_time"] = ""
         # Přidám rozdíl v hodinách do kontextu
-        user = self.request.user
-        user_tz = timezone.get_current_timezone()
-        if hasattr(user, "profile") and getattr(user.profile, "timezone", None):
-            try:
-                user_tz = pytz.timezone(user.profile.timezone)
-            except Exception:
-                pass
+        user_tz = user_timezone(self.request.user)
         if self.object and self.object.date_time:
             now = timezone.now().astimezone(user_tz)
             session_time = self.object.date_time.astimezone(user_tz)
@@ -417,18 +646,25 @@ class SessionUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return context
 
 
-class SessionCancelView(LoginRequiredMixin, UserPassesTestMixin, View):
+class SessionCancelView(
+    CachedObjectMixin,
+    SingleObjectMixin,
+    LoginRequiredMixin,
+    UserPassesTestMixin,
+    View,
+):
+    model = Session
+
     def test_func(self):
-        session = Session.objects.get(pk=self.kwargs["pk"])
+        session = self.get_object()
         user = self.request.user
         return (
-            user.profile == session.client
-            or user.profile == session.coach
+            user.profile.pk in (session.client_id, session.coach_id)
             or user.is_superuser
         )
 
     def post(self, request, *args, **kwargs):
-        session = Session.objects.get(pk=self.kwargs["pk"])
+        session = self.get_object()
         if session.can_cancel:
             # Pokud existuje ID události v kalendáři, smaž ji
             if session.google_calendar_event_id:
@@ -476,73 +712,59 @@ def home(request):
     return render(request, "home.html")
 
 
-class CreatePayPalOrderView(LoginRequiredMixin, View):
-    def post(self, request, *args, **kwargs):
+@method_decorator(login_required, name="post")
+class CreatePayPalOrderView(View):
+    """Async, the worker serves other requests while PayPal answers."""
+
+    async def post(self, request, *args, **kwargs):
         session_id = request.POST.get("session_id")
         if not session_id:
             return HttpResponseBadRequest("Missing session_id")
         try:
-            session = Session.objects.get(pk=session_id)
-            payment = session.payments.first()
+            session = await Session.objects.select_related("service").aget(
+                pk=session_id
+            )
+            payment = await session.payments.select_related("payment_method").afirst()
             if not payment:
                 return HttpResponseBadRequest("No payment found for this session")
         except Session.DoesNotExist:
             return HttpResponseBadRequest("Session not found")
 
-        # PayPal credentials from .env
-        PAYPAL_CLIENT_ID = os.environ.get("PAYPAL_CLIENT_ID")
-        PAYPAL_CLIENT_SECRET = os.environ.get("PAYPAL_CLIENT_SECRET")
-        PAYPAL_API_BASE = (
-            "https://api-m.sandbox.paypal.com"  # change to live for production
-        )
-
-        # Get access token
-        auth_response = requests.post(
-            f"{PAYPAL_API_BASE}/v1/oauth2/token",
-            auth=(PAYPAL_CLIENT_ID, PAYPAL_CLIENT_SECRET),
-            data={"grant_type": "client_credentials"},
-        )
-        if auth_response.status_code != 200:
-            return JsonResponse({"error": "PayPal auth failed"}, status=500)
-        access_token = auth_response.json()["access_token"]
-
-        # Create order
-        order_data = {
-            "intent": "CAPTURE",
-            "purchase_units": [
-                {
-                    "amount": {
-                        "currency_code": (
-                            payment.payment_method.name.upper()
-                            if payment.payment_method.name.upper()
-                            in ["USD", "EUR", "CZK"]
-                            else "USD"
-                        ),
-                        "value": str(payment.amount),
-                    },
-                    "description": f"Session: {session.service.name} ({session.date_time})",
-                }
-            ],
-            "application_context": {
-                "brand_name": "LifeCoach",
-                "locale": "en-US",
-                "return_url": request.build_absolute_uri(
-                    f"/paypal/return/{session.id}/"
-                ),
-                "cancel_url": request.build_absolute_uri(
-                    f"/paypal/cancel/{session.id}/"
-                ),
-                "user_action": "PAY_NOW",
-            },
-        }
-        order_response = requests.post(
-            f"{PAYPAL_API_BASE}/v2/checkout/orders",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {access_token}",
-            },
-            json=order_data,
-        )
+        async with paypal.client() as api:
+            access_token = await paypal.get_access_token(api)
+            if not access_token:
+                return JsonResponse({"error": "PayPal auth failed"}, status=500)
+
+            # Create order
+            order_data = {
+                "intent": "CAPTURE",
+                "purchase_units": [
+                    {
+                        "amount": {
+                            "currency_code": (
+                                payment.payment_method.name.upper()
+                                if payment.payment_method.name.upper()
+                                in ["USD", "EUR", "CZK"]
+                                else "USD"
+                            ),
+                            "value": str(payment.amount),
+                        },
+                        "description": f"Session: {session.service.name} ({session.date_time})",
+                    }
+                ],
+                "application_context": {
+                    "brand_name": "LifeCoach",
+                    "locale": "en-US",
+                    "return_url": request.build_absolute_uri(
+                        f"/paypal/return/{session.id}/"
+                    ),
+                    "cancel_url": request.build_absolute_uri(
+                        f"/paypal/cancel/{session.id}/"
+                    ),
+                    "user_action": "PAY_NOW",
+                },
+            }
+            order_response = await paypal.create_order(api, access_token, order_data)
         if order_response.status_code != 201:
             return JsonResponse(
                 {
@@ -559,40 +781,26 @@ class CreatePayPalOrderView(LoginRequiredMixin, View):
             return JsonResponse({"error": "No approval url from PayPal"}, status=500)
         # Optionally save order_id to payment
         payment.transaction_id = order["id"]
-        payment.save()
+        await payment.asave()
         return JsonResponse({"approval_url": approval_url})
 
 
-class PayPalReturnView(LoginRequiredMixin, View):
-    def get(self, request, session_id):
-        from django.contrib import messages
-
-        session = Session.objects.get(pk=session_id)
-        payment = session.payments.first()
-        order_id = payment.transaction_id
-        # PayPal credentials
-        PAYPAL_CLIENT_ID = os.environ.get("PAYPAL_CLIENT_ID")
-        PAYPAL_CLIENT_SECRET = os.environ.get("PAYPAL_CLIENT_SECRET")
-        PAYPAL_API_BASE = "https://api-m.sandbox.paypal.com"
-        # Get access token
-        auth_response = requests.post(
-            f"{PAYPAL_API_BASE}/v1/oauth2/token",
-            auth=(PAYPAL_CLIENT_ID, PAYPAL_CLIENT_SECRET),
-            data={"grant_type": "client_credentials"},
-        )
-        access_token = auth_response.json()["access_token"]
-        # Get order details
-        order_response = requests.get(
-            f"{PAYPAL_API_BASE}/v2/checkout/orders/{order_id}",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {access_token}",
-            },
-        )
-        order = order_response.json()
+@method_decorator(login_required, name="get")
+class PayPalReturnView(View):
+    async def get(self, request, session_id):
+        payment = await Payment.objects.filter(session=session_id).afirst()
+        if payment is None:
+            raise Http404("No payment found for this session")
+        async with paypal.client() as api:
+            access_token = await paypal.get_access_token(api)
+            order = (
+                await paypal.get_order(api, access_token, payment.transaction_id)
+                if access_token
+                else {}
+            )
         if order.get("status") == "COMPLETED" or order.get("status") == "APPROVED":
             payment.paid_at = timezone.now()
-            payment.save()
+            await payment.asave()
             messages.success(request, "Payment successful!")
         else:
             messages.warning(request, "Payment not completed. Please try again.")
@@ -607,14 +815,21 @@ class PayPalCancelView(LoginRequiredMixin, View):
         return redirect("viewer:session_detail", pk=session_id)
 
 
-class MarkAsPaidView(LoginRequiredMixin, UserPassesTestMixin, View):
+class MarkAsPaidView(
+    CachedObjectMixin,
+    SingleObjectMixin,
+    LoginRequiredMixin,
+    UserPassesTestMixin,
+    View,
+):
+    model = Session
+
     def test_func(self):
-        session = get_object_or_404(Session, pk=self.kwargs["pk"])
-        return self.request.user.profile == session.coach
+        return self.request.user.profile.pk == self.get_object().coach_id
 
     def post(self, request, pk):
-        session = get_object_or_404(Session, pk=pk)
-        payment = session.payments.first()
+        session = self.get_object()
+        payment = None if session.is_paid else session.payments.first()
         if payment and not payment.paid_at:
             payment.paid_at = timezone.now()
             payment.save()
@@ -624,84 +839,40 @@ class MarkAsPaidView(LoginRequiredMixin, UserPassesTestMixin, View):
         return redirect("viewer:session_detail", pk=pk)
 
 
-class AvailableSlotsView(LoginRequiredMixin, View):
-    def get(self, request):
+@method_decorator(login_required, name="get")
+@method_decorator(conditional_page(available_slots_state), name="get")
+class AvailableSlotsView(View):
+    """Async, polled by every open booking form."""
+
+    async def get(self, request):
         service_id = request.GET.get("service")
         if not service_id:
             return JsonResponse({"error": "Service ID is required"}, status=400)
 
         try:
-            service = Service.objects.get(pk=service_id)
-
-            # Get user's timezone
-            user_timezone = timezone.get_current_timezone()
-            if request.user.profile.timezone:
-                try:
-                    user_timezone = pytz.timezone(request.user.profile.timezone)
-                except pytz.exceptions.UnknownTimeZoneError:
-                    pass
-
-            # Get current time in user's timezone
-            now = timezone.now().astimezone(user_timezone)
-            today = now.date()
-
-            # Get all booked sessions for this coach
-            booked_sessions = Session.objects.filter(
-                Q(coach=service.coach.profile) | Q(client=request.user.profile),
-                status__in=["CONFIRMED", "PENDING"],
-                date_time__gte=now,
+            service = await Service.objects.select_related("coach__profile").aget(
+                pk=service_id
             )
-
-            # Create a list of all booked times
-            all_booked_times = []
-            for session in booked_sessions:
-                session_start = session.date_time.astimezone(user_timezone)
-                session_end = session_start + timezone.timedelta(
-                    minutes=session.duration
-                )
-                all_booked_times.append((session_start, session_end))
+            coach = service.coach.profile
+            user = await request.auser()
+            # Loaded with the user by the authentication backend
+            if not hasattr(user, "profile"):
+                return JsonResponse({"error": "User has no profile"}, status=403)
+            client = user.profile
+            user_tz = client.get_timezone()
+            now = timezone.now()
 
             slots = []
-            # Generate available slots for the next 7 days
-            for day in range(7):
-                current_date = today + timezone.timedelta(days=day)
-
-                # Skip if it's today and already past working hours
-                if day == 0 and now.hour >= 17:
-                    continue
-
-                # Generate slots for each hour from 9 AM to 5 PM
-                for hour in range(9, 17):  # 9:00 - 16:00 (last session starts at 16:00)
-                    # Skip past hours for today
-                    if day == 0 and hour <= now.hour:
-                        continue
-
-                    slot_time = timezone.make_aware(
-                        datetime.datetime.combine(
-                            current_date, datetime.time(hour=hour)
-                        ),
-                        timezone=user_timezone,
-                    )
-
-                    # Check if this slot is available
-                    is_available = True
-                    slot_end = slot_time + timezone.timedelta(minutes=service.duration)
-
-                    # Check for overlaps with booked sessions
-                    for booked_start, booked_end in all_booked_times:
-                        if (slot_time < booked_end) and (slot_end > booked_start):
-                            is_available = False
-                            break
-
-                    if is_available:
-                        # Format the slot time in user's timezone
-                        slot_local = slot_time.astimezone(user_timezone)
-                        slots.append(
-                            {
-                                "value": slot_local.isoformat(),
-                                "display": slot_local.strftime("%A %d.%m.%Y %H:%M"),
-                            }
-                        )
+            for slot in await sync_to_async(client_slots)(
+                coach, client, service.duration, now
+            ):
+                slot_local = slot.astimezone(user_tz)
+                slots.append(
+                    {
+                        "value": slot_local.isoformat(),
+                        "display": slot_local.strftime("%A %d.%m.%Y %H:%M"),
+                    }
+                )
 
             return JsonResponse({"slots": slots})
 
@@ -711,6 +882,208 @@ class AvailableSlotsView(LoginRequiredMixin, View):
             return JsonResponse({"error": str(e)}, status=500)
 
 
+class SlotHoldView(LoginRequiredMixin, View):
+    """
+    Holds a slot chosen in the booking form for a few minutes, so that
+    nobody else can book it before the form is submitted.
+    """
+
+    def post(self, request):
+        if not request.user.profile.is_client:
+            return JsonResponse({"error": "Only clients can hold slots"}, status=403)
+        service = (
+            Service.objects.select_related("coach__profile")
+            .filter(pk=request.POST.get("service") or None, is_active=True)
+            .first()
+        )
+        if service is None:
+            return JsonResponse({"error": "Service not found"}, status=404)
+        try:
+            # None for a malformed value, ValueError for e.g. month 13
+            start = parse_datetime(request.POST.get("date_time", ""))
+        except ValueError:
+            start = None
+        if start is None:
+            return JsonResponse({"error": "Invalid date_time"}, status=400)
+        if timezone.is_naive(start):
+            # Same interpretation as BookingForm.clean_date_time
+            start = timezone.make_aware(start)
+        if start <= timezone.now():
+            return JsonResponse({"error": "The slot is in the past"}, status=400)
+
+        try:
+            token, expires_at = acquire_hold(
+                service.coach.profile, request.user.profile, start, service.duration
+            )
+        except SlotTaken:
+            return JsonResponse({"error": "The slot is no longer free"}, status=409)
+        return JsonResponse(
+            {"hold": str(token), "expires": expires_at.isoformat()}, status=201
+        )
+
+
+class AvailabilitySearchView(LoginRequiredMixin, View):
+    """
+    Which active services have a free coach at a time or within a window.
+
+    GET parameters: ``at`` (session start) or ``start`` and ``end`` (ISO
+    8601, naive values are in the user's timezone), optional ``category``.
+    """
+
+    MAX_SLOTS_PER_SERVICE = 20
+
+    def _parse(self, value, user_tz):
+        parsed = parse_datetime(value or "")
+        if parsed is None:
+            raise ValueError(value)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, user_tz)
+        return parsed
+
+    def get(self, request):
+        user_tz = request.user.profile.get_timezone()
+        try:
+            if request.GET.get("at"):
+                at = self._parse(request.GET["at"], user_tz)
+                start = end = None
+            else:
+                at = None
+                start = self._parse(request.GET.get("start"), user_tz)
+                end = self._parse(request.GET.get("end"), user_tz)
+        except ValueError:
+            return JsonResponse(
+                {"error": "Give either 'at' or 'start' and 'end' as ISO datetimes"},
+                status=400,
+            )
+        if at is None and start >= end:
+            return JsonResponse({"error": "'start' must be before 'end'"}, status=400)
+
+        services = Service.objects.filter(
+            is_active=True, coach__profile__is_coach=True
+        ).select_related("coach__profile", "category")
+        category = request.GET.get("category")
+        if category:
+            if not category.isdigit():
+                return JsonResponse({"error": "Invalid category"}, status=400)
+            services = services.filter(category_id=category)
+        services = list(services)
+
+        now = timezone.now()
+        index = free_interval_index(
+            {service.coach.profile for service in services}, now
+        )
+        if at is not None:
+            window_start = at
+            window_end = at + timezone.timedelta(
+                minutes=max([service.duration for service in services], default=0)
+            )
+        else:
+            window_start, window_end = start, end
+        # The client's own sessions in the window
+        busy = [
+            (session_start, session_start + timezone.timedelta(minutes=duration))
+            for session_start, duration in Session.objects.filter(
+                client=request.user.profile,
+                status__in=BLOCKING_STATUSES,
+                date_time__gte=window_start - timezone.timedelta(days=1),
+                date_time__lt=window_end,
+            ).values_list("date_time", "duration")
+        ]
+
+        results = []
+        for service in services:
+            coach = service.coach.profile
+            if at is not None:
+                slots = window_slots(
+                    index[coach.pk],
+                    at,
+                    at + timezone.timedelta(minutes=service.duration),
+                    service.duration,
+                    granularity=1,
+                    now=now,
+                )
+            else:
+                slots = window_slots(
+                    index[coach.pk],
+                    start,
+                    end,
+                    service.duration,
+                    coach.slot_granularity,
+                    now=now,
+                )
+            slots = [
+                slot
+                for slot in slots
+                if not any(
+                    slot < busy_end
+                    and slot + timezone.timedelta(minutes=service.duration) > busy_start
+                    for busy_start, busy_end in busy
+                )
+            ]
+            if not slots:
+                continue
+            results.append(
+                {
+                    "service": service.pk,
+                    "name": service.name,
+                    "category": service.category.name if service.category else None,
+                    "coach": service.coach.get_full_name(),
+                    "duration": service.duration,
+                    "price": str(service.price),
+                    "currency": service.currency,
+                    "slot_count": len(slots),
+                    "slots": [
+                        {
+                            "value": slot.astimezone(user_tz).isoformat(),
+                            "display": slot.astimezone(user_tz).strftime(
+                                "%A %d.%m.%Y %H:%M"
+                            ),
+                        }
+                        for slot in slots[: self.MAX_SLOTS_PER_SERVICE]
+                    ],
+                }
+            )
+        results.sort(key=lambda result: (result["slots"][0]["value"], result["name"]))
+        return JsonResponse({"results": results})
+
+
+class SearchView(View):
+    """
+    Ranked full-text search over services, reviews and session notes, see
+    viewer/search.py. GET parameters: ``q``, optional ``kind`` (repeatable:
+    service, review, session) and ``limit``. Anonymous users find services
+    only, sessions are found by their client and coach.
+    """
+
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 50
+
+    def get(self, request):
+        query = request.GET.get("q", "").strip()
+        kinds = request.GET.getlist("kind") or SEARCH_KINDS
+        if not set(kinds) <= set(SEARCH_KINDS):
+            return JsonResponse({"error": "Invalid kind"}, status=400)
+        limit = request.GET.get("limit", str(self.DEFAULT_LIMIT))
+        if not limit.isdigit() or not 1 <= int(limit) <= self.MAX_LIMIT:
+            return JsonResponse(
+                {"error": f"'limit' must be between 1 and {self.MAX_LIMIT}"},
+                status=400,
+            )
+        found = search_results(query, request.user, kinds, int(limit))
+        return JsonResponse({"query": query, "results": found})
+
+
+def _service_ratings(coach_user):
+    """Average ratings of the coach's services, from the maintained totals."""
+    return (
+        Service.objects.filter(coach=coach_user, rating_count__gt=0)
+        .annotate(avg_rating=Cast("rating_sum", FloatField()) / F("rating_count"))
+        .values("id", "name", "avg_rating", "rating_count")
+        .order_by("-avg_rating")
+    )
+
+
+@method_decorator(read_from_replica(), name="dispatch")
 class CoachReportView(LoginRequiredMixin, TemplateView):
     template_name = "viewer/coach_report.html"
 
@@ -765,14 +1138,7 @@ class CoachReportView(LoginRequiredMixin, TemplateView):
         )
 
         # Průměrné hodnocení služeb
-        from django.db.models import Avg
-
-        service_ratings = (
-            Review.objects.filter(session__coach=coach_profile)
-            .values("session__service__name")
-            .annotate(avg_rating=Avg("rating"), count=Count("id"))
-            .order_by("-avg_rating")
-        )
+        service_ratings = _service_ratings(user)
 
         # Rezervace podle stavu
         status_counts = (
@@ -782,18 +1148,22 @@ class CoachReportView(LoginRequiredMixin, TemplateView):
             .order_by("-count")
         )
 
-        # Přidám mapu názvu služby na ID pro odkazy na review
-        service_id_map = {
-            s.name: s.id for s in Service.objects.filter(coach=coach_profile.user)
-        }
-        context["service_id_map"] = service_id_map
-
         # Zrušené a zaplacené session
-        cancelled_paid_sessions = Session.objects.filter(
-            coach=coach_profile,
-            status="CANCELLED",
-            payments__paid_at__isnull=False
-        ).select_related("client", "service").distinct()
+        cancelled_paid_sessions = (
+            Session.objects.filter(
+                coach=coach_profile, status="CANCELLED", payment_status="PAID"
+            )
+            .select_related("client__user", "service")
+            .prefetch_related(
+                Prefetch(
+                    "payments",
+                    queryset=Payment.objects.filter(
+                        paid_at__isnull=False
+                    ).select_related("payment_method"),
+                    to_attr="paid_payments",
+                )
+            )
+        )
         context["cancelled_paid_sessions"] = cancelled_paid_sessions
 
         context.update(
@@ -805,12 +1175,15 @@ class CoachReportView(LoginRequiredMixin, TemplateView):
                 "payment_methods": payment_methods,
                 "client_counts": client_counts,
                 "service_ratings": service_ratings,
+                "coach_rating": coach_profile.average_rating,
+                "coach_rating_count": coach_profile.rating_count,
                 "status_counts": status_counts,
             }
         )
         return context
 
 
+@method_decorator(read_from_replica(), name="dispatch")
 class CoachReportExportView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         user = request.user
@@ -841,14 +1214,7 @@ class CoachReportExportView(LoginRequiredMixin, View):
             .annotate(count=Count("id"))
             .order_by("-count")
         )
-        from django.db.models import Avg
-
-        service_ratings = (
-            Review.objects.filter(session__coach=coach_profile)
-            .values("session__service__name")
-            .annotate(avg_rating=Avg("rating"), count=Count("id"))
-            .order_by("-avg_rating")
-        )
+        service_ratings = _service_ratings(user)
         payments = Payment.objects.filter(session__coach=coach_profile)
         total_paid = (
             payments.filter(paid_at__isnull=False).aggregate(Sum("amount"))[
@@ -868,62 +1234,108 @@ class CoachReportExportView(LoginRequiredMixin, View):
             .order_by("-count")
         )
 
-        wb = Workbook()
-        ws1 = wb.active
-        ws1.title = "Service Usage"
-        ws1.append(["Service", "Reservations"])
-        for row in service_counts:
-            ws1.append([row["service__name"], row["count"]])
-
-        ws2 = wb.create_sheet(title="Categories")
-        ws2.append(["Category", "Reservations"])
-        for row in category_counts:
-            ws2.append([row["service__category__name"] or "-", row["count"]])
-
-        ws3 = wb.create_sheet(title="Status")
-        ws3.append(["Status", "Count"])
-        for row in status_counts:
-            ws3.append([row["status"], row["count"]])
-
-        ws4 = wb.create_sheet(title="Clients")
-        ws4.append(["Client", "Reservations"])
-        for row in client_counts:
-            ws4.append([row["client__user__username"], row["count"]])
-
-        ws5 = wb.create_sheet(title="Service Ratings")
-        ws5.append(["Service", "Average Rating", "Reviews"])
-        for row in service_ratings:
-            ws5.append([row["session__service__name"], row["avg_rating"], row["count"]])
-
-        ws6 = wb.create_sheet(title="Payments")
-        ws6.append(["Total paid", total_paid])
-        ws6.append(["Total unpaid", total_unpaid])
-        ws6.append([])
-        ws6.append(["Method", "Count", "Total"])
-        for row in payment_methods:
-            ws6.append([row["payment_method__name"], row["count"], row["total"]])
-
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        response["Content-Disposition"] = "attachment; filename=coach_report.xlsx"
-        wb.save(response)
-        return response
-
-
+        payments_rows = [
+            ["Total paid", total_paid],
+            ["Total unpaid", total_unpaid],
+            [],
+            ["Method", "Count", "Total"],
+        ] + [
+            [row["payment_method__name"], row["count"], row["total"]]
+            for row in payment_methods
+        ]
+        sheets = [
+            (
+                "Service Usage",
+                [["Service", "Reservations"]]
+                + [[row["service__name"], row["count"]] for row in service_counts],
+            ),
+            (
+                "Categories",
+                [["Category", "Reservations"]]
+                + [
+                    [row["service__category__name"] or "-", row["count"]]
+                    for row in category_counts
+                ],
+            ),
+            (
+                "Status",
+                [["Status", "Count"]]
+                + [[row["status"], row["count"]] for row in status_counts],
+            ),
+            (
+                "Clients",
+                [["Client", "Reservations"]]
+                + [
+                    [row["client__user__username"], row["count"]]
+                    for row in client_counts
+                ],
+            ),
+            (
+                "Service Ratings",
+                [["Service", "Average Rating", "Reviews"]]
+                + [
+                    [row["name"], row["avg_rating"], row["rating_count"]]
+                    for row in service_ratings
+                ],
+            ),
+            ("Payments", payments_rows),
+        ]
+        return workbook_response(sheets, "coach_report.xlsx")
+
+
+@method_decorator(read_from_replica(), name="dispatch")
+@method_decorator(conditional_page(service_reviews_state), name="get")
 class ServiceReviewListView(LoginRequiredMixin, ListView):
+    """
+    Reviews of a service newest first, by cursor pages, under a header with
+    the average and the histogram of ratings from one grouped query.
+    """
+
     template_name = "viewer/service_review_list.html"
     context_object_name = "reviews"
+    page_size = 20
+
+    def get(self, request, *args, **kwargs):
+        self.service = get_object_or_404(Service, pk=kwargs["service_id"])
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        service_id = self.kwargs["service_id"]
-        return Review.objects.filter(session__service_id=service_id).select_related(
-            "session", "session__client"
+        return Review.objects.filter(session__service=self.service).select_related(
+            "session__client__user"
         )
 
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        from viewer.models import Service
+        try:
+            reviews, next_cursor = cursor.paginate(
+                self.object_list, self.request.GET.get("cursor"), self.page_size
+            )
+        except ValueError:
+            raise BadRequest("Invalid cursor")
+        context = super().get_context_data(object_list=reviews, **kwargs)
 
-        context["service"] = Service.objects.get(pk=self.kwargs["service_id"])
+        counts = dict(
+            self.object_list.order_by()
+            .values_list("rating")
+            .annotate(count=Count("id"))
+        )
+        total = sum(counts.values())
+        histogram = [
+            (rating, counts.get(rating, 0), 100 * counts.get(rating, 0) / total)
+            for rating in sorted(set(range(1, 6)) | set(counts), reverse=True)
+            if total
+        ]
+        context.update(
+            {
+                "service": self.service,
+                "next_cursor": next_cursor,
+                "is_first_page": not self.request.GET.get("cursor"),
+                "review_count": total,
+                "average_rating": (
+                    sum(rating * count for rating, count in counts.items()) / total
+                    if total
+                    else None
+                ),
+                "histogram": histogram,
+            }
+        )
         return context